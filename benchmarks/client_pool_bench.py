@@ -0,0 +1,81 @@
+"""Throughput of the sagemaker runtime client against a local stub endpoint, as the connection pool grows
+
+Usage: python -m benchmarks.client_pool_bench [--threads 64] [--requests 1000] [--latency 0.05]
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from botocore.config import Config
+
+from src.services.sagemaker_models.client_factory import RUNTIME, build_config, create_client
+
+RESPONSE = json.dumps([{"generation": {"role": "assistant", "content": "Scenario: ok"}}]).encode("utf-8")
+
+
+def serve_stub(latency: float) -> ThreadingHTTPServer:
+    class StubEndpoint(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(RESPONSE)))
+            self.end_headers()
+            self.wfile.write(RESPONSE)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubEndpoint)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(pool_size: int, threads: int, requests: int, endpoint_url: str) -> float:
+    config = build_config(RUNTIME).merge(Config(max_pool_connections=pool_size, retries={"max_attempts": 1}))
+    client = create_client(RUNTIME, "us-east-1", config=config, endpoint_url=endpoint_url)
+    payload = json.dumps({"inputs": [[{"role": "user", "content": "spec"}]], "parameters": {}})
+
+    def invoke(_):
+        client.invoke_endpoint(EndpointName="stub", Body=payload, ContentType="application/json")["Body"].read()
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(invoke, range(threads)))  # warm up
+        start = time.perf_counter()
+        list(executor.map(invoke, range(requests)))
+        return requests / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=64, help="concurrent invocations")
+    parser.add_argument("--requests", type=int, default=1000, help="invocations per pool size")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds the stub takes to answer")
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[1, 4, 10, 32, 64, 128])
+    args = parser.parse_args()
+
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+    # botocore warns on every connection discarded by a full pool
+    logging.getLogger("urllib3.connectionpool").setLevel(logging.ERROR)
+
+    server = serve_stub(args.latency)
+    endpoint_url = f"http://127.0.0.1:{server.server_port}"
+    print(f"{args.threads} threads, {args.requests} invocations, {args.latency * 1000:.0f} ms stub latency")
+    print(f"{'pool size':>10} {'req/s':>10}")
+    for pool_size in args.pool_sizes:
+        print(f"{pool_size:>10} {run(pool_size, args.threads, args.requests, endpoint_url):>10.1f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
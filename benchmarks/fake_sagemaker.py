@@ -0,0 +1,299 @@
+"""Local fake of the SageMaker control plane and runtime, to load-test the service without real endpoints
+
+It answers the calls `Connector` makes (`list_endpoint_configs`, `describe_endpoint_config`, `list_endpoints`,
+`describe_endpoint`, `create_endpoint`, `delete_endpoint`, `invoke_endpoint` and
+`invoke_endpoint_with_response_stream`) on one port, for both `SAGEMAKER_ENDPOINT_URL` and
+`SAGEMAKER_RUNTIME_ENDPOINT_URL`.
+
+Usage: python -m benchmarks.fake_sagemaker [--port 8900] [--latency 0.05] [--tokens-per-second 200] [--error-rate 0]
+"""
+import argparse
+import json
+import random
+import struct
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+from src.constants import ModelName
+
+ACCOUNT_ARN = "arn:aws:sagemaker:us-east-1:000000000000"
+CONTROL_PLANE_OPERATIONS = {
+    "ListEndpointConfigs": "list_endpoint_configs",
+    "DescribeEndpointConfig": "describe_endpoint_config",
+    "ListEndpoints": "list_endpoints",
+    "DescribeEndpoint": "describe_endpoint",
+    "CreateEndpoint": "create_endpoint",
+    "DeleteEndpoint": "delete_endpoint",
+}
+ERROR_TYPES = {400: "ValidationError", 424: "ModelError", 429: "ThrottlingException", 500: "InternalFailure",
+               503: "ServiceUnavailable"}
+
+
+@dataclass
+class FakeOptions:
+    """Behaviour of the fake
+
+    Attributes:
+        latency (float): seconds before the first token of an invocation
+        tokens_per_second (float): generation speed, 0 answers right after `latency`
+        tokens (int): tokens of a generation, capped by the `max_new_tokens` of the payload
+        error_rate (float): share of invocations failing with `error_status`
+        error_status (int): HTTP status of the failed invocations, 424 (ModelError) by default
+        creation_seconds (float): seconds a new endpoint stays `Creating`
+        failure_rate (float): share of endpoint creations ending `Failed`
+    """
+    latency: float = 0.05
+    tokens_per_second: float = 0.0
+    tokens: int = 64
+    error_rate: float = 0.0
+    error_status: int = 424
+    creation_seconds: float = 1.0
+    failure_rate: float = 0.0
+
+
+class FakeSageMaker:
+    """State of the fake: endpoint configs and endpoints, whose status moves from `Creating` over time"""
+
+    def __init__(self, options: FakeOptions = None, configs: list[str] = None, endpoints: list[str] = None):
+        """Constructor
+
+        Args:
+            options (FakeOptions, optional): behaviour of the fake. Defaults to FakeOptions().
+            configs (list[str], optional): endpoint config names. Defaults to every ModelName.
+            endpoints (list[str], optional): endpoints already InService. Defaults to the jumpstart model.
+        """
+        self.options = options or FakeOptions()
+        now = time.time()
+        self.configs = {name: self._config(name, now) for name in configs or [model.value for model in ModelName]}
+        self.endpoints = {}
+        for name in endpoints if endpoints is not None else [ModelName.llama2_7b_jumpstart.value]:
+            self.endpoints[name] = self._endpoint(name, name, now, created_at=0.0, fails=False)
+        self.invocations = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _config(name: str, now: float) -> dict:
+        return {
+            "EndpointConfigName": name,
+            "EndpointConfigArn": f"{ACCOUNT_ARN}:endpoint-config/{name.lower()}",
+            "CreationTime": now,
+            "ProductionVariants": [{"VariantName": "AllTraffic", "ModelName": name, "InitialInstanceCount": 1,
+                                    "InstanceType": "ml.g5.2xlarge"}],
+        }
+
+    @staticmethod
+    def _endpoint(name: str, config_name: str, now: float, created_at: float, fails: bool) -> dict:
+        return {"EndpointName": name, "EndpointArn": f"{ACCOUNT_ARN}:endpoint/{name.lower()}",
+                "EndpointConfigName": config_name, "CreationTime": now, "LastModifiedTime": now,
+                "EndpointStatus": "Creating", "_created_at": created_at, "_fails": fails}
+
+    def _status(self, endpoint: dict) -> dict:
+        if endpoint["EndpointStatus"] == "Creating" \
+                and time.monotonic() - endpoint["_created_at"] >= self.options.creation_seconds:
+            endpoint["EndpointStatus"] = "Failed" if endpoint["_fails"] else "InService"
+            endpoint["LastModifiedTime"] = time.time()
+            if endpoint["_fails"]:
+                endpoint["FailureReason"] = "Fake deployment failure"
+        return {key: value for key, value in endpoint.items() if not key.startswith("_")}
+
+    # control plane
+
+    def list_endpoint_configs(self, request: dict) -> dict:
+        contains = request.get("NameContains", "")
+        return {"EndpointConfigs": [{key: config[key] for key in ("EndpointConfigName", "EndpointConfigArn",
+                                                                   "CreationTime")}
+                                    for name, config in sorted(self.configs.items()) if contains in name]}
+
+    def describe_endpoint_config(self, request: dict) -> dict:
+        config = self.configs.get(request["EndpointConfigName"])
+        if config is None:
+            raise FakeError(400, f"Could not find endpoint configuration \"{request['EndpointConfigName']}\".")
+        return config
+
+    def list_endpoints(self, request: dict) -> dict:
+        with self._lock:
+            return {"Endpoints": [self._status(endpoint) for _, endpoint in sorted(self.endpoints.items())]}
+
+    def describe_endpoint(self, request: dict) -> dict:
+        with self._lock:
+            endpoint = self.endpoints.get(request["EndpointName"])
+            if endpoint is None:
+                raise FakeError(400, f"Could not find endpoint \"{request['EndpointName']}\".")
+            return self._status(endpoint)
+
+    def create_endpoint(self, request: dict) -> dict:
+        name, config_name = request["EndpointName"], request["EndpointConfigName"]
+        if config_name not in self.configs:
+            raise FakeError(400, f"Could not find endpoint configuration \"{config_name}\".")
+        with self._lock:
+            if name in self.endpoints:
+                raise FakeError(400, f"Cannot create already existing endpoint \"{name}\".")
+            fails = random.random() < self.options.failure_rate
+            self.endpoints[name] = self._endpoint(name, config_name, time.time(), time.monotonic(), fails)
+            return {"EndpointArn": self.endpoints[name]["EndpointArn"]}
+
+    def delete_endpoint(self, request: dict) -> dict:
+        with self._lock:
+            if self.endpoints.pop(request["EndpointName"], None) is None:
+                raise FakeError(400, f"Could not find endpoint \"{request['EndpointName']}\".")
+        return {}
+
+    # runtime
+
+    def start_invocation(self, endpoint_name: str, body: bytes) -> int:
+        """Check an invocation can run and return the number of tokens to generate
+
+        Raises:
+            FakeError: the endpoint is not InService, or the invocation was picked to fail
+        """
+        with self._lock:
+            endpoint = self.endpoints.get(endpoint_name)
+            if endpoint is None or self._status(endpoint)["EndpointStatus"] != "InService":
+                raise FakeError(400, f"Endpoint {endpoint_name} not found or not InService.")
+            self.invocations += 1
+        if random.random() < self.options.error_rate:
+            raise FakeError(self.options.error_status, "Fake invocation failure")
+        try:
+            max_new_tokens = json.loads(body).get("parameters", {}).get("max_new_tokens", self.options.tokens)
+        except (ValueError, AttributeError):
+            max_new_tokens = self.options.tokens
+        return max(1, min(self.options.tokens, max_new_tokens or self.options.tokens))
+
+    def token_delay(self) -> float:
+        return 1.0 / self.options.tokens_per_second if self.options.tokens_per_second > 0 else 0.0
+
+
+class FakeError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def encode_event(headers: dict[str, str], payload: bytes) -> bytes:
+    """Encode one message of an `application/vnd.amazon.eventstream` body"""
+    header_bytes = b""
+    for name, value in headers.items():
+        name, value = name.encode("utf-8"), value.encode("utf-8")
+        header_bytes += struct.pack(">B", len(name)) + name + b"\x07" + struct.pack(">H", len(value)) + value
+    prelude = struct.pack(">II", 12 + len(header_bytes) + len(payload) + 4, len(header_bytes))
+    message = prelude + struct.pack(">I", zlib.crc32(prelude)) + header_bytes + payload
+    return message + struct.pack(">I", zlib.crc32(message))
+
+
+def payload_part(data: bytes) -> bytes:
+    return encode_event({":event-type": "PayloadPart", ":content-type": "application/octet-stream",
+                         ":message-type": "event"}, data)
+
+
+def make_handler(fake: FakeSageMaker):
+    class FakeSageMakerHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # headers and body are separate writes, Nagle would hold the body until the client acknowledges the headers
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            try:
+                if self.path.startswith("/endpoints/"):
+                    _, _, endpoint_name, action = self.path.split("?")[0].split("/", 3)
+                    self._invoke(unquote(endpoint_name), body, stream=action == "invocations-response-stream")
+                else:
+                    self._control_plane(body)
+            except FakeError as ex:
+                self._send_json(ex.status, {"__type": ERROR_TYPES.get(ex.status, "InternalFailure"),
+                                            "message": ex.message},
+                                {"X-Amzn-ErrorType": ERROR_TYPES.get(ex.status, "InternalFailure")})
+
+        def _control_plane(self, body: bytes):
+            operation = self.headers.get("X-Amz-Target", "").rsplit(".", 1)[-1]
+            if operation not in CONTROL_PLANE_OPERATIONS:
+                raise FakeError(400, f"Operation {operation} is not supported by the fake")
+            method = getattr(fake, CONTROL_PLANE_OPERATIONS[operation])
+            self._send_json(200, method(json.loads(body or b"{}")), content_type="application/x-amz-json-1.1")
+
+        def _invoke(self, endpoint_name: str, body: bytes, stream: bool):
+            tokens = fake.start_invocation(endpoint_name, body)
+            time.sleep(fake.options.latency)
+            if not stream:
+                time.sleep(fake.token_delay() * tokens)
+                content = " ".join(f"token{i}" for i in range(tokens))
+                self._send_json(200, [{"generation": {"role": "assistant", "content": content}}])
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/vnd.amazon.eventstream")
+            self.send_header("X-Amzn-SageMaker-Content-Type", "application/json")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i in range(tokens):
+                line = json.dumps({"token": {"id": i, "text": f"token{i} ", "special": False}})
+                self._send_chunk(payload_part(f"data:{line}\n".encode("utf-8")))
+                time.sleep(fake.token_delay())
+            self._send_chunk(b"")
+
+        def _send_chunk(self, data: bytes):
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def _send_json(self, status: int, document, headers: dict = None, content_type: str = "application/json"):
+            data = json.dumps(document).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or dict()).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return FakeSageMakerHandler
+
+
+def serve(fake: FakeSageMaker, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Serve the fake from a background thread, `port=0` picks a free port
+
+    Returns:
+        ThreadingHTTPServer: the server, its URL is `http://{host}:{server.server_port}`
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-sagemaker", daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="generation speed, 0 for instant")
+    parser.add_argument("--tokens", type=int, default=64, help="tokens of a generation")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of failed invocations")
+    parser.add_argument("--error-status", type=int, default=424, choices=sorted(ERROR_TYPES))
+    parser.add_argument("--creation-seconds", type=float, default=10.0, help="seconds an endpoint stays Creating")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of failed endpoint creations")
+    parser.add_argument("--endpoints", nargs="*", default=None, help="endpoints InService at startup")
+    args = parser.parse_args()
+
+    options = FakeOptions(latency=args.latency, tokens_per_second=args.tokens_per_second, tokens=args.tokens,
+                          error_rate=args.error_rate, error_status=args.error_status,
+                          creation_seconds=args.creation_seconds, failure_rate=args.failure_rate)
+    server = serve(FakeSageMaker(options, endpoints=args.endpoints), args.host, args.port)
+    url = f"http://{args.host}:{server.server_port}"
+    print(f"Fake SageMaker listening on {url}")
+    print(f"export SAGEMAKER_ENDPOINT_URL={url} SAGEMAKER_RUNTIME_ENDPOINT_URL={url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
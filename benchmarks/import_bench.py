@@ -0,0 +1,55 @@
+"""Import time of the app, from `python -X importtime`, against a budget
+
+Each run imports the module in a fresh interpreter, the fastest run is kept. The slowest modules are listed by their
+own import time and by their cumulative import time (with what they import). The exit code is 1 over the budget.
+
+Usage: python -m benchmarks.import_bench [--module src.main] [--runs 5] [--top 15] [--budget 2.0]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module: str) -> dict[str, tuple[float, float]]:
+    """Self and cumulative import seconds of every module imported by `import <module>` in a fresh interpreter"""
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT,
+                               capture_output=True, text=True, check=True)
+    times = dict()
+    for line in completed.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(own) / 1e6, int(cumulative) / 1e6)
+    return times
+
+
+def measure_import(module: str, runs: int = 5) -> dict[str, tuple[float, float]]:
+    """`import_times` of the fastest of `runs` imports, the others are slowed down by the machine"""
+    return min((import_times(module) for _ in range(runs)), key=lambda times: times[module][1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="src.main", help="module to import")
+    parser.add_argument("--runs", type=int, default=5, help="imports, the fastest is reported")
+    parser.add_argument("--top", type=int, default=15, help="slowest modules listed")
+    parser.add_argument("--budget", type=float, default=2.0, help="seconds the import may take")
+    args = parser.parse_args()
+
+    times = measure_import(args.module, args.runs)
+    total = times[args.module][1]
+    for title, index in (("self", 0), ("cumulative", 1)):
+        print(f"Slowest modules, {title} time:")
+        for name, seconds in sorted(times.items(), key=lambda item: item[1][index], reverse=True)[:args.top]:
+            print(f"{seconds[index] * 1000:>10.1f} ms  {name}")
+    print(f"import {args.module}: {total * 1000:.1f} ms, budget {args.budget * 1000:.0f} ms")
+    if total > args.budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""Load test of the FastAPI app against the local fake SageMaker, compared with a stored baseline
+
+The app runs in-process and is driven through its ASGI interface at each concurrency level. Each level reports the
+throughput, the latency percentiles and the lag of the event loop. Levels slower than the baseline by more than
+`--tolerance` are reported as regressions and the exit code is 1.
+
+Usage: python -m benchmarks.load_bench [--concurrency 1 8 32 64] [--requests 500] [--save-baseline]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "load_bench.json")
+PROMPTS = {
+    "llama_prompts/prompt_testcase_sys.txt": "You write test cases.",
+    "llama_prompts/prompt_testcase_query.txt": "Write the test cases of this API:\n{input_api}",
+    "llama_prompts/prompt_bdd_sys.txt": "You write Gherkin step definitions.",
+    "llama_prompts/prompt_bdd_query.txt": "API:\n{input_api}\nTest case:\n{input_test}",
+}
+SPEC = json.dumps({"openapi": "3.0.0", "paths": {f"/items/{i}": {"get": {"summary": f"Get item {i}"}}
+                                                 for i in range(20)}})
+
+
+def configure(fake_url: str, prompts_dir: str) -> None:
+    """Point the settings at the fake, they must be set before the app is imported"""
+    os.environ.update({
+        "SAGEMAKER_ENDPOINT_URL": fake_url,
+        "SAGEMAKER_RUNTIME_ENDPOINT_URL": fake_url,
+        "DEPLOY_ENV": "prod",
+        "PROMPTS_DIR": prompts_dir,
+        "RESPONSE_CACHE_ENABLED": "false",
+    })
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+    for name, text in PROMPTS.items():
+        os.makedirs(os.path.join(prompts_dir, os.path.dirname(name)), exist_ok=True)
+        with open(os.path.join(prompts_dir, name), "w") as f:
+            f.write(text)
+
+
+def make_request(route: str, index: int) -> tuple[str, dict]:
+    # a distinct spec per request, identical requests would share one generation through the single flight
+    spec = f"{SPEC} #{index}"
+    if route == "step-definition":
+        return "/inference/step-definition", {"inputs": {"spec": spec, "tc": "Scenario: get an item"},
+                                              "parameters": {"max_new_tokens": 256}}
+    return "/inference/testcases", {"inputs": spec, "parameters": {"max_new_tokens": 256}}
+
+
+async def measure_lag(stop: asyncio.Event, samples: list[float], interval: float = 0.01) -> None:
+    """Record how late the event loop wakes up a task sleeping `interval` seconds"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - start - interval)
+
+
+async def run_level(client, route: str, concurrency: int, requests: int) -> dict:
+    latencies, errors = [], 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for index in counter:
+            path, body = make_request(route, index)
+            start = time.perf_counter()
+            response = await client.post(path, json=body)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    lags, stop = [], asyncio.Event()
+    lag_task = asyncio.create_task(measure_lag(stop, lags))
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await lag_task
+
+    percentiles = percentiles_of(latencies)
+    lag_percentiles = percentiles_of(lags)
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "rps": requests / elapsed,
+        "p50_ms": percentiles[49] * 1000,
+        "p95_ms": percentiles[94] * 1000,
+        "p99_ms": percentiles[98] * 1000,
+        "loop_lag_p99_ms": lag_percentiles[98] * 1000,
+        "loop_lag_max_ms": max(lags or [0.0]) * 1000,
+    }
+
+
+def percentiles_of(samples: list[float]) -> list[float]:
+    if len(samples) < 2:
+        return (samples or [0.0]) * 99
+    return statistics.quantiles(samples, n=100, method="inclusive")
+
+
+def compare(result: dict, baseline: dict | None, tolerance: float) -> list[str]:
+    """Regressions of a level against its baseline"""
+    if baseline is None:
+        return []
+    regressions = []
+    if result["rps"] < baseline["rps"] * (1 - tolerance):
+        regressions.append(f"req/s {baseline['rps']:.1f} -> {result['rps']:.1f}")
+    for key in ("p95_ms", "p99_ms"):
+        if result[key] > baseline[key] * (1 + tolerance):
+            regressions.append(f"{key} {baseline[key]:.1f} -> {result[key]:.1f}")
+    return regressions
+
+
+async def bench(args) -> list[dict]:
+    import httpx
+
+    from src.main import app
+
+    results = []
+    async with httpx.AsyncClient(app=app, base_url="http://bench", timeout=None) as client:
+        await run_level(client, args.route, max(args.concurrency), max(args.concurrency))  # warm up
+        for concurrency in args.concurrency:
+            results.append(await run_level(client, args.route, concurrency, args.requests))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--route", choices=["testcases", "step-definition"], default="testcases")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--requests", type=int, default=500, help="requests per concurrency level")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds the fake takes to answer")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="generation speed of the fake")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of failed invocations")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    from benchmarks.fake_sagemaker import FakeOptions, FakeSageMaker, serve
+
+    options = FakeOptions(latency=args.latency, tokens_per_second=args.tokens_per_second, error_rate=args.error_rate)
+    server = serve(FakeSageMaker(options))
+    configure(f"http://127.0.0.1:{server.server_port}", tempfile.mkdtemp(prefix="prompts-"))
+    # the payloads are logged at INFO on every request
+    logging.disable(logging.INFO)
+
+    results = asyncio.run(bench(args))
+    server.shutdown()
+
+    key = f"{args.route}/latency={args.latency}/tps={args.tokens_per_second}/errors={args.error_rate}"
+    baselines = dict()
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+    baseline = {level["concurrency"]: level for level in baselines.get(key, [])}
+
+    print(f"{args.route}, {args.requests} requests per level, fake latency {args.latency * 1000:.0f} ms")
+    print(f"{'conc':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'lag p99':>9} {'lag max':>9} "
+          f"{'errors':>7}  vs baseline")
+    failed = False
+    for result in results:
+        regressions = compare(result, baseline.get(result["concurrency"]), args.tolerance)
+        failed = failed or bool(regressions)
+        status = "no baseline" if result["concurrency"] not in baseline else "; ".join(regressions) or "ok"
+        print(f"{result['concurrency']:>5} {result['rps']:>9.1f} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} "
+              f"{result['p99_ms']:>9.1f} {result['loop_lag_p99_ms']:>9.1f} {result['loop_lag_max_ms']:>9.1f} "
+              f"{result['errors']:>7}  {status}")
+
+    if args.save_baseline:
+        baselines[key] = results
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+    elif failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
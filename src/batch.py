@@ -0,0 +1,42 @@
+"""Run a JSONL file of inference payloads against the deployed endpoints
+
+Usage: python -m src.batch requests.jsonl [--output results.jsonl] [--checkpoint batch.ckpt.jsonl]
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from .services.batch_use import BatchCheckpoint, BatchRunner
+from .utilities.preparation import init_connector
+
+
+async def run(args) -> int:
+    checkpoint = BatchCheckpoint(args.checkpoint) if args.checkpoint else None
+    output = open(args.output, "w") if args.output else sys.stdout
+    failed = 0
+    try:
+        with open(args.input) as f:
+            lines = f.readlines()
+        async for record in BatchRunner(init_connector(), checkpoint).run(lines):
+            failed += record["status"] != "ok"
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+        if output is not sys.stdout:
+            output.close()
+    return 1 if failed else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a JSONL file of test case / step definition payloads")
+    parser.add_argument("input", help="JSONL file of SpecInferencePayload / StepInferencePayload records")
+    parser.add_argument("--output", help="JSONL file of the results, defaults to stdout")
+    parser.add_argument("--checkpoint", help="checkpoint file, re-running with it resumes the batch")
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -11,9 +11,32 @@ class EndpointStatus:
     NONEXISTENT = "Nonexistent"
 
 
+class DeploymentStatus:
+    PENDING = "Pending"
+    CREATING = "Creating"
+    IN_SERVICE = "InService"
+    FAILED = "Failed"
+    TIMED_OUT = "TimedOut"
+    FINAL = {IN_SERVICE, FAILED, TIMED_OUT}
+
+
+class JobStatus:
+    QUEUED = "Queued"
+    RUNNING = "Running"
+    SUCCEEDED = "Succeeded"
+    FAILED = "Failed"
+    CANCELLED = "Cancelled"
+    FINAL = {SUCCEEDED, FAILED, CANCELLED}
+
+
 class ModelName(str, Enum):
     llama2_7b = "Models-LlaMa-2-7b"
     llama2_13b = "Models-LlaMa-2-13b"
     llama2_13n_4096 = "Models-LlaMa-2-13b-4096"
     llama2_70b = "Models-LlaMa-2-70b"
-    llama2_7b_jumpstart = "JumpStart-Model-LLaMa-2-7B"
\ No newline at end of file
+    llama2_7b_jumpstart = "JumpStart-Model-LLaMa-2-7B"
+
+
+def model_name_of(model: str) -> str:
+    """Plain name of a model, the default model of the requests is a ModelName member"""
+    return getattr(model, "value", model)
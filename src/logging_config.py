@@ -1,4 +1,150 @@
+import atexit
+import hashlib
+import json
 import logging
+import queue
+import random
+import sys
+import threading
+import time
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+
+from .settings import get_settings
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(name)s - %(message)s'
+# attributes of every LogRecord, the others were passed with `extra=` and go to the JSON records
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON document per record, with the fields passed as `extra=`"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        document = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                document[key] = value
+        if record.exc_info:
+            document["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(document, default=str)
+
+
+class AsyncQueueHandler(QueueHandler):
+    """Queue handler that never blocks the caller
+
+    The message is merged with its arguments in the calling thread, formatting and I/O happen on the writer thread.
+    Records are dropped, and counted, when the queue is full.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # freeze the message, the arguments may change once the caller moves on
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RateLimitFilter(logging.Filter):
+    """Per logger token bucket and sampling of the records below WARNING
+
+    Warnings and errors always pass.
+    """
+
+    def __init__(self, rate: float = 0.0, sample: float = 1.0):
+        """Constructor
+
+        Args:
+            rate (float, optional): records per second, with bursts of as many records. 0 for no limit.
+            sample (float, optional): share of the records kept. Defaults to 1.0.
+        """
+        super().__init__()
+        self.rate = rate
+        self.sample = sample
+        self.suppressed = 0
+        self._tokens = rate
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        if self.sample < 1.0 and random.random() >= self.sample:
+            self.suppressed += 1
+            return False
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            if self._tokens < 1:
+                self.suppressed += 1
+                return False
+            self._tokens -= 1
+            return True
+
+
+class LogPipeline:
+    """The queue shared by every logger and the single thread writing its records"""
+
+    def __init__(self, log_format: str = "text", queue_size: int = 10000, stream=None):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.handler = AsyncQueueHandler(self.queue)
+        writer = logging.StreamHandler(stream or sys.stderr)
+        writer.setFormatter(JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT))
+        self.listener = QueueListener(self.queue, writer, respect_handler_level=False)
+        self.filters: dict[str, RateLimitFilter] = {}
+        self.listener.start()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Write the queued records and stop the writer thread"""
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "dropped": self.handler.dropped,
+            "suppressed": sum(log_filter.suppressed for log_filter in self.filters.values()),
+        }
+
+
+@lru_cache()
+def get_log_pipeline() -> LogPipeline:
+    settings = get_settings()
+    return LogPipeline(log_format=settings.log_format, queue_size=settings.log_queue_size)
+
+
+def summarize_payload(payload: str, max_chars: int = None) -> str:
+    """Shorten a payload for the logs
+
+    Payloads longer than `max_chars` are cut, with their length and a content hash to tell them apart.
+
+    Args:
+        payload (str): payload
+        max_chars (int, optional): kept characters. Defaults to the `log_payload_max_chars` setting.
+    """
+    max_chars = get_settings().log_payload_max_chars if max_chars is None else max_chars
+    if len(payload) <= max_chars:
+        return payload
+    digest = hashlib.blake2b(payload.encode("utf-8"), digest_size=8).hexdigest()
+    return f"{payload[:max_chars]}... ({len(payload)} chars, hash {digest})"
 
 
 class LogConfig:
@@ -6,15 +152,22 @@ class LogConfig:
         self.class_name = class_name
 
     def get_logger(self):
+        settings = get_settings()
+        pipeline = get_log_pipeline()
         logger = logging.getLogger(self.class_name)
-        logger.setLevel(logging.INFO)
+        logger.setLevel(settings.log_level)
         logger.propagate = False  # to remove duplicate logs
 
         if logger.hasHandlers():
             logger.handlers = []
-        ch = logging.StreamHandler()
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
-        ch.setFormatter(formatter)
-        logger.addHandler(ch)
+        logger.addHandler(pipeline.handler)
+
+        rate = settings.log_rate_limits.get(self.class_name, 0.0)
+        sample = settings.log_sample_rates.get(self.class_name, 1.0)
+        if rate > 0 or sample < 1.0:
+            log_filter = pipeline.filters.get(self.class_name)
+            if log_filter is None:
+                log_filter = pipeline.filters[self.class_name] = RateLimitFilter(rate, sample)
+                logger.addFilter(log_filter)
 
         return logger
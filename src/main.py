@@ -2,6 +2,10 @@ from fastapi import Depends, FastAPI
 
 from .logging_config import LogConfig
 from .routes import chatbot_route, monitor_route, endpoint_route, endpoint_ws_route
+from .services.async_invocation import get_executors
+from .services.providers import PROVIDERS
+from .utilities.metrics_middleware import MetricsMiddleware
+from .utilities.prompt_registry import get_prompt_registry
 from fastapi.middleware.cors import CORSMiddleware
 
 
@@ -16,14 +20,35 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Access-Control-Allow-Origin"],
+    expose_headers=["Access-Control-Allow-Origin", "X-Cache", "X-Spec-Tokens-Saved"],
     max_age=240,  # Timeout value in seconds
 )
 
+app.add_middleware(MetricsMiddleware, routes=app.router.routes)
+
 app.include_router(chatbot_route.router)
 app.include_router(monitor_route.router)
 app.include_router(endpoint_route.router)
 app.include_router(endpoint_ws_route.router)
 
+
+@app.on_event("startup")
+def load_prompts():
+    get_prompt_registry().load_all()
+
+
+@app.on_event("shutdown")
+def shutdown_executors():
+    get_executors().shutdown()
+
+
+@app.on_event("shutdown")
+async def close_providers():
+    # only the providers that were used, the others were never imported
+    for provider in PROVIDERS.values():
+        if provider.loaded:
+            await provider.get().close()
+
+
 logger.info("Server started!")
 
@@ -48,6 +48,13 @@ class StepInferencePayload(BaseModel):
     model: str | None = ModelName.llama2_7b_jumpstart
 
 
+class PipelineInferencePayload(BaseModel):
+    inputs: str
+    parameters: SpecParameters | None
+    step_parameters: StepParameters | None
+    model: str | None = ModelName.llama2_7b_jumpstart
+
+
 class StepInferenceMlRequest(BaseModel):
     inputs: str
     parameters: StepParameters
@@ -1,5 +1,7 @@
+from datetime import datetime
+
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import Any, List, Dict
 
 
 class ModelStatus(BaseModel):
@@ -7,3 +9,23 @@ class ModelStatus(BaseModel):
     status: str
 
 
+class DeploymentJobStatus(BaseModel):
+    job_id: str
+    name: str
+    model_name: str
+    status: str
+    error: str | None
+    created_at: datetime
+    updated_at: datetime
+
+
+class GenerationJobStatus(BaseModel):
+    job_id: str
+    task: str
+    model_name: str | None
+    status: str
+    result: Any = None
+    error: str | None
+    error_status: int | None
+    created_at: datetime
+    updated_at: datetime
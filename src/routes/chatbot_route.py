@@ -1,26 +1,178 @@
+import dataclasses
+import json
 import os
 from typing import Annotated
 
-from fastapi import APIRouter, Body, Depends
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response, WebSocket, \
+    WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import ValidationError
 
 from ..constants import ModelEndpoint, ModelName
-from ..models.request import StepInferencePayload, SpecInferencePayload
-from ..services.model_use import generate_testcases, generate_step_definition, generate_chatgpt_testcases, \
-    generate_testcases_jumpstart, generate_step_definition_jumpstart
+from ..models.request import PipelineInferencePayload, StepInferencePayload, SpecInferencePayload
+from ..models.response import GenerationJobStatus
+from ..services.model_use import generate_testcases, generate_step_definition, agenerate_chatgpt_testcases, \
+    astream_chatgpt_testcases, agenerate_testcases_jumpstart, agenerate_step_definition_jumpstart, \
+    astream_testcases_jumpstart, astream_step_definition_jumpstart
+from ..services.batch_use import BatchCheckpoint, BatchRunner, parse_inference_record
+from ..services.generation_jobs import find_job, get_job_engine
+from ..services.incremental_use import agenerate_incremental_testcases
+from ..services.inference_context import InferenceContext
+from ..services.pipeline_use import agenerate_pipeline_testcases, astream_step_definitions
 from ..services.sagemaker_models.connector import Connector
-from ..utilities.preparation import init_connector
+from ..utilities.preparation import init_connector, get_inference_context
+from ..utilities.streaming import SSE_MEDIA_TYPE, to_server_sent_events
 
 
 router = APIRouter(prefix="/inference")
 
 
 @router.post("/testcases", tags=["Test cases"])
-async def gen_tests(spec: SpecInferencePayload, conn: Annotated[Connector, Depends(init_connector)]):
-    response = generate_testcases_jumpstart(spec, conn) #generate_testcases(spec, conn)
+async def gen_tests(spec: SpecInferencePayload, conn: Annotated[Connector, Depends(init_connector)],
+                    context: Annotated[InferenceContext, Depends(get_inference_context)], http_response: Response):
+    response = await agenerate_testcases_jumpstart(spec, conn, context) #generate_testcases(spec, conn)
+    http_response.headers["X-Cache"] = context.cache_status
+    http_response.headers["X-Spec-Tokens-Saved"] = str(context.spec_tokens_saved)
     return response
 
 
 @router.post("/step-definition", tags=["Gherkin step definition"])
-async def gen_steps(test: StepInferencePayload, conn: Annotated[Connector, Depends(init_connector)]):
-    response = generate_step_definition_jumpstart(test, conn) #generate_step_definition(test, conn)
+async def gen_steps(test: StepInferencePayload, conn: Annotated[Connector, Depends(init_connector)],
+                    context: Annotated[InferenceContext, Depends(get_inference_context)], http_response: Response):
+    response = await agenerate_step_definition_jumpstart(test, conn, context) #generate_step_definition(test, conn)
+    http_response.headers["X-Cache"] = context.cache_status
+    http_response.headers["X-Spec-Tokens-Saved"] = str(context.spec_tokens_saved)
     return response
+
+
+@router.post("/testcases/stream", tags=["Test cases"])
+async def stream_tests(spec: SpecInferencePayload, conn: Annotated[Connector, Depends(init_connector)],
+                       context: Annotated[InferenceContext, Depends(get_inference_context)]):
+    tokens = await astream_testcases_jumpstart(spec, conn, context)
+    return StreamingResponse(to_server_sent_events(tokens), media_type=SSE_MEDIA_TYPE,
+                             background=BackgroundTask(tokens.aclose))
+
+
+@router.post("/step-definition/stream", tags=["Gherkin step definition"])
+async def stream_steps(test: StepInferencePayload, conn: Annotated[Connector, Depends(init_connector)],
+                       context: Annotated[InferenceContext, Depends(get_inference_context)]):
+    tokens = await astream_step_definition_jumpstart(test, conn, context)
+    return StreamingResponse(to_server_sent_events(tokens), media_type=SSE_MEDIA_TYPE,
+                             background=BackgroundTask(tokens.aclose))
+
+
+@router.post("/testcases/incremental", tags=["Test cases"])
+async def gen_tests_incremental(spec: SpecInferencePayload, conn: Annotated[Connector, Depends(init_connector)],
+                                context: Annotated[InferenceContext, Depends(get_inference_context)]):
+    """Generate the test cases of the new or changed operations of an OpenAPI spec only, reuse the others
+
+    `Cache-Control: no-cache` regenerates every operation.
+    """
+    return await agenerate_incremental_testcases(spec, conn, context)
+
+
+@router.post("/testcases/openai", tags=["Test cases"])
+async def gen_tests_openai(spec: SpecInferencePayload,
+                           context: Annotated[InferenceContext, Depends(get_inference_context)]):
+    return await agenerate_chatgpt_testcases(spec, context)
+
+
+@router.post("/testcases/openai/stream", tags=["Test cases"])
+async def stream_tests_openai(spec: SpecInferencePayload,
+                              context: Annotated[InferenceContext, Depends(get_inference_context)]):
+    tokens = await astream_chatgpt_testcases(spec, context)
+    return StreamingResponse(to_server_sent_events(tokens), media_type=SSE_MEDIA_TYPE,
+                             background=BackgroundTask(tokens.aclose))
+
+
+@router.post("/pipeline", tags=["Pipeline"])
+async def run_pipeline(payload: PipelineInferencePayload, conn: Annotated[Connector, Depends(init_connector)],
+                       context: Annotated[InferenceContext, Depends(get_inference_context)]):
+    """Generate the test cases of a spec, then the step definitions of all of them concurrently
+
+    The first JSONL line lists the test cases, the step definitions follow as they complete.
+    """
+    # the test case generation narrows its context to its own parameters, the step definitions start afresh
+    testcases_context = dataclasses.replace(context)
+    testcases = await agenerate_pipeline_testcases(payload, conn, testcases_context)
+
+    async def lines():
+        yield json.dumps({"testcases": testcases}) + "\n"
+        async for record in astream_step_definitions(payload, testcases, conn, context):
+            yield json.dumps(record) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson",
+                             headers={"X-Cache": testcases_context.cache_status,
+                                      "X-Spec-Tokens-Saved": str(testcases_context.spec_tokens_saved)})
+
+
+@router.post("/batch", tags=["Batch"])
+async def run_batch(request: Request, conn: Annotated[Connector, Depends(init_connector)], batch_id: str | None = None):
+    """Run a JSONL body of test case / step definition payloads, results are streamed back as JSONL
+
+    Give a `batch_id` to checkpoint the batch: posting the same body with the same ID again resumes it.
+    """
+    body = await request.body()
+    checkpoint = BatchCheckpoint.for_batch(batch_id) if batch_id else None
+    runner = BatchRunner(conn, checkpoint)
+
+    async def lines():
+        try:
+            async for record in runner.run(body.decode("utf-8").splitlines()):
+                yield json.dumps(record) + "\n"
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.post("/jobs", tags=["Generation jobs"], response_model=GenerationJobStatus, status_code=202)
+async def submit_job(record: Annotated[dict, Body()], conn: Annotated[Connector, Depends(init_connector)],
+                     context: Annotated[InferenceContext, Depends(get_inference_context)]):
+    """Run a test case / step definition generation in the background, the body is the one of the sync routes
+
+    Poll `GET /inference/jobs/{job_id}` or subscribe to `/inference/jobs/{job_id}/ws` for the result.
+    """
+    try:
+        payload = parse_inference_record(record)
+    except ValidationError as ex:
+        raise HTTPException(status_code=422, detail=ex.errors())
+    return get_job_engine().submit(payload, conn, context).to_dict()
+
+
+@router.get("/jobs/{job_id}", tags=["Generation jobs"], response_model=GenerationJobStatus)
+async def get_job(job_id: str, wait: Annotated[float, Query(ge=0, le=30)] = 0):
+    """Status and result of a generation job, `wait` seconds for it to finish"""
+    job = find_job(job_id)
+    if wait:
+        await job.wait(wait)
+    return job.to_dict()
+
+
+@router.delete("/jobs/{job_id}", tags=["Generation jobs"], response_model=GenerationJobStatus)
+async def cancel_job(job_id: str):
+    find_job(job_id)
+    job = await get_job_engine().cancel(job_id)
+    return job.to_dict()
+
+
+@router.websocket("/jobs/{job_id}/ws")
+async def watch_job(websocket: WebSocket, job_id: str):
+    """Send the job status right away, then once it is finished. The job keeps running if the client goes away"""
+    await websocket.accept()
+    job = get_job_engine().get(job_id)
+    if job is None:
+        await websocket.send_json({"job_id": job_id, "error": f"Generation job {job_id} not found"})
+        await websocket.close()
+        return
+    try:
+        await websocket.send_json(jsonable_encoder(job.to_dict()))
+        if not job.finished:
+            await job.wait()
+            await websocket.send_json(jsonable_encoder(job.to_dict()))
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
@@ -4,9 +4,9 @@ from typing import Annotated, Any
 from fastapi import APIRouter, Depends, Body
 
 from ..models.request import ModelInfo
-from ..models.response import ModelStatus
+from ..models.response import ModelStatus, DeploymentJobStatus
 from ..services.endpoint_use import create_model_endpoint, retrieve_available_models, delete_endpoint, \
-    retrieve_endpoint_status
+    retrieve_endpoint_status, retrieve_deployment
 from ..services.sagemaker_models.connector import Connector
 from ..utilities.preparation import init_connector
 
@@ -14,12 +14,18 @@ from ..utilities.preparation import init_connector
 router = APIRouter(prefix="/model")
 
 
-@router.post("/create-endpoint", tags=["Deploy model endpoint"])
-async def build_model_endpoint(model_info: ModelInfo, conn: Annotated[Connector, Depends(init_connector)]) -> str:
+@router.post("/create-endpoint", tags=["Deploy model endpoint"], response_model=DeploymentJobStatus)
+async def build_model_endpoint(model_info: ModelInfo, conn: Annotated[Connector, Depends(init_connector)]):
     response = create_model_endpoint(model_info.endpoint_name, conn)
     return response
 
 
+@router.get("/deployments/{job_id}", tags=["Deploy model endpoint"], response_model=DeploymentJobStatus)
+async def get_deployment_job(job_id: str, conn: Annotated[Connector, Depends(init_connector)]):
+    response = retrieve_deployment(job_id, conn)
+    return response
+
+
 @router.get("/deployed-endpoints", tags=["Get all deployed models"], response_model=list[ModelStatus])
 async def get_deployed_models(conn: Annotated[Connector, Depends(init_connector)]):
     response = retrieve_available_models(conn)
@@ -1,17 +1,15 @@
-import asyncio
-from concurrent.futures.thread import ThreadPoolExecutor
 from typing import Annotated
 
-from fastapi import WebSocket, APIRouter, Depends
+from fastapi import WebSocket, APIRouter, Depends, HTTPException
+from fastapi.encoders import jsonable_encoder
 
 from src.logging_config import LogConfig
+from src.services.endpoint_use import create_model_endpoint
 from src.services.sagemaker_models.connector import Connector
-from src.utilities.preparation import init_connector, create_endpoint_sync, async_retrieve_status
+from src.utilities.preparation import init_connector, async_retrieve_status
 
 router = APIRouter(prefix="/ws/model")
 
-executor = ThreadPoolExecutor()
-
 logger = LogConfig("utils").get_logger()
 
 
@@ -21,9 +19,13 @@ async def make_db(*, websocket: WebSocket, conn: Annotated[Connector, Depends(in
     received_data = await websocket.receive_json()
     model_name = received_data["endpoint_name"]
 
-    loop = asyncio.get_event_loop()
-    loop.run_in_executor(executor, create_endpoint_sync, model_name, conn, websocket)
-    await async_retrieve_status(model_name, conn, websocket)
-    await websocket.close()
-
+    try:
+        job = create_model_endpoint(model_name, conn)
+    except HTTPException as ex:
+        await websocket.send_json({"name": model_name, "error": ex.detail})
+        await websocket.close()
+        return
 
+    await websocket.send_json(jsonable_encoder(job))
+    await async_retrieve_status(model_name, conn, websocket, conn.get_deployment(job["job_id"]))
+    await websocket.close()
@@ -1,4 +1,19 @@
-from fastapi import APIRouter
+from typing import Annotated
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from ..logging_config import get_log_pipeline
+from ..services.admission import get_admission_controller
+from ..services.generation_jobs import get_job_engine
+from ..services.metrics import get_metrics
+from ..services.micro_batching import get_micro_batcher
+from ..services.response_cache import get_response_cache
+from ..services.sagemaker_models.connector import Connector
+from ..services.singleflight import get_single_flight
+from ..services.token_budget import get_token_budget_advisor
+from ..utilities.preparation import get_existing_connector
+from ..utilities.spec_compaction import get_spec_compactor
 
 
 router = APIRouter()
@@ -8,3 +23,38 @@ router = APIRouter()
 def check_app_health():
     pass
 
+
+def collect_stats(conn: Connector | None) -> dict[str, dict]:
+    """Counters of the components, the model cache only once the AWS connection exists"""
+    response_cache = get_response_cache()
+    advisor = get_token_budget_advisor()
+    batcher = get_micro_batcher()
+    compactor = get_spec_compactor()
+    return {"model_cache": conn.model_cache.stats() if conn is not None else None,
+            "response_cache": response_cache.stats() if response_cache is not None else None,
+            "single_flight": get_single_flight().stats(),
+            "logging": get_log_pipeline().stats(),
+            "admission": get_admission_controller().stats(),
+            "jobs": get_job_engine().stats(),
+            "token_budgets": advisor.stats() if advisor is not None else None,
+            "micro_batching": batcher.stats() if batcher is not None else None,
+            "spec_compaction": compactor.stats() if compactor is not None else None}
+
+
+@router.get("/stats", tags=["Stats"])
+def get_stats(conn: Annotated[Connector | None, Depends(get_existing_connector)]):
+    return collect_stats(conn)
+
+
+@router.get("/token-budgets", tags=["Stats"])
+def get_token_budgets():
+    """Learned output lengths and `max_new_tokens` of every task and model"""
+    advisor = get_token_budget_advisor()
+    return advisor.distributions() if advisor is not None else dict()
+
+
+@router.get("/metrics", tags=["Stats"], response_class=PlainTextResponse)
+def get_prometheus_metrics(conn: Annotated[Connector | None, Depends(get_existing_connector)]):
+    """Prometheus metrics: requests, invocation stages and sizes, and the counters of `/stats` as gauges"""
+    return PlainTextResponse(get_metrics().render(collect_stats(conn)),
+                             media_type="text/plain; version=0.0.4; charset=utf-8")
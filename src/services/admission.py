@@ -0,0 +1,197 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from .inference_context import Priority
+from .metrics import get_metrics
+from ..settings import get_settings
+
+
+class AdmissionRejected(Exception):
+    """The wait queue of an endpoint is full"""
+
+    def __init__(self, endpoint_name: str, retry_after: int):
+        super().__init__(f"Endpoint {endpoint_name} is overloaded, retry in {retry_after} seconds")
+        self.endpoint_name = endpoint_name
+        self.retry_after = retry_after
+
+
+class EndpointAdmission:
+    """Concurrency cap and bounded priority queue of one endpoint
+
+    At most `max_concurrency` invocations run at once, the others wait in a queue ordered by priority, then arrival.
+    When the queue is full, a request is rejected right away, unless it has a higher priority than a queued one: the
+    newest queued request of the lowest priority is rejected in its place. Runs on the event loop, so it needs no
+    lock.
+    """
+
+    def __init__(self, endpoint_name: str, max_concurrency: int, max_queue: int, alpha: float = 0.2):
+        """Constructor
+
+        Args:
+            endpoint_name (str): name of the endpoint
+            max_concurrency (int): invocations running at once
+            max_queue (int): invocations waiting for a slot
+            alpha (float, optional): weight of the last invocation in the EWMA of the service time. Defaults to 0.2.
+        """
+        self.endpoint_name = endpoint_name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.alpha = alpha
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.service_seconds = None
+        self._waiters: list[list] = []  # heap of [priority, arrival, future]
+        self._arrivals = itertools.count()
+
+        metrics = get_metrics()
+        self._queue_depth = metrics.admission_queue_depth.labels(endpoint_name)
+        self._wait_seconds = metrics.admission_wait_seconds.labels(endpoint_name)
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Seconds until the queue should have room, from the recent service time"""
+        service_seconds = self.service_seconds or 1.0
+        return max(1, math.ceil(service_seconds * (self.queued + 1) / max(1, self.max_concurrency)))
+
+    async def acquire(self, priority: int = Priority.INTERACTIVE) -> float:
+        """Wait for a slot
+
+        Raises:
+            AdmissionRejected: the queue is full of requests of the same or a higher priority
+
+        Returns:
+            float: time of admission, to pass to `release`
+        """
+        if self.active < self.max_concurrency and not self._waiters:
+            self.active += 1
+            self._admitted(0.0)
+            return time.monotonic()
+
+        if self.queued >= self.max_queue:
+            lowest = max(self._waiters, key=lambda waiter: (waiter[0], waiter[1])) if self._waiters else None
+            if lowest is None or lowest[0] <= priority:
+                self._reject(priority)
+            self._waiters.remove(lowest)
+            heapq.heapify(self._waiters)
+            lowest[2].set_exception(AdmissionRejected(self.endpoint_name, self.retry_after()))
+            self._count_rejection(lowest[0])
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = [priority, next(self._arrivals), future]
+        heapq.heappush(self._waiters, waiter)
+        self._queue_depth.set(self.queued)
+        start = time.monotonic()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+                self._queue_depth.set(self.queued)
+            elif future.done() and not future.cancelled() and future.exception() is None:
+                # the slot was handed over right before the cancellation
+                self._hand_over()
+            raise
+        now = time.monotonic()
+        self._admitted(now - start)
+        return now
+
+    def release(self, admitted_at: float = None) -> None:
+        """Free a slot, handing it to the first queued request"""
+        if admitted_at is not None:
+            service_seconds = time.monotonic() - admitted_at
+            self.service_seconds = service_seconds if self.service_seconds is None \
+                else self.alpha * service_seconds + (1 - self.alpha) * self.service_seconds
+        self._hand_over()
+
+    @asynccontextmanager
+    async def slot(self, priority: int = Priority.INTERACTIVE):
+        admitted_at = await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release(admitted_at)
+
+    def _hand_over(self) -> None:
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self._queue_depth.set(self.queued)
+                future.set_result(None)
+                return
+        self._queue_depth.set(0)
+        self.active -= 1
+
+    def _admitted(self, wait_seconds: float) -> None:
+        self.admitted += 1
+        self.wait_seconds_total += wait_seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+        self._wait_seconds.observe(wait_seconds)
+
+    def _reject(self, priority: int):
+        self._count_rejection(priority)
+        raise AdmissionRejected(self.endpoint_name, self.retry_after())
+
+    def _count_rejection(self, priority: int) -> None:
+        self.rejected += 1
+        get_metrics().admission_rejected.labels(self.endpoint_name, Priority.name_of(priority)).inc()
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "wait_seconds_avg": self.wait_seconds_total / self.admitted if self.admitted else 0.0,
+            "wait_seconds_max": self.wait_seconds_max,
+            "service_seconds": self.service_seconds,
+        }
+
+
+class AdmissionController:
+    """Admission of the invocations of every endpoint"""
+
+    def __init__(self, max_concurrency: int, max_queue: int, endpoint_concurrency: dict[str, int] = None):
+        """Constructor
+
+        Args:
+            max_concurrency (int): invocations running at once on an endpoint
+            max_queue (int): invocations waiting for a slot of an endpoint
+            endpoint_concurrency (dict[str, int], optional): max_concurrency per endpoint name
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.endpoint_concurrency = endpoint_concurrency or dict()
+        self._endpoints: dict[str, EndpointAdmission] = {}
+
+    def get(self, endpoint_name: str) -> EndpointAdmission:
+        admission = self._endpoints.get(endpoint_name)
+        if admission is None:
+            max_concurrency = self.endpoint_concurrency.get(endpoint_name, self.max_concurrency)
+            admission = self._endpoints[endpoint_name] = EndpointAdmission(endpoint_name, max_concurrency,
+                                                                           self.max_queue)
+        return admission
+
+    def stats(self) -> dict[str, dict]:
+        return {name: admission.stats() for name, admission in self._endpoints.items()}
+
+
+@lru_cache()
+def get_admission_controller() -> AdmissionController:
+    settings = get_settings()
+    return AdmissionController(max_concurrency=settings.admission_max_concurrency,
+                               max_queue=settings.admission_queue_size,
+                               endpoint_concurrency=settings.admission_endpoint_concurrency)
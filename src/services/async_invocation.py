@@ -0,0 +1,231 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+
+from .admission import AdmissionRejected, EndpointAdmission, get_admission_controller
+from .inference_context import CacheStatus, InferenceContext, Priority
+from .invocation import get_inference, get_inference_jumpstart, get_inference_jumpstart_stream
+from .micro_batching import get_micro_batcher
+from .providers import aget_provider
+from .response_cache import get_response_cache, payload_key
+from .singleflight import get_single_flight
+from .sagemaker_models.connector import Connector
+from ..logging_config import LogConfig
+from ..utilities.streaming import ClosingStream
+from ..settings import get_settings
+
+logger = LogConfig("async_invocation").get_logger()
+
+
+class EndpointExecutors:
+    """Dedicated, bounded thread pools for the blocking sagemaker runtime calls
+
+    Every endpoint gets its own pool so a slow model can not starve the others, and the event loop only awaits
+    futures instead of running boto3 calls itself.
+    """
+
+    def __init__(self, default_size: int, sizes: dict[str, int] = None):
+        """Constructor
+
+        Args:
+            default_size (int): number of threads of an endpoint pool
+            sizes (dict[str, int], optional): number of threads per endpoint name, overriding the default size
+        """
+        self.default_size = default_size
+        self.sizes = sizes or dict()
+        self._executors: dict[str, ThreadPoolExecutor] = {}
+        self._lock = threading.Lock()
+
+    def get(self, endpoint_name: str) -> ThreadPoolExecutor:
+        executor = self._executors.get(endpoint_name)
+        if executor is not None:
+            return executor
+        with self._lock:
+            if endpoint_name not in self._executors:
+                size = self.sizes.get(endpoint_name, self.default_size)
+                logger.info(f"Creating executor of {size} threads for endpoint {endpoint_name}")
+                self._executors[endpoint_name] = ThreadPoolExecutor(max_workers=size,
+                                                                    thread_name_prefix=f"invoke-{endpoint_name}")
+            return self._executors[endpoint_name]
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executors, self._executors = self._executors, dict()
+        for executor in executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+@functools.lru_cache()
+def get_executors() -> EndpointExecutors:
+    settings = get_settings()
+    return EndpointExecutors(default_size=settings.invocation_pool_size, sizes=settings.endpoint_pool_sizes)
+
+
+async def run_on_endpoint(endpoint_name: str, func, *args):
+    """Run a blocking call on the thread pool of an endpoint and wait for its result without blocking the loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executors().get(endpoint_name), functools.partial(func, *args))
+
+
+async def acquire_admission(endpoint_name: str, priority: int) -> tuple[EndpointAdmission, float]:
+    """Wait for an invocation slot of an endpoint
+
+    Raises:
+        HTTPException: 429 with a `Retry-After` header when the wait queue of the endpoint is full
+
+    Returns:
+        tuple[EndpointAdmission, float]: the admission of the endpoint and the time of admission, to release the slot
+    """
+    admission = get_admission_controller().get(endpoint_name)
+    try:
+        return admission, await admission.acquire(priority)
+    except AdmissionRejected as ex:
+        raise HTTPException(status_code=429, detail=str(ex), headers={"Retry-After": str(ex.retry_after)})
+
+
+@asynccontextmanager
+async def admitted(endpoint_name: str, priority: int = Priority.INTERACTIVE):
+    """Hold an invocation slot of an endpoint, see `acquire_admission`"""
+    admission, admitted_at = await acquire_admission(endpoint_name, priority)
+    try:
+        yield
+    finally:
+        admission.release(admitted_at)
+
+
+async def aget_inference(payload: str, model_name: str, connector: Connector, priority: int = Priority.INTERACTIVE):
+    async with admitted(model_name, priority):
+        return await run_on_endpoint(model_name, get_inference, payload, model_name, connector)
+
+
+async def aget_inference_jumpstart(payload: str, model_name: str, connector: Connector,
+                                   context: InferenceContext = None):
+    """Invoke a jumpstart endpoint
+
+    Deterministic generations are served from the response cache. Concurrent identical invocations of reproducible
+    generations, deterministic or sampled with a fixed seed, share one upstream call, which waits for an invocation
+    slot of the endpoint. With micro-batching enabled, concurrent
+    invocations of the same parameters are merged into one, see `MicroBatcher`. Sets `context.cache_status` to HIT,
+    MISS or BYPASS. Without a context the payload is not known to be reproducible, it is neither cached nor shared.
+
+    Raises:
+        HTTPException: 429 when the endpoint is overloaded, 500 when the invocation failed
+    """
+    context = context or InferenceContext(use_cache=False, coalesce=False)
+    key = payload_key(model_name, payload)
+
+    async def invoke_payload(body: str, priority: int):
+        async with admitted(model_name, priority):
+            return await run_on_endpoint(model_name, get_inference_jumpstart, body, model_name, connector)
+
+    async def invoke():
+        batcher = get_micro_batcher()
+        if batcher is None:
+            return await invoke_payload(payload, context.priority)
+        return await batcher.submit(model_name, payload, invoke_payload, context.priority)
+
+    cache = get_response_cache()
+    if not context.use_cache or cache is None:
+        context.cache_status = CacheStatus.BYPASS
+        if not context.coalesce:
+            # a no-cache request gets its own generation, at its own priority
+            return await invoke()
+        return await get_single_flight().do(key, invoke)
+
+    result = await cache.get(key)
+    if result is not None:
+        context.cache_status = CacheStatus.HIT
+        return result
+
+    context.cache_status = CacheStatus.MISS
+    result = await get_single_flight().do(key, invoke)
+    await cache.put(key, result)
+    return result
+
+
+_END_OF_STREAM = object()
+
+
+async def astream_inference_jumpstart(payload: str, model_name: str, connector: Connector,
+                                      priority: int = Priority.INTERACTIVE) -> ClosingStream:
+    """Invoke an endpoint with a streamed response
+
+    The endpoint is invoked before returning, so admission and invocation errors are raised as `HTTPException` before
+    the first token is sent. The returned stream pulls each token on the thread pool of the endpoint, holds the
+    invocation slot until it ends, and closes the upstream stream when it is closed early (e.g. on client
+    disconnect). Routes also close it in a background task of the response, see `ClosingStream`.
+
+    Returns:
+        ClosingStream: text of the generated tokens
+    """
+    admission, admitted_at = await acquire_admission(model_name, priority)
+    try:
+        tokens = await run_on_endpoint(model_name, get_inference_jumpstart_stream, payload, model_name, connector)
+    except BaseException:
+        admission.release(admitted_at)
+        raise
+
+    async def close():
+        try:
+            if hasattr(tokens, "close"):
+                await run_on_endpoint(model_name, tokens.close)
+        finally:
+            admission.release(admitted_at)
+
+    return ClosingStream(_iterate_on_endpoint(model_name, tokens), close)
+
+
+async def _iterate_on_endpoint(endpoint_name: str, tokens):
+    while True:
+        token = await run_on_endpoint(endpoint_name, next, tokens, _END_OF_STREAM)
+        if token is _END_OF_STREAM:
+            break
+        yield token
+
+
+async def aopenai_predict(messages: list[dict], temperature: float = None,
+                          priority: int = Priority.INTERACTIVE) -> str:
+    """Generate an OpenAI chat completion, admitted like the invocations of an endpoint
+
+    Raises:
+        HTTPException: 429 when too many calls are running, 500 when the call failed
+    """
+    chat = await aget_provider("openai")
+    async with admitted(chat.endpoint_name, priority):
+        try:
+            return await chat.complete(messages, temperature)
+        except RuntimeError as e:
+            logger.exception(e.args[0])
+            raise HTTPException(status_code=500, detail=e.args[0])
+
+
+async def astream_openai(messages: list[dict], temperature: float = None,
+                        priority: int = Priority.INTERACTIVE) -> ClosingStream:
+    """Generate an OpenAI chat completion with a streamed response, see `astream_inference_jumpstart`
+
+    Returns:
+        ClosingStream: text of the generated tokens
+    """
+    chat = await aget_provider("openai")
+    admission, admitted_at = await acquire_admission(chat.endpoint_name, priority)
+    try:
+        tokens = await chat.stream(messages, temperature)
+    except RuntimeError as e:
+        admission.release(admitted_at)
+        logger.exception(e.args[0])
+        raise HTTPException(status_code=500, detail=e.args[0])
+    except BaseException:
+        admission.release(admitted_at)
+        raise
+
+    async def close():
+        try:
+            await tokens.aclose()
+        finally:
+            admission.release(admitted_at)
+
+    return ClosingStream(tokens, close)
@@ -0,0 +1,168 @@
+import asyncio
+import json
+import os
+import re
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from .inference_context import InferenceContext, Priority
+from .model_use import agenerate_testcases_jumpstart, agenerate_step_definition_jumpstart
+from .sagemaker_models.connector import Connector
+from ..logging_config import LogConfig
+from ..models.request import SpecInferencePayload, StepInferencePayload
+from ..settings import get_settings
+
+logger = LogConfig("batch_use").get_logger()
+
+_BATCH_ID = re.compile(r"^[A-Za-z0-9_.-]+$")
+# attempts of a record rejected because its endpoint is overloaded
+_ADMISSION_ATTEMPTS = 5
+
+
+class BatchCheckpoint:
+    """JSONL file of the finished records of a batch
+
+    Successful records are appended as soon as they complete. When a batch is started again with the same checkpoint,
+    their results are replayed and only the remaining (or failed) lines are generated.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # last line of a crashed batch may be partially written
+                        continue
+                    self.done[str(record["id"])] = record
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a")
+
+    @classmethod
+    def for_batch(cls, batch_id: str) -> "BatchCheckpoint":
+        if not _BATCH_ID.match(batch_id):
+            raise HTTPException(status_code=400, detail=f"Invalid batch id {batch_id}")
+        return cls(os.path.join(get_settings().batch_checkpoint_dir, f"{batch_id}.jsonl"))
+
+    def record(self, record: dict) -> None:
+        if record["status"] != "ok":
+            return
+        self.done[str(record["id"])] = record
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def parse_batch_line(line_no: int, line: str) -> tuple[object, SpecInferencePayload | StepInferencePayload]:
+    """Parse one JSONL record into its ID and inference payload
+
+    A record is a `SpecInferencePayload` or a `StepInferencePayload` (when `inputs` has `spec` and `tc`), with an
+    optional `id`. The line number is used as ID when there is none.
+
+    Raises:
+        ValueError: invalid record
+    """
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError("a record must be a JSON object")
+    record_id = record.pop("id", line_no)
+    return record_id, parse_inference_record(record)
+
+
+def parse_inference_record(record: dict) -> SpecInferencePayload | StepInferencePayload:
+    """Parse a `SpecInferencePayload`, or a `StepInferencePayload` when `inputs` has `spec` and `tc`
+
+    Raises:
+        ValidationError: invalid record
+    """
+    if isinstance(record.get("inputs"), dict):
+        return StepInferencePayload.parse_obj(record)
+    return SpecInferencePayload.parse_obj(record)
+
+
+class BatchRunner:
+    """Fan a batch of inference payloads out to the endpoints
+
+    Concurrency is capped per endpoint (`batch_concurrency`, overridden by `batch_endpoint_concurrency`). Results are
+    yielded in completion order, each one tagged with the ID of its input line.
+    """
+
+    def __init__(self, connector: Connector, checkpoint: BatchCheckpoint = None):
+        self.connector = connector
+        self.checkpoint = checkpoint
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+
+    async def run(self, lines):
+        """Run every line of a batch
+
+        Args:
+            lines (Iterable[str]): JSONL records
+
+        Returns:
+            AsyncIterator[dict]: `{"id", "status": "ok", "result"}` or `{"id", "status": "error", "error"}` records
+        """
+        tasks = []
+        for line_no, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            tasks.append(asyncio.create_task(self._run_line(line_no, line)))
+
+        try:
+            for task in asyncio.as_completed(tasks):
+                record = await task
+                if self.checkpoint is not None and not record.pop("replayed", False):
+                    self.checkpoint.record(record)
+                yield record
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _run_line(self, line_no: int, line: str) -> dict:
+        try:
+            record_id, payload = parse_batch_line(line_no, line)
+        except (ValueError, ValidationError) as ex:
+            return {"id": line_no, "status": "error", "error": f"Invalid record: {ex}"}
+
+        if self.checkpoint is not None and str(record_id) in self.checkpoint.done:
+            return {**self.checkpoint.done[str(record_id)], "replayed": True}
+
+        async with self._semaphore(payload.model):
+            try:
+                result = await self._generate(payload)
+            except HTTPException as ex:
+                return {"id": record_id, "status": "error", "error": ex.detail}
+            except Exception as ex:
+                logger.exception(f"Batch record {record_id} failed")
+                return {"id": record_id, "status": "error", "error": str(ex)}
+        return {"id": record_id, "status": "ok", "result": result}
+
+    async def _generate(self, payload: SpecInferencePayload | StepInferencePayload):
+        """Generate at batch priority, waiting and retrying while the endpoint rejects it as overloaded"""
+        for attempt in range(_ADMISSION_ATTEMPTS):
+            # the payloads are modified in place by the generation, retry on a copy
+            attempt_payload = payload.copy(deep=True)
+            context = InferenceContext(priority=Priority.BATCH)
+            try:
+                if isinstance(attempt_payload, StepInferencePayload):
+                    return await agenerate_step_definition_jumpstart(attempt_payload, self.connector, context)
+                return await agenerate_testcases_jumpstart(attempt_payload, self.connector, context)
+            except HTTPException as ex:
+                if ex.status_code != 429 or attempt == _ADMISSION_ATTEMPTS - 1:
+                    raise
+                await asyncio.sleep(float(ex.headers["Retry-After"]))
+
+    def _semaphore(self, model_name: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(model_name)
+        if semaphore is None:
+            settings = get_settings()
+            limit = settings.batch_endpoint_concurrency.get(model_name, settings.batch_concurrency)
+            semaphore = self._semaphores[model_name] = asyncio.Semaphore(limit)
+        return semaphore
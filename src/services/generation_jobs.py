@@ -0,0 +1,190 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+
+from fastapi import HTTPException
+
+from .inference_context import InferenceContext
+from .model_use import agenerate_testcases_jumpstart, agenerate_step_definition_jumpstart
+from .sagemaker_models.connector import Connector
+from ..constants import JobStatus
+from ..logging_config import LogConfig
+from ..models.request import SpecInferencePayload, StepInferencePayload
+from ..settings import get_settings
+
+logger = LogConfig("generation_jobs").get_logger()
+
+
+class GenerationJob:
+    """Test case or step definition generation running in the background"""
+
+    def __init__(self, task: str, model_name: str | None):
+        self.id = uuid.uuid4().hex
+        self.task = task
+        self.model_name = model_name
+        self.status = JobStatus.QUEUED
+        self.result = None
+        self.error = None
+        self.error_status = None
+        self.created_at = datetime.now()
+        self.updated_at = self.created_at
+        self.finished_at = None
+        self.runner: asyncio.Task | None = None
+        self.done = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in JobStatus.FINAL
+
+    def set_status(self, status: str) -> None:
+        self.status = status
+        self.updated_at = datetime.now()
+
+    def finish(self, status: str, result=None, error: str = None, error_status: int = None) -> None:
+        self.result = result
+        self.error = error
+        self.error_status = error_status
+        self.finished_at = time.monotonic()
+        self.set_status(status)
+        self.done.set()
+
+    async def wait(self, timeout: float = None) -> "GenerationJob":
+        """Wait until the job is finished or `timeout` seconds passed, whichever comes first"""
+        try:
+            await asyncio.wait_for(self.done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "task": self.task,
+            "model_name": self.model_name,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "error_status": self.error_status,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class GenerationJobEngine:
+    """Runs generation jobs in the background and keeps their results
+
+    A job runs as its own task, independent of the request that submitted it, so it survives the client going away.
+    At most `workers` jobs generate at once, the others are queued. Finished jobs are kept `ttl` seconds, and at most
+    `max_jobs` jobs are stored: the oldest finished ones are evicted first, and new jobs are rejected with a 429 when
+    every stored job is still running.
+    """
+
+    def __init__(self, workers: int, max_jobs: int, ttl: float):
+        """Constructor
+
+        Args:
+            workers (int): jobs generating at once
+            max_jobs (int): jobs stored, finished or not
+            ttl (float): seconds a finished job is kept
+        """
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self._slots = asyncio.Semaphore(workers)
+        self._jobs: OrderedDict[str, GenerationJob] = OrderedDict()
+
+    def submit(self, payload: SpecInferencePayload | StepInferencePayload, connector: Connector,
+               context: InferenceContext = None) -> GenerationJob:
+        """Queue a generation
+
+        Raises:
+            HTTPException: 429 when the store is full of unfinished jobs
+
+        Returns:
+            GenerationJob: the new job
+        """
+        self._make_room()
+        task = "step-definition" if isinstance(payload, StepInferencePayload) else "testcases"
+        job = GenerationJob(task, payload.model)
+        self._jobs[job.id] = job
+        job.runner = asyncio.create_task(self._run(job, payload, connector, context or InferenceContext()))
+        logger.info(f"Queued {task} generation job {job.id}")
+        return job
+
+    def get(self, job_id: str) -> GenerationJob | None:
+        job = self._jobs.get(job_id)
+        if job is not None and self._expired(job, time.monotonic()):
+            del self._jobs[job_id]
+            return None
+        return job
+
+    async def cancel(self, job_id: str) -> GenerationJob | None:
+        """Cancel a queued or running job, finished jobs are left as they are"""
+        job = self.get(job_id)
+        if job is not None and not job.finished:
+            job.runner.cancel()
+            await job.wait()
+        return job
+
+    async def _run(self, job: GenerationJob, payload, connector: Connector, context: InferenceContext) -> None:
+        try:
+            async with self._slots:
+                job.set_status(JobStatus.RUNNING)
+                if job.task == "step-definition":
+                    result = await agenerate_step_definition_jumpstart(payload, connector, context)
+                else:
+                    result = await agenerate_testcases_jumpstart(payload, connector, context)
+        except asyncio.CancelledError:
+            logger.info(f"Generation job {job.id} was cancelled")
+            job.finish(JobStatus.CANCELLED)
+        except HTTPException as ex:
+            job.finish(JobStatus.FAILED, error=ex.detail, error_status=ex.status_code)
+        except Exception as ex:
+            logger.exception(f"Generation job {job.id} failed")
+            job.finish(JobStatus.FAILED, error=str(ex), error_status=500)
+        else:
+            job.finish(JobStatus.SUCCEEDED, result=result)
+
+    def _expired(self, job: GenerationJob, now: float) -> bool:
+        return job.finished and now - job.finished_at > self.ttl
+
+    def _make_room(self) -> None:
+        now = time.monotonic()
+        for job_id in [job_id for job_id, job in self._jobs.items() if self._expired(job, now)]:
+            del self._jobs[job_id]
+        if len(self._jobs) < self.max_jobs:
+            return
+        oldest_finished = next((job_id for job_id, job in self._jobs.items() if job.finished), None)
+        if oldest_finished is None:
+            raise HTTPException(status_code=429, detail=f"Too many unfinished generation jobs ({self.max_jobs})")
+        del self._jobs[oldest_finished]
+
+    def stats(self) -> dict:
+        statuses = [job.status for job in self._jobs.values()]
+        return {
+            "stored": len(statuses),
+            "queued": statuses.count(JobStatus.QUEUED),
+            "running": statuses.count(JobStatus.RUNNING),
+        }
+
+
+def find_job(job_id: str) -> GenerationJob:
+    """Get a stored job
+
+    Raises:
+        HTTPException: 404 when the job does not exist or its result expired
+    """
+    job = get_job_engine().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Generation job {job_id} not found")
+    return job
+
+
+@lru_cache()
+def get_job_engine() -> GenerationJobEngine:
+    settings = get_settings()
+    return GenerationJobEngine(workers=settings.job_workers, max_jobs=settings.job_store_size,
+                               ttl=settings.job_result_ttl)
@@ -0,0 +1,128 @@
+import asyncio
+import dataclasses
+import hashlib
+import json
+from functools import lru_cache
+
+from fastapi import HTTPException
+
+from .inference_context import InferenceContext
+from .model_use import TESTCASE_PROMPTS, agenerate_testcases_jumpstart
+from .response_cache import MemoryTier, ResponseCache, SqliteTier
+from .sagemaker_models.connector import Connector
+from ..logging_config import LogConfig
+from ..models.request import SpecInferencePayload
+from ..settings import get_settings
+from ..utilities.prompt_registry import get_prompt_registry
+from ..utilities.spec_compaction import load_spec, split_document
+
+logger = LogConfig("incremental_use").get_logger()
+
+
+def split_operations(spec: str) -> dict[str, dict]:
+    """Split an OpenAPI spec (JSON or YAML) into one self-contained spec per operation, see `split_document`
+
+    Raises:
+        ValueError: not an OpenAPI spec with paths
+
+    Returns:
+        dict[str, dict]: spec of every operation, keyed on "METHOD /path", in the order of the spec
+    """
+    document = load_spec(spec)
+    if not isinstance(document, dict) or not isinstance(document.get("paths"), dict):
+        raise ValueError("Invalid OpenAPI spec: it has no paths")
+    return split_document(document)
+
+
+def fingerprint(unit: str, specification: SpecInferencePayload) -> str:
+    """Hash of everything the test cases of an operation depend on: its spec, model, parameters and prompts
+
+    A change of either test case template invalidates every stored operation.
+    """
+    digest = hashlib.sha256(unit.encode("utf-8"))
+    parameters = specification.parameters.json(sort_keys=True) if specification.parameters else ""
+    digest.update(f"\n{specification.model}\n{parameters}\n".encode("utf-8"))
+    prompts = get_prompt_registry()
+    for name in TESTCASE_PROMPTS:
+        digest.update(prompts.text(name).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _fingerprint_operations(specification: SpecInferencePayload) -> list[tuple[str, str, str]]:
+    """Split the spec of a request into its operations, see `split_operations`, and fingerprint them
+
+    Raises:
+        ValueError: not an OpenAPI spec with paths
+
+    Returns:
+        list[tuple[str, str, str]]: name, spec and fingerprint of every operation, in the order of the spec
+    """
+    operations = []
+    for name, unit in split_operations(specification.inputs).items():
+        unit_text = json.dumps(unit, sort_keys=True)
+        operations.append((name, unit_text, fingerprint(unit_text, specification)))
+    return operations
+
+
+async def agenerate_incremental_testcases(specification: SpecInferencePayload, connector: Connector,
+                                          context: InferenceContext = None) -> dict:
+    """Generate the test cases of the new or changed operations of a spec, reuse the stored ones of the others
+
+    Operations are fingerprinted, and the test cases of an operation are stored under its fingerprint. With
+    `context.use_cache` false every operation is regenerated. Operations run at most `incremental_concurrency` at once.
+
+    Raises:
+        HTTPException: 400 when the inputs are not an OpenAPI spec
+
+    Returns:
+        dict: `testcases` of the whole spec, in the order of its operations, the `regenerated`, `reused` and `failed`
+            operations, and the result of every `operation`
+    """
+    context = context or InferenceContext()
+    try:
+        # parsing a large spec takes seconds, it would block the event loop
+        operations = await asyncio.to_thread(_fingerprint_operations, specification)
+    except ValueError as ex:
+        raise HTTPException(status_code=400, detail=str(ex))
+
+    store = get_operation_store()
+    semaphore = asyncio.Semaphore(get_settings().incremental_concurrency)
+
+    async def generate(name: str, unit_text: str, key: str) -> dict:
+        record = {"operation": name, "fingerprint": key}
+        if context.use_cache:
+            stored = await store.get(key)
+            if stored is not None:
+                return {**record, "status": "reused", "testcases": stored}
+
+        operation_spec = SpecInferencePayload(inputs=unit_text, parameters=specification.parameters,
+                                              model=specification.model)
+        async with semaphore:
+            try:
+                testcases = await agenerate_testcases_jumpstart(operation_spec, connector,
+                                                                dataclasses.replace(context))
+            except HTTPException as ex:
+                return {**record, "status": "failed", "error": ex.detail}
+        await store.put(key, testcases)
+        return {**record, "status": "regenerated", "testcases": testcases}
+
+    results = await asyncio.gather(*(generate(name, unit_text, key) for name, unit_text, key in operations))
+    logger.info(f"Incremental generation of {len(results)} operations: "
+                f"{sum(result['status'] == 'regenerated' for result in results)} regenerated")
+    return {
+        "testcases": "\n\n".join(result["testcases"] for result in results if "testcases" in result),
+        "regenerated": [result["operation"] for result in results if result["status"] == "regenerated"],
+        "reused": [result["operation"] for result in results if result["status"] == "reused"],
+        "failed": [result["operation"] for result in results if result["status"] == "failed"],
+        "operations": results,
+    }
+
+
+@lru_cache()
+def get_operation_store() -> ResponseCache:
+    """Test cases of the operations, by fingerprint: a memory LRU over a size-bounded, LRU-evicted sqlite file"""
+    settings = get_settings()
+    disk = None
+    if settings.incremental_store_path:
+        disk = SqliteTier(settings.incremental_store_path, settings.incremental_store_max_bytes)
+    return ResponseCache(MemoryTier(settings.incremental_store_memory_entries), disk, settings.incremental_store_ttl)
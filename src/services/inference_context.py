@@ -0,0 +1,34 @@
+from dataclasses import dataclass
+
+
+class CacheStatus:
+    HIT = "HIT"
+    MISS = "MISS"
+    BYPASS = "BYPASS"
+
+
+class Priority:
+    """Admission priority of an invocation, lower values are admitted first"""
+    INTERACTIVE = 0
+    BATCH = 1
+    NAMES = {"interactive": INTERACTIVE, "batch": BATCH}
+
+    @classmethod
+    def name_of(cls, priority: int) -> str:
+        return next((name for name, value in cls.NAMES.items() if value == priority), str(priority))
+
+
+@dataclass
+class InferenceContext:
+    """Per request options and outcome of an inference, passed from the route down to the invocation layer"""
+    # False when the client opted out of the response cache or the generation is not deterministic
+    use_cache: bool = True
+    # False when the client opted out of the response cache or the generation is not reproducible, its concurrent
+    # identical invocations then each get their own generation
+    coalesce: bool = True
+    # set by the invocation layer, returned to the client in the `X-Cache` header
+    cache_status: str = CacheStatus.BYPASS
+    # queued requests of the endpoint are admitted by priority, then arrival
+    priority: int = Priority.INTERACTIVE
+    # set by the spec compaction, returned to the client in the `X-Spec-Tokens-Saved` header
+    spec_tokens_saved: int = 0
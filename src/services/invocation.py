@@ -1,22 +1,33 @@
-import os
-import traceback
+import time
 
 from fastapi import HTTPException
-from langchain.chat_models import ChatOpenAI
 
+from .metrics import get_metrics
+from ..logging_config import LogConfig
 from .sagemaker_models.connector import Connector
+from .sagemaker_models.routing import EndpointUnavailable
+
+logger = LogConfig("invocation").get_logger()
+
+def _connect(model_name: str, connector: Connector):
+    start = time.perf_counter()
+    model = connector.connect(model_name=model_name,
+                              config_file=None,
+                              force_deploy=False)
+    get_metrics().connect_seconds.observe(time.perf_counter() - start)
+    return model
 
-os.environ["OPENAI_API_KEY"] = ""
 
 def get_inference(payload: str, model_name: str, connector: Connector):
     result = None
     try:
-        model = connector.connect(model_name=model_name,
-                                  config_file=None,
-                                  force_deploy=False)
+        model = _connect(model_name, connector)
         result = model.predict(payload)
+    except EndpointUnavailable as e:
+        logger.warning(e.args[0])
+        raise HTTPException(status_code=503, detail=e.args[0])
     except RuntimeError as e:
-        traceback.print_exc()
+        logger.exception(e.args[0])
         raise HTTPException(status_code=500, detail=e.args[0])
     return result
 
@@ -24,47 +35,74 @@ def get_inference(payload: str, model_name: str, connector: Connector):
 def get_inference_jumpstart(payload: str, model_name: str, connector: Connector):
     result = None
     try:
-        model = connector.connect(model_name=model_name,
-                                  config_file=None,
-                                  force_deploy=False)
+        model = _connect(model_name, connector)
         result = model.predict_jumpstart(payload)
+    except EndpointUnavailable as e:
+        logger.warning(e.args[0])
+        raise HTTPException(status_code=503, detail=e.args[0])
     except RuntimeError as e:
-        traceback.print_exc()
+        logger.exception(e.args[0])
         raise HTTPException(status_code=500, detail=e.args[0])
     return result
 
 
-def openai_predict(temp, inputs):
-    llm = ChatOpenAI(temperature=temp)
-    return llm.predict(inputs)
+def get_inference_jumpstart_stream(payload: str, model_name: str, connector: Connector):
+    result = None
+    try:
+        model = _connect(model_name, connector)
+        result = model.predict_jumpstart_stream(payload)
+    except EndpointUnavailable as e:
+        logger.warning(e.args[0])
+        raise HTTPException(status_code=503, detail=e.args[0])
+    except RuntimeError as e:
+        logger.exception(e.args[0])
+        raise HTTPException(status_code=500, detail=e.args[0])
+    return result
 
 
-def create_endpoint(model_name: str, connector: Connector) -> str:
+def create_endpoint(model_name: str, connector: Connector) -> dict:
     result = None
     try:
-        connector.create_model(model_name=model_name)
-        result = f"Model {model_name} has been successfully deployed."
+        job_id = connector.create_model(model_name=model_name)
+        result = connector.get_deployment(job_id).to_dict()
     except RuntimeError as e:
-        traceback.print_exc()
+        logger.exception(e.args[0])
         raise HTTPException(status_code=500, detail=e.args[0])
     return result
 
 
+def get_deployment(job_id: str, connector: Connector) -> dict:
+    job = connector.get_deployment(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Deployment job {job_id} not found")
+    return job.to_dict()
+
+
 def get_all_endpoints(connector: Connector) -> dict:
     endpoints = None
     try:
         endpoints = connector.get_endpoints()
     except RuntimeError as e:
-        traceback.print_exc()
+        logger.exception(e.args[0])
         raise HTTPException(status_code=500, detail=e.args[0])
     return endpoints
 
 
+def get_endpoint(endpoint_name: str, connector: Connector) -> dict | None:
+    endpoint = None
+    try:
+        endpoint = connector.get_endpoint(endpoint_name)
+    except RuntimeError as e:
+        logger.exception(e.args[0])
+        raise HTTPException(status_code=500, detail=e.args[0])
+    return endpoint
+
+
 def del_endpoint(endpoint_name: str, connector: Connector) -> str:
     try:
         connector.delete_endpoint(endpoint_name)
     except RuntimeError as e:
-        traceback.print_exc()
+        logger.exception(e.args[0])
         raise HTTPException(status_code=500, detail=e.args[0])
     return f"Endpoint {endpoint_name} has been removed"
 
@@ -0,0 +1,263 @@
+import bisect
+import functools
+import math
+import threading
+from abc import ABC, abstractmethod
+
+# latency buckets in seconds, from a cached response to a long generation
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+# payload size buckets in bytes
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Stage:
+    """Stages of an invocation timed by the `stage_seconds` histogram"""
+    MAKE_PROMPT = "make_prompt"
+    SERIALIZATION = "serialization"
+    CONNECT = "connect"
+    INVOKE_ENDPOINT = "invoke_endpoint"
+    PARSE = "parse"
+    COMPACT_SPEC = "compact_spec"
+
+
+class _CounterChild:
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def get(self) -> float:
+        return self._value
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_counts", "_sum", "_lock")
+
+    def __init__(self, bounds: tuple):
+        self._bounds = bounds
+        # the last slot counts the samples above the highest bound
+        self._counts = [0] * (len(bounds) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> tuple[list[int], float]:
+        with self._lock:
+            return list(self._counts), self._sum
+
+
+class _Family(ABC):
+    """A metric and its children, one per combination of label values
+
+    Children are created on first use and never removed. Resolve them once with `labels` and keep them when the
+    label values are known up front.
+    """
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"Metric {self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def children(self) -> list[tuple[tuple, object]]:
+        with self._lock:
+            return list(self._children.items())
+
+    @abstractmethod
+    def _new_child(self):
+        """A child of the metric, for one combination of label values"""
+
+    def _label_text(self, values: tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self.children():
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values: tuple, child) -> list[str]:
+        return [f"{self.name}{self._label_text(values)} {_number(child.get())}"]
+
+
+class Counter(_Family):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+
+class Gauge(_Family):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+
+class Histogram(_Family):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _render_child(self, values: tuple, child) -> list[str]:
+        counts, total = child.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            le = f'le="{_number(bound)}"'
+            lines.append(f"{self.name}_bucket{self._label_text(values, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{self._label_text(values)} {_number(total)}")
+        lines.append(f"{self.name}_count{self._label_text(values)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Metrics of the service, rendered in the Prometheus text exposition format
+
+    Samples are recorded under a per-child lock into preallocated slots, so recording never contends on a global
+    lock and does not allocate once the child exists.
+    """
+
+    def __init__(self):
+        self._families: list[_Family] = []
+        self._lock = threading.Lock()
+
+    def register(self, family: _Family) -> _Family:
+        with self._lock:
+            self._families.append(family)
+        return family
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (),
+                  buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self, stats: dict[str, dict] = None) -> str:
+        """Render all metrics
+
+        Args:
+            stats (dict[str, dict], optional): counters kept by other components (model cache, response cache...),
+                by component. Their numeric values are rendered as `<component>_<key>` gauges.
+
+        Returns:
+            str: metrics in the Prometheus text exposition format
+        """
+        with self._lock:
+            families = list(self._families)
+        lines = []
+        for family in families:
+            lines.extend(family.render())
+        for component, values in (stats or dict()).items():
+            for key, value in (values or dict()).items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"# TYPE {component}_{key} gauge")
+                    lines.append(f"{component}_{key} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class ServiceMetrics(MetricsRegistry):
+    """The metrics recorded by the routes and the invocation path"""
+
+    def __init__(self):
+        super().__init__()
+        self.requests = self.counter("http_requests_total", "HTTP requests by route and status code",
+                                     ("route", "method", "status"))
+        self.requests_in_flight = self.gauge("http_requests_in_flight", "HTTP requests being served by route",
+                                             ("route",))
+        self.request_seconds = self.histogram("http_request_duration_seconds",
+                                              "HTTP request latency by route, streamed bodies included",
+                                              ("route",))
+        self.endpoint_invocations = self.counter("endpoint_invocations_total",
+                                                 "SageMaker invocations by endpoint and outcome",
+                                                 ("endpoint", "outcome"))
+        self.endpoint_in_flight = self.gauge("endpoint_invocations_in_flight",
+                                             "SageMaker invocations waiting for their response, by endpoint",
+                                             ("endpoint",))
+        self.stage_seconds = self.histogram("invocation_stage_duration_seconds",
+                                            "Time spent in each stage of an invocation", ("stage",))
+        self.request_bytes = self.histogram("endpoint_request_bytes", "Size of the invocation payloads",
+                                            ("endpoint",), buckets=SIZE_BUCKETS)
+        self.response_bytes = self.histogram("endpoint_response_bytes", "Size of the invocation responses",
+                                             ("endpoint",), buckets=SIZE_BUCKETS)
+        self.admission_queue_depth = self.gauge("admission_queue_depth",
+                                                "Invocations waiting for a slot, by endpoint", ("endpoint",))
+        self.admission_wait_seconds = self.histogram("admission_wait_seconds",
+                                                     "Time invocations waited for a slot, by endpoint",
+                                                     ("endpoint",))
+        self.admission_rejected = self.counter("admission_rejected_total",
+                                               "Invocations rejected with a 429, by endpoint and priority",
+                                               ("endpoint", "priority"))
+        self.spec_tokens_saved = self.counter("spec_tokens_saved_total",
+                                              "Estimated prompt tokens removed by the spec compaction, by model",
+                                              ("model",))
+
+        # the stage children are known up front, resolve them once
+        self.make_prompt_seconds = self.stage_seconds.labels(Stage.MAKE_PROMPT)
+        self.serialization_seconds = self.stage_seconds.labels(Stage.SERIALIZATION)
+        self.connect_seconds = self.stage_seconds.labels(Stage.CONNECT)
+        self.invoke_endpoint_seconds = self.stage_seconds.labels(Stage.INVOKE_ENDPOINT)
+        self.parse_seconds = self.stage_seconds.labels(Stage.PARSE)
+        self.compact_spec_seconds = self.stage_seconds.labels(Stage.COMPACT_SPEC)
+
+
+@functools.lru_cache()
+def get_metrics() -> ServiceMetrics:
+    return ServiceMetrics()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
@@ -0,0 +1,123 @@
+import asyncio
+import json
+from functools import lru_cache
+
+from fastapi import HTTPException
+
+from .inference_context import Priority
+from ..logging_config import LogConfig
+from ..settings import get_settings
+
+logger = LogConfig("micro_batching").get_logger()
+
+
+class _PendingBatch:
+    def __init__(self, body: dict):
+        self.body = body
+        self.loop = asyncio.get_running_loop()
+        self.requests: list[tuple[list, asyncio.Future]] = []
+        self.timer: asyncio.TimerHandle | None = None
+
+
+class MicroBatcher:
+    """Merge concurrent jumpstart invocations of an endpoint into one multi-dialog invocation
+
+    The jumpstart containers take a list of dialogs and return one generation per dialog. Invocations of the same
+    endpoint and priority whose payloads only differ by their dialogs (same `parameters`) are collected for `window`
+    seconds, or until `max_size` of them are waiting, then sent as one invocation, holding one invocation slot. The
+    generations are split back to their callers, and an error fails every invocation of the batch.
+    """
+
+    def __init__(self, window: float, max_size: int):
+        """Constructor
+
+        Args:
+            window (float): seconds the first invocation of a batch waits for others
+            max_size (int): invocations of a batch, it is sent as soon as it is full
+        """
+        self.window = window
+        self.max_size = max_size
+        self._pending: dict[tuple, _PendingBatch] = {}
+        self._running: set[asyncio.Task] = set()
+        self.batches = 0
+        self.batched = 0
+
+    async def submit(self, model_name: str, payload: str, invoke, priority: int = Priority.INTERACTIVE) -> list:
+        """Invoke an endpoint, batched with the concurrent invocations of the same parameters
+
+        Args:
+            model_name (str): endpoint to invoke
+            payload (str): JSON payload, its `inputs` a list of dialogs
+            invoke (Callable[[str, int], Awaitable[list]]): admitted invocation of a payload of the endpoint at a
+                priority, it invokes the merged payload of the batch
+            priority (int, optional): admission priority. Defaults to Priority.INTERACTIVE.
+
+        Returns:
+            list: the generations of the dialogs of the payload
+        """
+        body = json.loads(payload)
+        dialogs = body.get("inputs") if isinstance(body, dict) else None
+        if not isinstance(dialogs, list) or not dialogs or not all(isinstance(dialog, list) for dialog in dialogs):
+            return await invoke(payload, priority)
+
+        loop = asyncio.get_running_loop()
+        rest = {key: value for key, value in body.items() if key != "inputs"}
+        key = (model_name, priority, json.dumps(rest, sort_keys=True))
+        batch = self._pending.get(key)
+        if batch is None or batch.loop is not loop:
+            batch = self._pending[key] = _PendingBatch(rest)
+            batch.timer = loop.call_later(self.window, self._flush, key, batch, invoke, priority)
+        future = loop.create_future()
+        batch.requests.append((dialogs, future))
+        if len(batch.requests) >= self.max_size:
+            batch.timer.cancel()
+            self._flush(key, batch, invoke, priority)
+        return await future
+
+    def _flush(self, key: tuple, batch: _PendingBatch, invoke, priority: int) -> None:
+        if self._pending.get(key) is batch:
+            del self._pending[key]
+        task = asyncio.ensure_future(self._run(batch, invoke, priority))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: _PendingBatch, invoke, priority: int) -> None:
+        self.batches += 1
+        self.batched += len(batch.requests)
+        payload = json.dumps({"inputs": [dialog for dialogs, _ in batch.requests for dialog in dialogs], **batch.body})
+        try:
+            result = await invoke(payload, priority)
+            dialogs = sum(len(dialogs) for dialogs, _ in batch.requests)
+            if not isinstance(result, list) or len(result) != dialogs:
+                raise HTTPException(status_code=500, detail=f"Failed to predict: {dialogs} dialogs were sent in one "
+                                                            f"invocation but the response is {str(result)[:200]}")
+        except BaseException as ex:
+            for _, future in batch.requests:
+                if not future.done():
+                    if isinstance(ex, asyncio.CancelledError):
+                        future.cancel()
+                    else:
+                        future.set_exception(ex)
+            if not isinstance(ex, Exception):
+                raise
+            return
+
+        if len(batch.requests) > 1:
+            logger.info(f"Invoked {len(batch.requests)} requests in one batch")
+        offset = 0
+        for dialogs, future in batch.requests:
+            if not future.done():
+                future.set_result(result[offset:offset + len(dialogs)])
+            offset += len(dialogs)
+
+    def stats(self) -> dict:
+        return {"batches": self.batches, "batched_requests": self.batched,
+                "pending": sum(len(batch.requests) for batch in self._pending.values())}
+
+
+@lru_cache()
+def get_micro_batcher() -> MicroBatcher | None:
+    settings = get_settings()
+    if not settings.micro_batch_enabled:
+        return None
+    return MicroBatcher(window=settings.micro_batch_window, max_size=settings.micro_batch_max_size)
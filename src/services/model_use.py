@@ -1,31 +1,44 @@
+import asyncio
+import dataclasses
 import json
+import time
 
 from .sagemaker_models.connector import Connector
-from ..logging_config import LogConfig
-from ..models.request import SpecInferencePayload, StepInferencePayload, StepInferenceMlRequest
-from ..services.invocation import get_inference, openai_predict, get_inference_jumpstart
+from ..constants import model_name_of
+from ..logging_config import LogConfig, summarize_payload
+from ..models.request import SpecInferencePayload, SpecParameters, StepInferenceInput, StepInferencePayload, \
+    StepInferenceMlRequest
+from ..services.invocation import get_inference, get_inference_jumpstart
+from ..services.async_invocation import aget_inference_jumpstart, astream_inference_jumpstart, aopenai_predict, \
+    astream_openai
+from ..services.inference_context import CacheStatus, InferenceContext
+from ..services.metrics import get_metrics
+from ..services.response_cache import is_deterministic, is_reproducible
+from ..services.token_budget import get_token_budget_advisor
 from fastapi.encoders import jsonable_encoder
 
-from ..utilities.preparation import read_file, make_prompt, remove_field
+from ..utilities.preparation import remove_field
+from ..utilities.prompt_registry import get_prompt_registry
+from ..utilities.spec_compaction import get_spec_compactor, spec_token_budget
 
 logger = LogConfig("model_use").get_logger()
 
+# templates of the test case generation
+TESTCASE_PROMPTS = ("llama_prompts/prompt_testcase_sys.txt", "llama_prompts/prompt_testcase_query.txt")
+
 
 def prompt_llma_step_definition(api_spec: str, testcase: str):
-    prompt = read_file("src/prompts/llama_prompts/prompt_bdd.txt")
-    prompt = make_prompt(prompt=prompt, input_api=api_spec, input_testcase=testcase)
+    prompt = get_prompt_registry().render("llama_prompts/prompt_bdd.txt", input_api=api_spec, input_testcase=testcase)
     return prompt
 
 
 def prompt_llama_testcases(api_spec: str):
-    prompt = read_file("src/prompts/llama_prompts/prompt_test_plan.txt")
-    prompt = make_prompt(prompt=prompt, input_api=api_spec, input_testcase=None)
+    prompt = get_prompt_registry().render("llama_prompts/prompt_test_plan.txt", input_api=api_spec)
     return prompt
 
 
 def prompt_chatgpt_testcases(api_spec: str):
-    prompt = read_file("src/prompts/chatgpt_prompts/prompt_test_openai.txt")
-    prompt = make_prompt(prompt=prompt, input_api=api_spec, input_testcase=None)
+    prompt = get_prompt_registry().render("chatgpt_prompts/prompt_test_openai.txt", input_api=api_spec)
     return prompt
 
 
@@ -35,20 +48,26 @@ def generate_testcases(specification: SpecInferencePayload, connector: Connector
     payload = jsonable_encoder(specification)
     payload = json.dumps(payload)
     model = specification.model
-    print(f"case payload: {payload}")
-    logger.debug(f"new payload: {payload}")
+    logger.info("Testcase payload: %s", summarize_payload(payload))
     result = get_inference(payload, model, connector)
 
     return result
 
 
-def generate_chatgpt_testcases(specification: SpecInferencePayload, connector: Connector):
+async def agenerate_chatgpt_testcases(specification: SpecInferencePayload, context: InferenceContext = None):
+    context = context or InferenceContext()
     inputs = prompt_chatgpt_testcases(specification.inputs)
-    temperature = specification.parameters.temperature
-    logger.info(f"OpenAI request: {inputs} and temperature {temperature}")
-    result = openai_predict(temp=temperature, inputs=inputs)
+    temperature = specification.parameters.temperature if specification.parameters else None
+    logger.info("OpenAI request: %s and temperature %s", summarize_payload(inputs), temperature)
+    return await aopenai_predict([{"role": "user", "content": inputs}], temperature, context.priority)
 
-    return result
+
+async def astream_chatgpt_testcases(specification: SpecInferencePayload, context: InferenceContext = None):
+    context = context or InferenceContext()
+    inputs = prompt_chatgpt_testcases(specification.inputs)
+    temperature = specification.parameters.temperature if specification.parameters else None
+    logger.info("OpenAI stream request: %s and temperature %s", summarize_payload(inputs), temperature)
+    return await astream_openai([{"role": "user", "content": inputs}], temperature, context.priority)
 
 
 def generate_step_definition(test_plan: StepInferencePayload, connector: Connector):
@@ -60,8 +79,7 @@ def generate_step_definition(test_plan: StepInferencePayload, connector: Connect
 
     payload = jsonable_encoder(inputs_with_prompts)
     payload = json.dumps(payload)
-    print(f"step payload: {payload}")
-    logger.info(f"payload: {payload}")
+    logger.info("Step definition payload: %s", summarize_payload(payload))
     result = get_inference(payload, model, connector)
 
     return result
@@ -83,35 +101,229 @@ def parse_jumpstart_response(response):
     return response[0]['generation']['content']
 
 
-def generate_testcases_jumpstart(specification: SpecInferencePayload, connector: Connector):
+def compact_spec(api_spec: str, model_name: str, context: InferenceContext = None, max_new_tokens: int = None,
+                 prompt_names: tuple[str, ...] = ()) -> list[str]:
+    """Compact the spec of a request, see `SpecCompactor`, and split it when it does not fit in the model context
+
+    The tokens saved are added to `context.spec_tokens_saved`. Inputs that are not an OpenAPI spec are left as they
+    are.
+
+    Args:
+        api_spec (str): spec of the request
+        model_name (str): model the spec is prompted to
+        context (InferenceContext, optional): per request options and outcome. Defaults to None.
+        max_new_tokens (int, optional): tokens generated, the spec is split to leave room for them and the
+            `prompt_names` templates. Defaults to None, never split.
+        prompt_names (tuple[str, ...], optional): templates the spec is rendered in. Defaults to ().
+
+    Returns:
+        list[str]: the compacted spec, or its chunks
+    """
+    compactor = get_spec_compactor()
+    if compactor is None or not isinstance(api_spec, str):
+        return [api_spec]
+    metrics = get_metrics()
+    start = time.perf_counter()
+    compacted = compactor.compact(api_spec)
+    chunks = [compacted.text]
+    if max_new_tokens is not None and compacted.document is not None:
+        prompts = get_prompt_registry()
+        prompt_tokens = sum(compactor.estimate_tokens(prompts.text(name)) for name in prompt_names)
+        budget = spec_token_budget(model_name, max_new_tokens, prompt_tokens)
+        if budget is not None:
+            chunks = compactor.split(compacted, budget)
+    metrics.compact_spec_seconds.observe(time.perf_counter() - start)
+    if compacted.tokens_saved:
+        metrics.spec_tokens_saved.labels(model_name_of(model_name)).inc(compacted.tokens_saved)
+        if context is not None:
+            context.spec_tokens_saved += compacted.tokens_saved
+        logger.info(f"Compacted spec from ~{compacted.tokens_before} to ~{compacted.tokens_after} tokens"
+                    f" in {len(chunks)} chunk(s)")
+    return chunks
+
+
+async def acompact_spec(api_spec: str, model_name: str, context: InferenceContext = None, max_new_tokens: int = None,
+                        prompt_names: tuple[str, ...] = ()) -> list[str]:
+    """`compact_spec` on a worker thread, compacting a large spec takes seconds and would block the event loop"""
+    return await asyncio.to_thread(compact_spec, api_spec, model_name, context, max_new_tokens, prompt_names)
+
+
+def combine_cache_status(statuses: list[str]) -> str:
+    """Cache status of a response made of several generations: their common status, else MISS"""
+    return statuses[0] if len(set(statuses)) == 1 else CacheStatus.MISS
+
+
+def prepare_testcases_jumpstart(specification: SpecInferencePayload, stream: bool = False) -> tuple[str, str]:
+    """Build the jumpstart payload of a test case generation
+
+    Args:
+        specification (SpecInferencePayload): request
+        stream (bool, optional): ask the container to stream the tokens. Defaults to False.
+
+    Returns:
+        tuple[str, str]: model name and JSON payload
+    """
+    metrics = get_metrics()
+    start = time.perf_counter()
     model = specification.model
     remove_field(specification, "model")
     api_spec = specification.inputs
-    sys_prompt = read_file("src/prompts/llama_prompts/prompt_testcase_sys.txt")
-    query_prompt = read_file("src/prompts/llama_prompts/prompt_testcase_query.txt")
-    query_prompt = make_prompt(prompt=query_prompt, input_api=api_spec, input_testcase=None)
+    prompts = get_prompt_registry()
+    sys_prompt = prompts.text("llama_prompts/prompt_testcase_sys.txt")
+    query_prompt = prompts.render("llama_prompts/prompt_testcase_query.txt", input_api=api_spec)
     specification.inputs = build_inputs_jumpstart(query_prompt=query_prompt, system_prompt=sys_prompt)
+    rendered = time.perf_counter()
+    metrics.make_prompt_seconds.observe(rendered - start)
     payload = jsonable_encoder(specification)
+    if stream:
+        payload["stream"] = True
     payload = json.dumps(payload)
-    logger.info(f"Jumpstart testcase payload: {payload}")
-    result = get_inference_jumpstart(payload, model, connector)
-    result = parse_jumpstart_response(result)
-    return result
+    metrics.serialization_seconds.observe(time.perf_counter() - rendered)
+    logger.info("Jumpstart testcase payload: %s", summarize_payload(payload))
+    return model, payload
 
 
-def generate_step_definition_jumpstart(test_plan: StepInferencePayload, connector: Connector):
+def prepare_step_definition_jumpstart(test_plan: StepInferencePayload, stream: bool = False) -> tuple[str, str]:
+    """Build the jumpstart payload of a step definition generation
+
+    Args:
+        test_plan (StepInferencePayload): request
+        stream (bool, optional): ask the container to stream the tokens. Defaults to False.
+
+    Returns:
+        tuple[str, str]: model name and JSON payload
+    """
+    metrics = get_metrics()
+    start = time.perf_counter()
     model = test_plan.model
     remove_field(test_plan, "model")
     spec_input = test_plan.inputs.spec
     testcase_input = test_plan.inputs.tc
-    sys_prompt = read_file("src/prompts/llama_prompts/prompt_bdd_sys.txt")
-    query_prompt = read_file("src/prompts/llama_prompts/prompt_bdd_query.txt")
-    query_prompt = make_prompt(prompt=query_prompt, input_api=spec_input, input_testcase=testcase_input)
+    prompts = get_prompt_registry()
+    sys_prompt = prompts.text("llama_prompts/prompt_bdd_sys.txt")
+    query_prompt = prompts.render("llama_prompts/prompt_bdd_query.txt", input_api=spec_input,
+                                  input_testcase=testcase_input)
     test_plan.inputs = build_inputs_jumpstart(query_prompt=query_prompt, system_prompt=sys_prompt)
+    rendered = time.perf_counter()
+    metrics.make_prompt_seconds.observe(rendered - start)
 
     payload = jsonable_encoder(test_plan)
+    if stream:
+        payload["stream"] = True
     payload = json.dumps(payload)
-    logger.info(f"BDD Jumpstart payload: {payload}")
+    metrics.serialization_seconds.observe(time.perf_counter() - rendered)
+    logger.info("BDD Jumpstart payload: %s", summarize_payload(payload))
+    return model, payload
+
+
+def generate_testcases_jumpstart(specification: SpecInferencePayload, connector: Connector):
+    specification.inputs = compact_spec(specification.inputs, specification.model)[0]
+    model, payload = prepare_testcases_jumpstart(specification)
     result = get_inference_jumpstart(payload, model, connector)
     result = parse_jumpstart_response(result)
     return result
+
+
+def generate_step_definition_jumpstart(test_plan: StepInferencePayload, connector: Connector):
+    _compact_test_plan(test_plan)
+    model, payload = prepare_step_definition_jumpstart(test_plan)
+    result = get_inference_jumpstart(payload, model, connector)
+    result = parse_jumpstart_response(result)
+    return result
+
+
+async def agenerate_testcases_jumpstart(specification: SpecInferencePayload, connector: Connector,
+                                        context: InferenceContext = None):
+    """Generate the test cases of a spec
+
+    A spec too large for the model context is split in chunks of operations, generated concurrently (map-style) and
+    joined in the order of the spec.
+    """
+    context = context or InferenceContext()
+    context.use_cache = context.use_cache and is_deterministic(specification.parameters)
+    context.coalesce = context.coalesce and is_reproducible(specification.parameters)
+    max_new_tokens = (specification.parameters or SpecParameters()).max_new_tokens
+    chunks = await acompact_spec(specification.inputs, specification.model, context, max_new_tokens,
+                                 TESTCASE_PROMPTS)
+    if len(chunks) > 1:
+        logger.info(f"Spec split in {len(chunks)} chunks")
+        contexts = [dataclasses.replace(context) for _ in chunks]
+        results = await asyncio.gather(*(
+            _agenerate_testcases(specification.copy(update={"inputs": chunk}, deep=True), connector, chunk_context)
+            for chunk, chunk_context in zip(chunks, contexts)))
+        context.cache_status = combine_cache_status([chunk_context.cache_status for chunk_context in contexts])
+        return "\n\n".join(results)
+    specification.inputs = chunks[0]
+    return await _agenerate_testcases(specification, connector, context)
+
+
+async def _agenerate_testcases(specification: SpecInferencePayload, connector: Connector, context: InferenceContext):
+    return await _agenerate_adaptive("testcases", specification, prepare_testcases_jumpstart, connector, context)
+
+
+async def agenerate_step_definition_jumpstart(test_plan: StepInferencePayload, connector: Connector,
+                                              context: InferenceContext = None):
+    context = context or InferenceContext()
+    context.use_cache = context.use_cache and is_deterministic(test_plan.parameters)
+    context.coalesce = context.coalesce and is_reproducible(test_plan.parameters)
+    await _acompact_test_plan(test_plan, context)
+    return await _agenerate_adaptive("step-definition", test_plan, prepare_step_definition_jumpstart, connector,
+                                     context)
+
+
+async def _agenerate_adaptive(task: str, request: SpecInferencePayload | StepInferencePayload, prepare,
+                              connector: Connector, context: InferenceContext) -> str:
+    """Generate with the learned `max_new_tokens` when the request leaves it unset, see `TokenBudgetAdvisor`
+
+    A generation truncated by the learned budget is generated again with the default one.
+    """
+    advisor = get_token_budget_advisor()
+    model_name = request.model
+    parameters = request.parameters
+    budget = None
+    if advisor is not None and parameters is not None and "max_new_tokens" not in parameters.__fields_set__:
+        budget = advisor.budget(task, model_name, parameters.max_new_tokens)
+
+    attempt = request
+    if budget is not None:
+        # the request is kept as it is for the retry
+        attempt = request.copy(deep=True)
+        attempt.parameters.max_new_tokens = budget
+    model, payload = prepare(attempt)
+    result = parse_jumpstart_response(await aget_inference_jumpstart(payload, model, connector, context))
+    if budget is not None and advisor.is_truncated(result, budget):
+        logger.info(f"{task} generation truncated at {budget} tokens, generating it with {parameters.max_new_tokens}")
+        advisor.on_truncated(task, model_name)
+        model, payload = prepare(request)
+        result = parse_jumpstart_response(await aget_inference_jumpstart(payload, model, connector, context))
+    # a cached output was already recorded when it was generated
+    if advisor is not None and context.cache_status != CacheStatus.HIT:
+        advisor.observe(task, model_name, result)
+    return result
+
+
+async def astream_testcases_jumpstart(specification: SpecInferencePayload, connector: Connector,
+                                      context: InferenceContext = None):
+    context = context or InferenceContext()
+    specification.inputs = (await acompact_spec(specification.inputs, specification.model, context))[0]
+    model, payload = prepare_testcases_jumpstart(specification, stream=True)
+    return await astream_inference_jumpstart(payload, model, connector, context.priority)
+
+
+async def astream_step_definition_jumpstart(test_plan: StepInferencePayload, connector: Connector,
+                                            context: InferenceContext = None):
+    context = context or InferenceContext()
+    await _acompact_test_plan(test_plan, context)
+    model, payload = prepare_step_definition_jumpstart(test_plan, stream=True)
+    return await astream_inference_jumpstart(payload, model, connector, context.priority)
+
+
+def _compact_test_plan(test_plan: StepInferencePayload, context: InferenceContext = None) -> None:
+    # the step definitions of a test case need the whole spec, it is compacted but never split
+    if isinstance(test_plan.inputs, StepInferenceInput):
+        test_plan.inputs.spec = compact_spec(test_plan.inputs.spec, test_plan.model, context)[0]
+
+
+async def _acompact_test_plan(test_plan: StepInferencePayload, context: InferenceContext = None) -> None:
+    if isinstance(test_plan.inputs, StepInferenceInput):
+        test_plan.inputs.spec = (await acompact_spec(test_plan.inputs.spec, test_plan.model, context))[0]
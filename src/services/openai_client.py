@@ -0,0 +1,114 @@
+import time
+
+import httpx
+import openai
+
+from .metrics import get_metrics
+from ..settings import get_settings
+from ..utilities.streaming import ClosingStream
+
+
+class OpenAIChat:
+    """Chat completions of one OpenAI model over a shared, pooled async HTTP client
+
+    The HTTP client, its connections and TLS sessions are reused by every call. Invocations are recorded in the same
+    metrics as the SageMaker endpoints, under the `openai/<model>` endpoint name.
+    """
+
+    def __init__(self, api_key: str, model: str, base_url: str = None, timeout: float = 120.0, max_retries: int = 2,
+                 pool_size: int = 32):
+        """Constructor
+
+        Args:
+            api_key (str): OpenAI API key
+            model (str): chat model, e.g. gpt-3.5-turbo
+            base_url (str, optional): API URL, e.g. a local stand-in server. Defaults to the OpenAI API.
+            timeout (float, optional): seconds before a call times out. Defaults to 120.0.
+            max_retries (int, optional): retries of the failed calls. Defaults to 2.
+            pool_size (int, optional): connections kept open to the API. Defaults to 32.
+        """
+        self.model = model
+        self.endpoint_name = f"openai/{model}"
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self.client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url or None, timeout=timeout,
+                                         max_retries=max_retries, http_client=httpx.AsyncClient(limits=limits))
+
+    async def complete(self, messages: list[dict], temperature: float = None) -> str:
+        """Generate a chat completion
+
+        Raises:
+            RuntimeError: if failed to predict
+
+        Returns:
+            str: generated text
+        """
+        metrics = get_metrics()
+        in_flight = metrics.endpoint_in_flight.labels(self.endpoint_name)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            response = await self.client.chat.completions.create(model=self.model, messages=messages,
+                                                                  temperature=temperature)
+        except openai.OpenAIError as ex:
+            metrics.endpoint_invocations.labels(self.endpoint_name, "error").inc()
+            raise RuntimeError(f"Failed to predict: {ex}") from ex
+        finally:
+            in_flight.dec()
+        metrics.invoke_endpoint_seconds.observe(time.perf_counter() - start)
+        metrics.endpoint_invocations.labels(self.endpoint_name, "ok").inc()
+        return response.choices[0].message.content
+
+    async def stream(self, messages: list[dict], temperature: float = None):
+        """Generate a chat completion with a streamed response
+
+        The API is called before returning, so errors are raised before the first token. The stream counts as in
+        flight until it is exhausted or closed, closing it early closes the HTTP response.
+
+        Raises:
+            RuntimeError: if failed to predict
+
+        Returns:
+            ClosingStream: text of the generated tokens, as they arrive
+        """
+        metrics = get_metrics()
+        in_flight = metrics.endpoint_in_flight.labels(self.endpoint_name)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            chunks = await self.client.chat.completions.create(model=self.model, messages=messages,
+                                                                temperature=temperature, stream=True)
+        except BaseException as ex:
+            in_flight.dec()
+            metrics.endpoint_invocations.labels(self.endpoint_name, "error").inc()
+            if isinstance(ex, openai.OpenAIError):
+                raise RuntimeError(f"Failed to predict: {ex}") from ex
+            raise
+        # time to the response headers, the tokens arrive afterwards
+        metrics.invoke_endpoint_seconds.observe(time.perf_counter() - start)
+        metrics.endpoint_invocations.labels(self.endpoint_name, "ok").inc()
+
+        async def close():
+            in_flight.dec()
+            await chunks.close()
+
+        return ClosingStream(self._iter_tokens(chunks), close)
+
+    @staticmethod
+    async def _iter_tokens(chunks):
+        try:
+            async for chunk in chunks:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except openai.OpenAIError as ex:
+            raise RuntimeError(f"Failed to predict: {ex}") from ex
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+def make_openai_chat() -> OpenAIChat:
+    """Build the shared chat client, see `providers.get_provider("openai")`"""
+    settings = get_settings()
+    return OpenAIChat(api_key=settings.openai_api_key, model=settings.openai_model,
+                      base_url=settings.openai_base_url, timeout=settings.openai_timeout,
+                      max_retries=settings.openai_max_retries, pool_size=settings.openai_pool_size)
@@ -0,0 +1,81 @@
+import asyncio
+import dataclasses
+import re
+
+from fastapi import HTTPException
+
+from .inference_context import InferenceContext
+from .model_use import agenerate_testcases_jumpstart, agenerate_step_definition_jumpstart
+from .sagemaker_models.connector import Connector
+from ..logging_config import LogConfig
+from ..models.request import PipelineInferencePayload, SpecInferencePayload, StepInferencePayload
+from ..settings import get_settings
+
+logger = LogConfig("pipeline_use").get_logger()
+
+# "Test case 1:", "## TC-2", "**Scenario: ...**", the first line of every test case of a generated test plan
+_TESTCASE_HEADING = re.compile(r"^\s*(?:#+\s*)?(?:\*\*)?\s*(?:test\s*case|tc|scenario)\b", re.IGNORECASE | re.MULTILINE)
+# "1. ...", "2) ...", used when the test plan has no headings
+_NUMBERED_ITEM = re.compile(r"^\s*\d+[.)]\s", re.MULTILINE)
+
+
+def split_testcases(testcases: str) -> list[str]:
+    """Split a generated test plan into its test cases
+
+    Test cases start at a "Test case" / "TC" / "Scenario" heading, or else at a numbered item. The text before the
+    first test case is dropped. A plan without either is a single test case.
+    """
+    for pattern in (_TESTCASE_HEADING, _NUMBERED_ITEM):
+        starts = [match.start() for match in pattern.finditer(testcases)]
+        if starts:
+            bounds = zip(starts, starts[1:] + [len(testcases)])
+            return [testcases[start:end].strip() for start, end in bounds if testcases[start:end].strip()]
+    return [testcases.strip()] if testcases.strip() else []
+
+
+async def agenerate_pipeline_testcases(payload: PipelineInferencePayload, connector: Connector,
+                                       context: InferenceContext = None) -> list[str]:
+    """Generate the test cases of a spec, split one per item
+
+    Raises:
+        HTTPException: the generation failed
+    """
+    specification = SpecInferencePayload(inputs=payload.inputs, parameters=payload.parameters, model=payload.model)
+    testcases = await agenerate_testcases_jumpstart(specification, connector, context)
+    return split_testcases(testcases)
+
+
+async def astream_step_definitions(payload: PipelineInferencePayload, testcases: list[str], connector: Connector,
+                                   context: InferenceContext = None):
+    """Generate the step definitions of every test case, at most `pipeline_concurrency` at once
+
+    Returns:
+        AsyncIterator[dict]: `{"index", "testcase", "status": "ok", "result"}` or `{..., "status": "error", "error"}`
+            records, in completion order
+    """
+    context = context or InferenceContext()
+    semaphore = asyncio.Semaphore(get_settings().pipeline_concurrency)
+
+    async def generate(index: int, testcase: str) -> dict:
+        record = {"index": index, "testcase": testcase}
+        test_plan = StepInferencePayload(inputs={"spec": payload.inputs, "tc": testcase},
+                                         parameters=payload.step_parameters, model=payload.model)
+        async with semaphore:
+            try:
+                # every generation reports its own cache status
+                result = await agenerate_step_definition_jumpstart(test_plan, connector,
+                                                                   dataclasses.replace(context))
+            except HTTPException as ex:
+                return {**record, "status": "error", "error": ex.detail}
+            except Exception as ex:
+                logger.exception(f"Step definition of test case {index} failed")
+                return {**record, "status": "error", "error": str(ex)}
+        return {**record, "status": "ok", "result": result}
+
+    tasks = [asyncio.create_task(generate(index, testcase)) for index, testcase in enumerate(testcases)]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,65 @@
+import asyncio
+import importlib
+import threading
+
+
+class Provider:
+    """Inference backend whose SDK is imported on first use
+
+    Importing an SDK like openai takes longer than starting the rest of the service, so the module of the backend is
+    only imported, and its client built, when a request needs it.
+    """
+
+    def __init__(self, module: str, factory: str):
+        """Constructor
+
+        Args:
+            module (str): module of the backend, relative to this package
+            factory (str): function of the module building the client
+        """
+        self.module = module
+        self.factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._instance is not None
+
+    async def aget(self):
+        """`get` from the event loop, the first call imports the SDK on a worker thread so the loop keeps running"""
+        if self._instance is None:
+            return await asyncio.to_thread(self.get)
+        return self._instance
+
+    def get(self):
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    module = importlib.import_module(self.module, __package__)
+                    self._instance = getattr(module, self.factory)()
+        return self._instance
+
+
+PROVIDERS = {
+    "openai": Provider(".openai_client", "make_openai_chat"),
+}
+
+
+def get_provider(name: str):
+    """Client of an inference backend, e.g. `get_provider("openai")`
+
+    Raises:
+        KeyError: unknown backend
+    """
+    return PROVIDERS[name].get()
+
+
+
+async def aget_provider(name: str):
+    """`get_provider` from the event loop, see `Provider.aget`
+
+    Raises:
+        KeyError: unknown backend
+    """
+    return await PROVIDERS[name].aget()
@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from ..logging_config import LogConfig
+from ..settings import get_settings
+
+logger = LogConfig("response_cache").get_logger()
+
+
+def is_deterministic(parameters) -> bool:
+    """Whether a generation always returns the same output for the same payload
+
+    Sampled generations, and requests without parameters (the container picks a random seed), are not cacheable.
+    """
+    return parameters is not None and not parameters.do_sample
+
+
+def is_reproducible(parameters) -> bool:
+    """Whether identical concurrent generations may share one output: deterministic, or sampled with a fixed seed"""
+    return parameters is not None and (not parameters.do_sample or getattr(parameters, "seed", None) is not None)
+
+
+def payload_key(endpoint_name: str, payload: str) -> str:
+    """Hash of an invocation, the payload is serialized from pydantic models with a fixed field order, so equal
+    requests produce equal payloads"""
+    digest = hashlib.sha256(endpoint_name.encode("utf-8"))
+    digest.update(b"\n")
+    digest.update(payload.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class MemoryTier:
+    """Bounded in-memory LRU of responses"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, object]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: str, value, expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SqliteTier:
+    """Size-bounded on-disk tier of responses, kept across restarts
+
+    Least recently used entries are deleted once the stored responses exceed `max_bytes`.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, size, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, size, expires_at = row
+            if expires_at < now:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._size -= size
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            return value
+
+    def put(self, key: str, value: str, expires_at: float) -> None:
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                               (key, value, size, expires_at, time.time()))
+            self._size += size - (row[0] if row else 0)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def size(self) -> int:
+        return self._size
+
+    def _evict(self) -> None:
+        evicted = []
+        freed = 0
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            if self._size - freed <= self.max_bytes:
+                break
+            evicted.append((key,))
+            freed += size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        self._size -= freed
+        logger.debug(f"Evicted {len(evicted)} responses ({freed} bytes) from {self.path}")
+
+
+class ResponseCache:
+    """Two-tier cache of deterministic generations
+
+    Entries are keyed on `payload_key`, a hash of the endpoint and the rendered payload, which carries the parameters.
+    """
+
+    def __init__(self, memory: MemoryTier, disk: SqliteTier | None, ttl: float):
+        self.memory = memory
+        self.disk = disk
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            stored = await asyncio.to_thread(self.disk.get, key)
+            if stored is not None:
+                value = json.loads(stored)
+                self.memory.put(key, value, time.time() + self.ttl)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def put(self, key: str, value) -> None:
+        expires_at = time.time() + self.ttl
+        self.memory.put(key, value, expires_at)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.put, key, json.dumps(value), expires_at)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "memory_entries": len(self.memory),
+            "disk_bytes": self.disk.size() if self.disk is not None else 0,
+        }
+
+
+@lru_cache()
+def get_response_cache() -> ResponseCache | None:
+    settings = get_settings()
+    if not settings.response_cache_enabled:
+        return None
+    disk = None
+    if settings.response_cache_path:
+        disk = SqliteTier(settings.response_cache_path, settings.response_cache_max_bytes)
+    return ResponseCache(MemoryTier(settings.response_cache_memory_entries), disk, settings.response_cache_ttl)
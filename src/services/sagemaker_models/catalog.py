@@ -0,0 +1,171 @@
+import threading
+import time
+import traceback
+
+from ...logging_config import LogConfig
+from .model_config import ModelConfig
+
+logger = LogConfig("EndpointCatalog").get_logger()
+
+
+class EndpointCatalog:
+    """In-process catalog of sagemaker endpoints and endpoint configs
+
+    The catalog walks every page of `list_endpoint_configs` and `list_endpoints`, and indexes the result by name.
+    A background thread refreshes it every `ttl` seconds, so readers never call the control plane on the request path.
+    Endpoint configs are immutable, hence `describe_endpoint_config` is only called once per config name.
+    """
+
+    def __init__(self, sm_client, ttl: float = 30.0, logger=logger):
+        """Constructor
+
+        Args:
+            sm_client (boto3.client): sagemaker client
+            ttl (float, optional): seconds between two background refreshes. Defaults to 30.0.
+            logger (_type_, optional): logger. Defaults to logger.
+        """
+        self.sm_client = sm_client
+        self.ttl = ttl
+        self.logger = logger
+
+        self._models: dict[str, ModelConfig] = {}
+        self._endpoints: dict[str, dict] = {}
+        self._config_details: dict[str, dict] = {}
+        self._refreshed_at = None
+        self._stale = True
+
+        self._refresh_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._listeners = []
+
+    def start(self) -> None:
+        """Start the background refresher thread if it is not running yet"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="endpoint-catalog-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background refresher thread"""
+        self._stopped.set()
+        self._wakeup.set()
+
+    def add_listener(self, listener) -> None:
+        """Register a callable that receives the new dict[model_name, ModelConfig] after every refresh"""
+        self._listeners.append(listener)
+
+    def invalidate(self) -> None:
+        """Mark the catalog as stale
+
+        The next read refreshes synchronously and the background thread is woken up.
+        """
+        self._stale = True
+        self._wakeup.set()
+
+    def refresh(self) -> dict[str, dict]:
+        """Reload endpoints and endpoint configs from sagemaker
+
+        Raises:
+            RuntimeError: failed to list endpoints or endpoint configs
+
+        Returns:
+            dict[str, dict]: the new endpoints, by name
+        """
+        with self._refresh_lock:
+            self._refresh()
+            return self._endpoints
+
+    def get_models(self) -> dict[str, ModelConfig]:
+        """Get all available models
+
+        Returns:
+            dict[str, ModelConfig]: dict[model_name, ModelConfig] of all available models
+        """
+        self._ensure_fresh()
+        return self._models
+
+    def get_model(self, model_name: str) -> ModelConfig | None:
+        self._ensure_fresh()
+        return self._models.get(model_name)
+
+    def get_endpoints(self) -> list[dict]:
+        """Get all endpoints, sorted by name"""
+        self._ensure_fresh()
+        return list(self._endpoints.values())
+
+    def get_endpoint(self, endpoint_name: str) -> dict | None:
+        self._ensure_fresh()
+        return self._endpoints.get(endpoint_name)
+
+    def _ensure_fresh(self) -> None:
+        self.start()
+        expired = self._refreshed_at is None or time.monotonic() - self._refreshed_at > 2 * self.ttl
+        if not (self._stale or expired):
+            return
+        with self._refresh_lock:
+            # another reader may have refreshed while we were waiting for the lock
+            expired = self._refreshed_at is None or time.monotonic() - self._refreshed_at > 2 * self.ttl
+            if self._stale or expired:
+                self._refresh()
+
+    def _refresh(self) -> None:
+        self._stale = False
+        try:
+            endpoints = self._list_endpoints()
+            config_names = self._list_endpoint_config_names()
+            for name in config_names:
+                if name not in self._config_details:
+                    self._config_details[name] = self.sm_client.describe_endpoint_config(EndpointConfigName=name)
+        except Exception as ex:
+            self._stale = True
+            raise RuntimeError(
+                f"Failed to refresh endpoint catalog: {ex}\nTracback: {traceback.format_exc()}"
+            )
+
+        endpoint_list = list(endpoints.values())
+        models = dict()
+        for name in config_names:
+            models[name] = ModelConfig(self._config_details[name], endpoint_list, self.logger)
+
+        # forget the descriptions of deleted configs
+        for name in set(self._config_details).difference(models):
+            del self._config_details[name]
+
+        # swap the indexes in one go so readers always see a consistent snapshot
+        self._endpoints = endpoints
+        self._models = models
+        self._refreshed_at = time.monotonic()
+        self.logger.debug(f"Endpoint catalog refreshed: {len(models)} configs, {len(endpoints)} endpoints")
+
+        for listener in self._listeners:
+            try:
+                listener(models)
+            except Exception:
+                self.logger.exception("Endpoint catalog listener failed")
+
+    def _list_endpoints(self) -> dict[str, dict]:
+        result = dict()
+        for page in self.sm_client.get_paginator("list_endpoints").paginate(SortBy="Name"):
+            for endpoint in page["Endpoints"]:
+                result[endpoint["EndpointName"]] = endpoint
+        return result
+
+    def _list_endpoint_config_names(self) -> list[str]:
+        result = []
+        for page in self.sm_client.get_paginator("list_endpoint_configs").paginate(NameContains="-"):
+            result.extend(endpoint_config["EndpointConfigName"] for endpoint_config in page["EndpointConfigs"])
+        return result
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.ttl)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self.refresh()
+            except Exception:
+                self.logger.exception("Background refresh of the endpoint catalog failed")
@@ -0,0 +1,62 @@
+from functools import lru_cache
+
+import boto3
+from botocore.config import Config
+
+from ...settings import Settings, get_settings
+
+CONTROL_PLANE = "sagemaker"
+RUNTIME = "sagemaker-runtime"
+
+
+@lru_cache()
+def get_session(aws_profile: str | None = None) -> boto3.Session:
+    """One boto3 session per AWS profile, shared by every connector of the process"""
+    return boto3.Session(profile_name=aws_profile)
+
+
+def build_config(service: str, settings: Settings = None) -> Config:
+    """Botocore config of a sagemaker client
+
+    The runtime client gets a connection pool large enough for the invocation thread pools and a read timeout long
+    enough for big generations, the control plane client short timeouts. Both use adaptive retries and TCP
+    keep-alive.
+
+    Args:
+        service (str): CONTROL_PLANE or RUNTIME
+        settings (Settings, optional): settings. Defaults to get_settings().
+    """
+    settings = settings or get_settings()
+    if service == RUNTIME:
+        pool_size = settings.runtime_pool_size
+        read_timeout = settings.runtime_read_timeout
+        max_attempts = settings.runtime_max_attempts
+    else:
+        pool_size = settings.control_plane_pool_size
+        read_timeout = settings.control_plane_read_timeout
+        max_attempts = settings.control_plane_max_attempts
+    return Config(
+        max_pool_connections=pool_size,
+        connect_timeout=settings.aws_connect_timeout,
+        read_timeout=read_timeout,
+        retries={"mode": settings.aws_retry_mode, "max_attempts": max_attempts},
+        tcp_keepalive=True,
+    )
+
+
+def create_client(service: str, region: str, aws_profile: str | None = None, config: Config = None,
+                  endpoint_url: str = None):
+    """Create a sagemaker client from the shared session of the profile
+
+    Args:
+        service (str): CONTROL_PLANE or RUNTIME
+        region (str): region of sagemaker
+        aws_profile (str | None, optional): AWS profile. Defaults to None.
+        config (Config, optional): botocore config. Defaults to build_config(service).
+        endpoint_url (str, optional): endpoint URL, e.g. of localstack. Defaults to the configured one, if any.
+    """
+    settings = get_settings()
+    if endpoint_url is None:
+        endpoint_url = settings.sagemaker_runtime_endpoint_url if service == RUNTIME else settings.sagemaker_endpoint_url
+    return get_session(aws_profile).client(service, region_name=region, config=config or build_config(service),
+                                           endpoint_url=endpoint_url or None)
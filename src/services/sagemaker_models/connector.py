@@ -1,15 +1,19 @@
 
-import boto3
 import logging
 import traceback
 from datetime import datetime
 
 from ...logging_config import LogConfig
+from ...settings import get_settings
 
 logger = LogConfig("Connector").get_logger()
 
+from .catalog import EndpointCatalog
+from .client_factory import CONTROL_PLANE, RUNTIME, create_client
+from .deployment import DeploymentJob, DeploymentScheduler
 from .model_config import ModelConfig
 from .model import Model
+from .model_cache import ModelCache
 
 
 class Connector:
@@ -25,60 +29,70 @@ class Connector:
             region (str, optional): region of sagemaker. Defaults to "us-east-1".
             logger (_type_, optional): logger. Defaults to logger.
         """
-        session = boto3.Session(profile_name=aws_profile)
-        self.sm_client = session.client("sagemaker", region_name=region)
-        self.smr_client = session.client("sagemaker-runtime", region_name=region)
+        self.sm_client = create_client(CONTROL_PLANE, region, aws_profile)
+        self.smr_client = create_client(RUNTIME, region, aws_profile)
         self.logger = logger
+        self.catalog = EndpointCatalog(self.sm_client, ttl=get_settings().endpoint_catalog_ttl, logger=logger)
+        self.model_cache = ModelCache(idle_ttl=get_settings().model_cache_idle_ttl, logger=logger)
+        self.catalog.add_listener(self.model_cache.sync)
+        self.deployments = DeploymentScheduler(self.sm_client, delete_endpoint=self.delete_endpoint,
+                                               on_change=self.catalog.invalidate,
+                                               min_interval=get_settings().deployment_poll_min_interval,
+                                               max_interval=get_settings().deployment_poll_max_interval,
+                                               logger=logger)
 
     def get_models(self) -> dict[str, ModelConfig]:
-        """Get all available models
+        """Get all available models from the endpoint catalog
 
         Returns:
             dict[str, ModelConfig]: dict[model_name, ModelConfig] of all available models
         """
-        endpoint_configs = self.sm_client.list_endpoint_configs(
-           NameContains="-",
-        )
+        return self.catalog.get_models()
 
-        endpoints = self.get_endpoints()
-
-        endpoint_config_names = [
-            endpoint_config["EndpointConfigName"]
-            for endpoint_config in endpoint_configs["EndpointConfigs"]
-        ]
-
-        self.logger.info(f"Endpoint config names: {endpoint_config_names}")
-
-        result = dict()
-        for name in endpoint_config_names:
-            detail = self.sm_client.describe_endpoint_config(EndpointConfigName=name)
-            model_config = ModelConfig(detail, endpoints, self.logger)
-            result[name] = model_config
-
-        return result
-
-    def get_endpoints(self) -> dict:
-        """Get all available endpoints
+    def get_endpoints(self) -> list[dict]:
+        """Get all available endpoints from the endpoint catalog
         
         Returns:
-            dict: dict of all available endpoints"""
+            list[dict]: list of all available endpoints"""
         try:
-            return self.sm_client.list_endpoints(SortBy="Name")["Endpoints"]
+            return self.catalog.get_endpoints()
         except Exception as ex:
             raise RuntimeError(
                 f"Failed to get endpoints: {ex}\nTracback: {traceback.format_exc()}"
             )
 
-    def create_model(self, model_name: str):
+    def get_endpoint(self, endpoint_name: str) -> dict | None:
+        """Get an endpoint by name from the endpoint catalog
+
+        Returns:
+            dict | None: the endpoint, None if it does not exist"""
+        try:
+            return self.catalog.get_endpoint(endpoint_name)
+        except Exception as ex:
+            raise RuntimeError(
+                f"Failed to get endpoint {endpoint_name}: {ex}\nTracback: {traceback.format_exc()}"
+            )
+
+    def create_model(self, model_name: str) -> str:
         """Deploy model to endpoint
 
+        The deployment runs in the background, concurrent deployments of the same model share one job.
+
         Args:
             model_name (str): model name, must be in available models
 
         Raises:
             RuntimeError: model not found
             RuntimeError: model is already active
+
+        Returns:
+            str: ID of the deployment job
         """
+        model_postfix = "" # datetime.now().strftime("%Y%m%d%H%M%S")
+        job = self.deployments.get_by_endpoint(model_name + model_postfix)
+        if job is not None:
+            return job.id
+
         model_configs = self.get_models()
         if model_name not in model_configs:
             raise RuntimeError(f"Model {model_name} not found")
@@ -87,13 +101,12 @@ class Connector:
         if model_config.is_active:
             raise RuntimeError(f"Model {model_name} is already active")
 
-        model_postfix = "" # datetime.now().strftime("%Y%m%d%H%M%S")
-        self._deploy_model(model_name + model_postfix, model_config.model_name)
+        return self._deploy_model(model_name + model_postfix, model_config.model_name).id
 
     def _deploy_model(
         self, endpoint_name: str, model_name: str, max_wait_time: int = 600, delete_on_fail: bool = True
-    ):
-        """Deploy model to endpoint
+    ) -> DeploymentJob:
+        """Schedule the deployment of a model to an endpoint
 
         Args:
             endpoint_name (str): name of endpoint
@@ -101,43 +114,16 @@ class Connector:
             max_wait_time (int, optional): max waiting time for model ready. Defaults to 600.
             delete_on_fail (bool, optional): delete endpoint if failed to deploy. Defaults to True.
 
-        Raises:
-            RuntimeError: endpoint failed to deploy in max_wait_time seconds
+        Returns:
+            DeploymentJob: the deployment job, its `wait` raises RuntimeError if the endpoint failed to deploy in
+            max_wait_time seconds
         """
-        self.logger.info(f"Deploying model {model_name} to endpoint {endpoint_name}")
-        self.sm_client.create_endpoint(
-            EndpointName=endpoint_name,
-            EndpointConfigName=model_name,
-            Tags=[
-                {"Key": "Name", "Value": endpoint_name},
-                {"Key": "ModelName", "Value": model_name},
-                {"Key": "CreatedBy", "Value": "ModelConnector"},
-                {"Key": "CreatedOn", "Value": datetime.now().strftime("%Y%m%d%H%M%S")},
-            ],
-        )
-
-        # Wait for endpoint to be created
-        self.logger.info(f"Waiting for endpoint {endpoint_name} to be created")
-        start = datetime.now()
-        epoch = 0
-        while True:
-            endpoint = self.sm_client.describe_endpoint(EndpointName=endpoint_name)
-            if endpoint["EndpointStatus"] == "InService":
-                logger.info(f"Endpoint {endpoint_name} is in service")
-                break
-
-            if (datetime.now() - start).seconds > max_wait_time//10 * epoch:
-                self.logger.info(
-                    f"Endpoint {endpoint_name} is still creating, waiting for {max_wait_time - (datetime.now() - start).seconds} seconds"
-                )
-                epoch += 1
-
-            if (datetime.now() - start).seconds > max_wait_time:
-                if delete_on_fail:
-                    self.delete_endpoint(endpoint_name)
-                raise RuntimeError(
-                    f"Endpoint {endpoint_name} failed to deploy in {max_wait_time} seconds"
-                )
+        return self.deployments.submit(endpoint_name, model_name, max_wait_time=max_wait_time,
+                                       delete_on_fail=delete_on_fail)
+
+    def get_deployment(self, job_id: str) -> DeploymentJob | None:
+        """Get a deployment job by ID"""
+        return self.deployments.get(job_id)
 
     def delete_endpoint(self, endpoint_name: str):
         """Delete endpoint
@@ -146,11 +132,18 @@ class Connector:
             endpoint_name (str): name of endpoint
         """
         self.logger.info(f"Deleting endpoint {endpoint_name}")
-        self.sm_client.delete_endpoint(EndpointName=endpoint_name)
+        try:
+            self.sm_client.delete_endpoint(EndpointName=endpoint_name)
+        finally:
+            self.model_cache.evict(endpoint_name)
+            self.catalog.invalidate()
 
     def connect(self, model_name: str, config_file: str = None, force_deploy: bool = False) -> Model:
         """Connect to model
 
+        Handles without a config file are cached by endpoint name, so connecting again to an active model does not
+        repeat any check.
+
         Args:
             model_name (str): name of model, must be in available models
             config_file (str): path to config file
@@ -161,20 +154,28 @@ class Connector:
             RuntimeError: model is not active (when fore_deploy is False)
 
         Returns:
-            _type_: _description_
+            Model: the connected model
         """
-        models = self.get_models()
-        self.logger.debug(f"Models: {models}")
+        if config_file is None:
+            model = self.model_cache.get(model_name)
+            if model is not None:
+                return model
+
+        model_config = self.catalog.get_model(model_name)
+        self.logger.debug(f"Model config: {model_config}")
 
-        if model_name not in models:
+        if model_config is None:
             raise RuntimeError(f"Model {model_name} not found")
-        
-        model_config = models[model_name]
+
         if not model_config.is_active:
             if force_deploy:
-                print(f"Model {model_name} is not active, deploying...")
-                self._deploy_model(model_name, model_name)
+                self.logger.info(f"Model {model_name} is not active, deploying...")
+                self._deploy_model(model_name, model_name).wait()
+                model_config = self.catalog.get_model(model_name)
             else:
                 raise RuntimeError(f"Model {model_name} is not active")
-            
-        return Model(self.smr_client, model_config, config_file)
+
+        model = Model(self.smr_client, model_config, config_file)
+        if config_file is None:
+            self.model_cache.put(model_name, model)
+        return model
@@ -0,0 +1,224 @@
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from ...constants import DeploymentStatus
+from ...logging_config import LogConfig
+
+logger = LogConfig("DeploymentScheduler").get_logger()
+
+
+class DeploymentJob:
+    """Deployment of a model config to an endpoint, driven by the DeploymentScheduler"""
+
+    def __init__(self, endpoint_name: str, model_name: str, max_wait_time: int, delete_on_fail: bool,
+                 min_interval: float):
+        self.id = uuid.uuid4().hex
+        self.endpoint_name = endpoint_name
+        self.model_name = model_name
+        self.max_wait_time = max_wait_time
+        self.delete_on_fail = delete_on_fail
+        self.status = DeploymentStatus.PENDING
+        self.error = None
+        self.created_at = datetime.now()
+        self.updated_at = self.created_at
+
+        self.deadline = time.monotonic() + max_wait_time
+        self.interval = min_interval
+        self.next_poll_at = 0.0
+        self.finished_at = None
+        self.done = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in DeploymentStatus.FINAL
+
+    def wait(self, timeout: float = None) -> "DeploymentJob":
+        """Block until the job is finished
+
+        Raises:
+            RuntimeError: the deployment failed or timed out
+        """
+        self.done.wait(timeout)
+        if self.status != DeploymentStatus.IN_SERVICE:
+            raise RuntimeError(self.error or f"Endpoint {self.endpoint_name} is {self.status}")
+        return self
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "name": self.endpoint_name,
+            "model_name": self.model_name,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class DeploymentScheduler:
+    """Drives every pending deployment from a single background thread
+
+    Jobs are created by `submit` and return right away. The scheduler thread calls `create_endpoint`, then polls
+    `describe_endpoint` for each job with an exponential backoff between `min_interval` and `max_interval`, until
+    the endpoint is `InService`, failed or the job ran out of time (the endpoint is deleted when `delete_on_fail`).
+    Concurrent deployments of the same endpoint share one job.
+    """
+
+    def __init__(self, sm_client, delete_endpoint, on_change=None, min_interval: float = 5.0,
+                 max_interval: float = 30.0, retention: float = 3600.0, logger=logger):
+        """Constructor
+
+        Args:
+            sm_client (boto3.client): sagemaker client
+            delete_endpoint (Callable[[str], None]): deletes an endpoint that failed to deploy
+            on_change (Callable[[], None], optional): called when endpoints were created or became InService
+            min_interval (float, optional): first delay between two polls of a job. Defaults to 5.0.
+            max_interval (float, optional): longest delay between two polls of a job. Defaults to 30.0.
+            retention (float, optional): seconds finished jobs are kept. Defaults to 3600.0.
+            logger (_type_, optional): logger. Defaults to logger.
+        """
+        self.sm_client = sm_client
+        self.delete_endpoint = delete_endpoint
+        self.on_change = on_change or (lambda: None)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.retention = retention
+        self.logger = logger
+
+        self._jobs: dict[str, DeploymentJob] = {}
+        self._active_by_endpoint: dict[str, DeploymentJob] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def submit(self, endpoint_name: str, model_name: str, max_wait_time: int = 600,
+               delete_on_fail: bool = True) -> DeploymentJob:
+        """Schedule the deployment of a model config to an endpoint
+
+        Returns:
+            DeploymentJob: the new job, or the running job of the same endpoint
+        """
+        with self._lock:
+            job = self._active_by_endpoint.get(endpoint_name)
+            if job is not None:
+                self.logger.info(f"Endpoint {endpoint_name} is already being deployed by job {job.id}")
+                return job
+            job = DeploymentJob(endpoint_name, model_name, max_wait_time, delete_on_fail, self.min_interval)
+            self._jobs[job.id] = job
+            self._active_by_endpoint[endpoint_name] = job
+            self._start()
+        self.logger.info(f"Scheduled deployment {job.id} of model {model_name} to endpoint {endpoint_name}")
+        self._wakeup.set()
+        return job
+
+    def get(self, job_id: str) -> DeploymentJob | None:
+        return self._jobs.get(job_id)
+
+    def get_by_endpoint(self, endpoint_name: str) -> DeploymentJob | None:
+        """Get the running job of an endpoint"""
+        return self._active_by_endpoint.get(endpoint_name)
+
+    def _start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="deployment-scheduler", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                active = list(self._active_by_endpoint.values())
+            for job in active:
+                if job.next_poll_at <= now:
+                    self._step(job)
+            self._forget_finished()
+
+            with self._lock:
+                next_poll_at = min((job.next_poll_at for job in self._active_by_endpoint.values()), default=None)
+            timeout = None if next_poll_at is None else max(0.0, next_poll_at - time.monotonic())
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+
+    def _step(self, job: DeploymentJob) -> None:
+        try:
+            if job.status == DeploymentStatus.PENDING:
+                self._create_endpoint(job)
+                self._update(job, DeploymentStatus.CREATING)
+                self.on_change()
+            else:
+                self._poll_endpoint(job)
+        except Exception as ex:
+            if job.status == DeploymentStatus.PENDING:
+                self.logger.exception(f"Failed to create endpoint {job.endpoint_name}")
+                self._update(job, DeploymentStatus.FAILED, error=str(ex))
+                return
+            # throttling or a transient error, try again later unless the job ran out of time
+            self.logger.warning(f"Failed to poll endpoint {job.endpoint_name}: {ex}")
+            if time.monotonic() > job.deadline:
+                self._fail(job, DeploymentStatus.TIMED_OUT,
+                           f"Endpoint {job.endpoint_name} failed to deploy in {job.max_wait_time} seconds")
+                return
+
+        if not job.finished:
+            job.next_poll_at = time.monotonic() + job.interval
+            job.interval = min(job.interval * 2, self.max_interval)
+
+    def _create_endpoint(self, job: DeploymentJob) -> None:
+        self.logger.info(f"Deploying model {job.model_name} to endpoint {job.endpoint_name}")
+        self.sm_client.create_endpoint(
+            EndpointName=job.endpoint_name,
+            EndpointConfigName=job.model_name,
+            Tags=[
+                {"Key": "Name", "Value": job.endpoint_name},
+                {"Key": "ModelName", "Value": job.model_name},
+                {"Key": "CreatedBy", "Value": "ModelConnector"},
+                {"Key": "CreatedOn", "Value": datetime.now().strftime("%Y%m%d%H%M%S")},
+            ],
+        )
+
+    def _poll_endpoint(self, job: DeploymentJob) -> None:
+        endpoint = self.sm_client.describe_endpoint(EndpointName=job.endpoint_name)
+        status = endpoint["EndpointStatus"]
+        if status == DeploymentStatus.IN_SERVICE:
+            self.logger.info(f"Endpoint {job.endpoint_name} is in service")
+            self._update(job, DeploymentStatus.IN_SERVICE)
+            self.on_change()
+        elif status == DeploymentStatus.FAILED:
+            self._fail(job, DeploymentStatus.FAILED,
+                       endpoint.get("FailureReason", f"Endpoint {job.endpoint_name} failed to deploy"))
+        elif time.monotonic() > job.deadline:
+            self._fail(job, DeploymentStatus.TIMED_OUT,
+                       f"Endpoint {job.endpoint_name} failed to deploy in {job.max_wait_time} seconds")
+        else:
+            self.logger.info(f"Endpoint {job.endpoint_name} is still {status}, waiting for "
+                             f"{int(job.deadline - time.monotonic())} seconds")
+
+    def _fail(self, job: DeploymentJob, status: str, error: str) -> None:
+        self.logger.error(error)
+        if job.delete_on_fail:
+            try:
+                self.delete_endpoint(job.endpoint_name)
+            except Exception:
+                self.logger.exception(f"Failed to delete endpoint {job.endpoint_name}")
+        self._update(job, status, error=error)
+
+    def _update(self, job: DeploymentJob, status: str, error: str = None) -> None:
+        job.status = status
+        job.error = error
+        job.updated_at = datetime.now()
+        with self._lock:
+            if job.finished:
+                job.finished_at = time.monotonic()
+                if self._active_by_endpoint.get(job.endpoint_name) is job:
+                    del self._active_by_endpoint[job.endpoint_name]
+        if job.finished:
+            job.done.set()
+
+    def _forget_finished(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for job_id, job in list(self._jobs.items()):
+                if job.finished and now - job.finished_at > self.retention:
+                    del self._jobs[job_id]
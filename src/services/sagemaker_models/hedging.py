@@ -0,0 +1,208 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from functools import lru_cache
+
+from ...settings import get_settings
+from .routing import EndpointUnavailable, RoutingPolicy
+
+
+class HedgeBudget:
+    """Token bucket capping hedges to a share of the invocations
+
+    Every invocation adds `ratio` token, up to `burst`, and every hedge spends one. With `ratio=0.05`, at most about
+    5% of the invocations are duplicated, whatever the latency.
+    """
+
+    def __init__(self, ratio: float, burst: float = 10.0):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+
+    def on_invocation(self) -> None:
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            # tolerance for the rounding of the summed ratios, 20 * 0.05 is below 1
+            if self._tokens < 1 - 1e-9:
+                return False
+            self._tokens -= 1
+            return True
+
+    def refund(self) -> None:
+        """Give back a token spent on a hedge that was not sent"""
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+
+class Hedger:
+    """Hedged invocations of one model
+
+    Once enough latencies were observed, an invocation runs on the hedge executor while the calling thread waits for
+    its result. When it is still running after the `percentile` of the recent latencies of the model, a duplicate
+    (hedge) is sent to another endpoint. The first successful result is returned and the other invocation finishes
+    in the background. The duplicates are capped by a `HedgeBudget`, and the hedged invocations by the threads of the
+    executor: when none is free, the invocation runs unhedged on the calling thread instead of waiting for one.
+    """
+
+    def __init__(self, executor: ThreadPoolExecutor, percentile: float = 95.0, budget: float = 0.05,
+                 min_samples: int = 20, window: int = 256):
+        """Constructor
+
+        Args:
+            executor (ThreadPoolExecutor): threads running the hedged invocations and their hedges
+            percentile (float, optional): percentile of the recent latencies after which a call is hedged.
+                Defaults to 95.0.
+            budget (float, optional): share of the invocations that may be hedged. Defaults to 0.05.
+            min_samples (int, optional): latencies to observe before hedging. Defaults to 20.
+            window (int, optional): recent latencies kept. Defaults to 256.
+        """
+        self.executor = executor
+        self.percentile = percentile
+        self.budget = HedgeBudget(budget)
+        self.min_samples = min_samples
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._latencies = deque(maxlen=window)
+        self._delay = None
+        self._observed = 0
+        self._lock = threading.Lock()
+        # free threads of the executor, a hedged invocation never waits in its queue
+        self._slots = threading.BoundedSemaphore(executor._max_workers)
+
+    def observe(self, latency: float) -> None:
+        with self._lock:
+            self._latencies.append(latency)
+            self._observed += 1
+            # the percentile is recomputed every few samples, not on every call
+            if len(self._latencies) >= self.min_samples and (self._delay is None or self._observed % 16 == 0):
+                ordered = sorted(self._latencies)
+                self._delay = ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))]
+
+    def delay(self) -> float | None:
+        """Seconds after which an invocation is hedged, None while there are too few latencies"""
+        return self._delay
+
+    def run(self, call, router: RoutingPolicy, endpoint_names: list[str]):
+        """Run `call(endpoint_name)` on an endpoint picked by the router, hedged on another one if it is slow
+
+        Raises:
+            Exception: the error of the call, when it failed and it was not hedged or the hedge failed too
+        """
+        self.budget.on_invocation()
+        primary_endpoint = router.choose(endpoint_names)
+        delay = self.delay()
+        if delay is None or not self._slots.acquire(blocking=False):
+            return self._timed(call, primary_endpoint)
+        invocation = _HedgedInvocation()
+        try:
+            self.executor.submit(self._attempt, invocation, call, primary_endpoint, False)
+        except RuntimeError:
+            # the executor is shut down
+            self._slots.release()
+            return self._timed(call, primary_endpoint)
+        if not wait([invocation.future], timeout=delay).done:
+            self._start_hedge(invocation, call, router, endpoint_names, primary_endpoint)
+        return invocation.future.result()
+
+    def _start_hedge(self, invocation: "_HedgedInvocation", call, router: RoutingPolicy, endpoint_names: list[str],
+                     primary_endpoint: str) -> None:
+        # the budget is checked before choosing, a half-open endpoint chosen for a hedge never sent would stay probing
+        if invocation.future.done() or not self.budget.try_spend():
+            return
+        if not self._slots.acquire(blocking=False):
+            self.budget.refund()
+            return
+        try:
+            hedge_endpoint = router.choose(endpoint_names, exclude=(primary_endpoint,))
+        except EndpointUnavailable:
+            self._slots.release()
+            self.budget.refund()
+            return
+        if not invocation.add_attempt():
+            # the original call finished meanwhile
+            router.release(hedge_endpoint)
+            self._slots.release()
+            self.budget.refund()
+            return
+        try:
+            self.executor.submit(self._attempt, invocation, call, hedge_endpoint, True)
+        except RuntimeError:
+            router.release(hedge_endpoint)
+            self._slots.release()
+            self.budget.refund()
+            invocation.abandon_attempt()
+            return
+        self.hedged += 1
+
+    def _attempt(self, invocation: "_HedgedInvocation", call, endpoint_name: str, hedge: bool) -> None:
+        try:
+            result = self._timed(call, endpoint_name)
+        except Exception as ex:
+            invocation.fail(ex, hedge)
+        else:
+            if invocation.succeed(result) and hedge:
+                self.hedge_wins += 1
+        finally:
+            self._slots.release()
+
+    def _timed(self, call, endpoint_name: str):
+        start = time.perf_counter()
+        result = call(endpoint_name)
+        self.observe(time.perf_counter() - start)
+        return result
+
+    def stats(self) -> dict:
+        return {"delay": self._delay, "hedged": self.hedged, "hedge_wins": self.hedge_wins}
+
+
+class _HedgedInvocation:
+    """Outcome of an invocation and its hedge: the first success, else the error of the original call"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.future = Future()
+        self.running = 1
+        self.error: Exception | None = None
+
+    def add_attempt(self) -> bool:
+        """Count a hedge about to be sent, False when the invocation already has its outcome"""
+        with self.lock:
+            if self.future.done():
+                return False
+            self.running += 1
+            return True
+
+    def abandon_attempt(self) -> None:
+        with self.lock:
+            self.running -= 1
+            self._fail_if_over()
+
+    def succeed(self, result) -> bool:
+        """Resolve the invocation, False when another attempt already did"""
+        with self.lock:
+            self.running -= 1
+            if self.future.done():
+                return False
+            self.future.set_result(result)
+            return True
+
+    def fail(self, error: Exception, hedge: bool) -> None:
+        with self.lock:
+            self.running -= 1
+            if not hedge or self.error is None:
+                self.error = error
+            self._fail_if_over()
+
+    def _fail_if_over(self) -> None:
+        if self.running == 0 and not self.future.done():
+            self.future.set_exception(self.error)
+
+
+@lru_cache()
+def get_hedge_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=get_settings().hedge_pool_size, thread_name_prefix="hedge")
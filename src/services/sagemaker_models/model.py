@@ -1,24 +1,50 @@
 import boto3
 import json
+import time
 import yaml
+from contextlib import contextmanager
 
+from ...settings import get_settings
+from ..metrics import get_metrics
+from .hedging import Hedger, get_hedge_executor
 from .model_config import ModelConfig
+from .routing import RoutingPolicy, make_policy
+from .stream import TokenStreamDecoder
 
 
 class Model:
     """Model class
 
-    This class is used to simulate offline model prediction
+    This class is used to simulate offline model prediction.
+    Invocations are spread over all InService endpoints of the model by a routing policy. Slow invocations are hedged
+    on another endpoint when the model has several.
     """
-    def __init__(self, smr_client: boto3.client, model_config: ModelConfig, config_file: str = None):
+    def __init__(
+        self, smr_client: boto3.client, model_config: ModelConfig, config_file: str = None,
+        router: RoutingPolicy = None, hedger: Hedger = None,
+    ):
         """Constructor
 
         Args:
             smr_client (boto3.client): sage maker runtime client
             model_config (ModelConfig): model config
             config_file (str, optional): path to config file. Defaults to None.
+            router (RoutingPolicy, optional): routing policy. Defaults to the `routing_policy` and `breaker_*` settings.
+            hedger (Hedger, optional): hedging of the slow invocations. Defaults to the `hedge_*` settings, None when
+                `hedge_enabled` is false.
         """
+        settings = get_settings()
         self.smr_client = smr_client
+        if router is None:
+            router = make_policy(settings.routing_policy,
+                                 failure_threshold=settings.breaker_failure_threshold,
+                                 open_seconds=settings.breaker_open_seconds,
+                                 slow_call_seconds=settings.breaker_slow_call_seconds)
+        self.router = router
+        if hedger is None and settings.hedge_enabled:
+            hedger = Hedger(get_hedge_executor(), percentile=settings.hedge_percentile, budget=settings.hedge_budget,
+                            min_samples=settings.hedge_min_samples)
+        self.hedger = hedger
         self.model_config = model_config
 
         if config_file is None:
@@ -27,40 +53,84 @@ class Model:
         else:
             self.default_parameters = self._get_default_parameters(config_file)
 
-    def _invoke(self, payload: dict) -> dict:
+    @property
+    def model_config(self) -> ModelConfig:
+        return self._model_config
+
+    @model_config.setter
+    def model_config(self, model_config: ModelConfig) -> None:
+        # endpoints that left service stop being routed to and their counters are dropped
+        self._model_config = model_config
+        self.endpoint_names = [endpoint["EndpointName"] for endpoint in model_config.endpoints]
+        self.router.sync(self.endpoint_names)
+
+    @contextmanager
+    def _route(self, endpoint_name: str = None):
+        """Pick the endpoint of the next invocation and count it as in flight until the block exits
+
+        Args:
+            endpoint_name (str, optional): endpoint already picked, e.g. by the hedger
+
+        Raises:
+            EndpointUnavailable: the model has no InService endpoint, or all of them have an open breaker
+        """
+        if endpoint_name is None:
+            endpoint_name = self.router.choose(self.endpoint_names)
+        with self.router.track(endpoint_name):
+            yield endpoint_name
+
+    def _invoke(self, payload: dict, endpoint_name: str = None) -> dict:
         """Invoke model
 
         Args:
             payload (dict): payload
+            endpoint_name (str, optional): endpoint to invoke. Defaults to the first endpoint.
 
         Returns:
             dict: result
         """
         response = self.smr_client.invoke_endpoint(
-            EndpointName=self.model_config.endpoints[0]["EndpointName"],
+            EndpointName=endpoint_name or self.endpoint_names[0],
             Body=payload,
             ContentType="application/json",
         )
         return response
-    def _invoke_jumpstart(self, payload: dict) -> dict:
+    def _invoke_jumpstart(self, payload: dict, endpoint_name: str = None) -> dict:
         """Invoke model
 
         Args:
             payload (dict): payload
+            endpoint_name (str, optional): endpoint to invoke. Defaults to the first endpoint.
 
         Returns:
             dict: result
         """
         response = self.smr_client.invoke_endpoint(
-            EndpointName=self.model_config.endpoints[0]["EndpointName"],
+            EndpointName=endpoint_name or self.endpoint_names[0],
             Body=payload,
             ContentType="application/json",
             CustomAttributes="accept_eula=true",
         )
         return response
 
+    def _invoke_jumpstart_stream(self, payload: dict, endpoint_name: str = None) -> dict:
+        """Invoke model with a streamed response
+
+        Args:
+            payload (dict): payload
+            endpoint_name (str, optional): endpoint to invoke. Defaults to the first endpoint.
+
+        Returns:
+            dict: result, its `Body` is an event stream of `PayloadPart`
+        """
+        response = self.smr_client.invoke_endpoint_with_response_stream(
+            EndpointName=endpoint_name or self.endpoint_names[0],
+            Body=payload,
+            ContentType="application/json",
+            CustomAttributes="accept_eula=true",
+        )
+        return response
 
-    
     def _get_default_parameters(self, config_file: str) -> dict:
         """Get default parameters from config file (yaml)
 
@@ -87,12 +157,7 @@ class Model:
             dict: prediction result
         """
 
-        result = self._invoke(payload)
-
-        if result["ResponseMetadata"]["HTTPStatusCode"] != 200:
-            raise RuntimeError(f"Failed to predict: {result}")
-        
-        return json.loads(result["Body"].read().decode("utf-8"))
+        return self._hedged_predict(self._invoke, payload)
 
     @staticmethod
     def build_inputs_jumpstart(query_prompt: str, system_prompt: str = None) -> list:
@@ -112,11 +177,127 @@ class Model:
         # payload["parameters"] = self.default_parameters
         # payload["parameters"].update(parameters)
 
-        result = self._invoke_jumpstart(payload)
+        return self._hedged_predict(self._invoke_jumpstart, payload)
+
+    def _hedged_predict(self, invoke, payload) -> dict:
+        """`_predict`, hedged on another endpoint when it is slow and the model has several"""
+        if self.hedger is None or len(self.endpoint_names) < 2:
+            return self._predict(invoke, payload)
+        return self.hedger.run(lambda endpoint_name: self._predict(invoke, payload, endpoint_name),
+                               self.router, self.endpoint_names)
+
+    def _predict(self, invoke, payload, endpoint_name: str = None) -> dict:
+        """Invoke the endpoint picked by the router and parse the response, recording the invocation metrics"""
+        metrics = get_metrics()
+        with self._route(endpoint_name) as endpoint_name:
+            in_flight = metrics.endpoint_in_flight.labels(endpoint_name)
+            in_flight.inc()
+            start = time.perf_counter()
+            try:
+                result = invoke(payload, endpoint_name)
+
+                if result["ResponseMetadata"]["HTTPStatusCode"] != 200:
+                    raise RuntimeError(f"Failed to predict: {result}")
+
+                body = result["Body"].read()
+            except Exception:
+                metrics.endpoint_invocations.labels(endpoint_name, "error").inc()
+                raise
+            finally:
+                in_flight.dec()
+            metrics.invoke_endpoint_seconds.observe(time.perf_counter() - start)
+            metrics.endpoint_invocations.labels(endpoint_name, "ok").inc()
+            metrics.request_bytes.labels(endpoint_name).observe(len(payload))
+            metrics.response_bytes.labels(endpoint_name).observe(len(body))
+
+            start = time.perf_counter()
+            response = json.loads(body.decode("utf-8"))
+            metrics.parse_seconds.observe(time.perf_counter() - start)
+            return response
+
+    def predict_jumpstart_stream(self, payload):
+        """Predict with a streamed response
+
+        The endpoint is invoked right away, so invocation errors are raised before the first token.
+        The invocation counts as in flight on its endpoint until the stream is exhausted or closed.
+
+        Args:
+            payload (str): input dialogs and parameters, with `"stream": true`
+
+        Raises:
+            RuntimeError: if failed to predict (status code != 200)
+
+        Returns:
+            Iterator[str]: text of the generated tokens, as they arrive
+        """
+        metrics = get_metrics()
+        route = self._route()
+        endpoint_name = route.__enter__()
+        in_flight = metrics.endpoint_in_flight.labels(endpoint_name)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            result = self._invoke_jumpstart_stream(payload, endpoint_name)
+
+            if result["ResponseMetadata"]["HTTPStatusCode"] != 200:
+                raise RuntimeError(f"Failed to predict: {result}")
+        except BaseException as ex:
+            in_flight.dec()
+            metrics.endpoint_invocations.labels(endpoint_name, "error").inc()
+            route.__exit__(type(ex), ex, ex.__traceback__)
+            raise
+        # time to the response headers, the tokens arrive afterwards
+        metrics.invoke_endpoint_seconds.observe(time.perf_counter() - start)
+        metrics.endpoint_invocations.labels(endpoint_name, "ok").inc()
+        metrics.request_bytes.labels(endpoint_name).observe(len(payload))
+
+        return _RoutedStream(self._iter_tokens(result["Body"]), route, in_flight)
+
+    @staticmethod
+    def _iter_tokens(event_stream):
+        decoder = TokenStreamDecoder()
+        try:
+            for event in event_stream:
+                if "PayloadPart" in event:
+                    yield from decoder.feed(event["PayloadPart"]["Bytes"])
+                else:
+                    raise RuntimeError(f"Failed to predict: {event}")
+            yield from decoder.flush()
+        finally:
+            event_stream.close()
+
+
+class _RoutedStream:
+    """Token iterator that keeps its invocation in flight until it is exhausted, fails or is closed"""
+
+    def __init__(self, tokens, route, in_flight=None):
+        self._tokens = tokens
+        self._route = route
+        self._in_flight = in_flight
+
+    def __iter__(self):
+        return self
 
-        if result["ResponseMetadata"]["HTTPStatusCode"] != 200:
-            raise RuntimeError(f"Failed to predict: {result}")
+    def __next__(self) -> str:
+        try:
+            return next(self._tokens)
+        except StopIteration:
+            self.close()
+            raise
+        except Exception as ex:
+            self._release(ex)
+            raise
 
-        return json.loads(result["Body"].read().decode("utf-8"))
+    def close(self) -> None:
+        self._tokens.close()
+        self._release(None)
 
+    def _release(self, ex: Exception | None) -> None:
+        if self._route is not None:
+            route, self._route = self._route, None
+            if self._in_flight is not None:
+                self._in_flight.dec()
+            route.__exit__(type(ex) if ex else None, ex, ex.__traceback__ if ex else None)
 
+    def __del__(self):
+        self._release(None)
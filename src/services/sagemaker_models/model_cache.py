@@ -0,0 +1,93 @@
+import threading
+import time
+
+from ...logging_config import LogConfig
+from .model import Model
+from .model_config import ModelConfig
+
+logger = LogConfig("ModelCache").get_logger()
+
+
+class ModelCache:
+    """Cache of connected Model handles keyed by endpoint name
+
+    A handle is evicted when its endpoint leaves `InService` or is deleted, or when it has not been used for
+    `idle_ttl` seconds. Hits and misses are counted so the cache efficiency can be checked in production.
+    """
+
+    def __init__(self, idle_ttl: float = 300.0, logger=logger):
+        """Constructor
+
+        Args:
+            idle_ttl (float, optional): seconds a handle stays cached after it was last used. Defaults to 300.0.
+            logger (_type_, optional): logger. Defaults to logger.
+        """
+        self.idle_ttl = idle_ttl
+        self.logger = logger
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._handles: dict[str, list] = {}  # endpoint name -> [Model, last used]
+        self._lock = threading.Lock()
+
+    def get(self, endpoint_name: str) -> Model | None:
+        """Get a cached handle and refresh its last used time
+
+        Returns:
+            Model | None: the cached handle, None on a miss
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._handles.get(endpoint_name)
+            if entry is not None and now - entry[1] > self.idle_ttl:
+                del self._handles[endpoint_name]
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            entry[1] = now
+            self.hits += 1
+            return entry[0]
+
+    def put(self, endpoint_name: str, model: Model) -> None:
+        with self._lock:
+            self._handles[endpoint_name] = [model, time.monotonic()]
+
+    def evict(self, endpoint_name: str) -> None:
+        """Evict the handle of an endpoint and every handle routing to it"""
+        with self._lock:
+            for name, (model, _) in list(self._handles.items()):
+                endpoint_names = [endpoint["EndpointName"] for endpoint in model.model_config.endpoints]
+                if name == endpoint_name or endpoint_name in endpoint_names:
+                    del self._handles[name]
+                    self.evictions += 1
+                    self.logger.info(f"Evicted model handle {name}")
+
+    def sync(self, models: dict[str, ModelConfig]) -> None:
+        """Reconcile the cached handles with a fresh catalog snapshot
+
+        Handles whose model is gone or no longer `InService` are evicted, the others get the new model config.
+        """
+        now = time.monotonic()
+        with self._lock:
+            for name, entry in list(self._handles.items()):
+                model_config = models.get(name)
+                if model_config is None or not model_config.is_active or now - entry[1] > self.idle_ttl:
+                    del self._handles[name]
+                    self.evictions += 1
+                    self.logger.info(f"Evicted model handle {name}")
+                else:
+                    entry[0].model_config = model_config
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._handles)
+        lookups = self.hits + self.misses
+        return {
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
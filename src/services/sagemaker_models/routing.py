@@ -0,0 +1,239 @@
+import itertools
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+
+class EndpointUnavailable(RuntimeError):
+    """No endpoint of the model can take the invocation"""
+
+
+class CircuitBreaker:
+    """Circuit breaker of one endpoint
+
+    The breaker opens after `failure_threshold` consecutive failures or timeouts, and the endpoint stops receiving
+    invocations. After `open_seconds`, it is half-open: a single probe invocation is let through, its success closes
+    the breaker, its failure opens it again.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, open_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def available(self, now: float) -> bool:
+        if self.state == self.OPEN and now - self.opened_at >= self.open_seconds:
+            self.state = self.HALF_OPEN
+            self._probing = False
+        if self.state == self.HALF_OPEN:
+            return not self._probing
+        return self.state == self.CLOSED
+
+    def on_chosen(self) -> None:
+        if self.state == self.HALF_OPEN:
+            self._probing = True
+
+    def on_released(self) -> None:
+        """The endpoint was chosen but not invoked, a probe it was chosen for can be sent by another invocation"""
+        if self.state == self.HALF_OPEN:
+            self._probing = False
+
+    def record(self, succeeded: bool, now: float) -> None:
+        if succeeded:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probing = False
+            return
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = now
+            self._probing = False
+
+
+class EndpointStats:
+    """Load, latency and circuit breaker of one endpoint"""
+
+    def __init__(self, breaker: CircuitBreaker):
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.ewma_latency = None
+        self.breaker = breaker
+
+    def to_dict(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ewma_latency": self.ewma_latency,
+            "breaker": self.breaker.state,
+        }
+
+
+class RoutingPolicy(ABC):
+    """Pick the endpoint of a model that receives the next invocation
+
+    Subclasses implement `_pick`. The policy keeps per endpoint in-flight counters, an EWMA of the latency and a
+    circuit breaker, updated through `track`, and forgets endpoints as soon as they leave the model's InService
+    endpoints. Endpoints whose breaker is open are skipped.
+    """
+    name = None
+
+    def __init__(self, alpha: float = 0.3, failure_threshold: int = 5, open_seconds: float = 30.0,
+                 slow_call_seconds: float = None):
+        """Constructor
+
+        Args:
+            alpha (float, optional): weight of the last latency in the EWMA. Defaults to 0.3.
+            failure_threshold (int, optional): consecutive failures opening the breaker of an endpoint. Defaults to 5.
+            open_seconds (float, optional): seconds before an open breaker lets a probe through. Defaults to 30.0.
+            slow_call_seconds (float, optional): invocations slower than this count as timeouts for the breaker.
+                Defaults to None, no limit.
+        """
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self._stats: dict[str, EndpointStats] = {}
+        self._lock = threading.Lock()
+
+    def sync(self, endpoint_names: list[str]) -> None:
+        """Forget the endpoints that are not in service anymore"""
+        with self._lock:
+            for name in set(self._stats).difference(endpoint_names):
+                del self._stats[name]
+
+    def choose(self, endpoint_names: list[str], exclude=()) -> str:
+        """Pick one of the endpoints
+
+        Args:
+            endpoint_names (list[str]): InService endpoints of the model
+            exclude (Collection[str], optional): endpoints not to pick, e.g. the one of the call being hedged
+
+        Raises:
+            EndpointUnavailable: there is no endpoint, or the breakers of all of them are open
+        """
+        candidates = [name for name in endpoint_names if name not in exclude]
+        if not candidates:
+            raise EndpointUnavailable("No InService endpoint to route to")
+        with self._lock:
+            now = time.monotonic()
+            available = [name for name in candidates if self._get_stats(name).breaker.available(now)]
+            if not available:
+                raise EndpointUnavailable(f"Endpoints {candidates} are unavailable after repeated failures")
+            name = available[0] if len(available) == 1 else self._pick(available)
+            self._stats[name].breaker.on_chosen()
+            return name
+
+    def release(self, endpoint_name: str) -> None:
+        """Give back an endpoint returned by `choose` that will not be invoked, e.g. its half-open probe"""
+        with self._lock:
+            stats = self._stats.get(endpoint_name)
+            if stats is not None:
+                stats.breaker.on_released()
+
+    def _get_stats(self, endpoint_name: str) -> EndpointStats:
+        stats = self._stats.get(endpoint_name)
+        if stats is None:
+            stats = self._stats[endpoint_name] = EndpointStats(CircuitBreaker(self.failure_threshold,
+                                                                              self.open_seconds))
+        return stats
+
+    @contextmanager
+    def track(self, endpoint_name: str):
+        """Count an invocation as in flight on an endpoint, and record its latency and outcome"""
+        with self._lock:
+            stats = self._get_stats(endpoint_name)
+            stats.in_flight += 1
+        start = time.perf_counter()
+        succeeded = False
+        try:
+            yield
+            succeeded = True
+        finally:
+            latency = time.perf_counter() - start
+            with self._lock:
+                stats.in_flight -= 1
+                stats.requests += 1
+                if succeeded:
+                    stats.ewma_latency = latency if stats.ewma_latency is None \
+                        else self.alpha * latency + (1 - self.alpha) * stats.ewma_latency
+                else:
+                    stats.failures += 1
+                timed_out = self.slow_call_seconds is not None and latency > self.slow_call_seconds
+                stats.breaker.record(succeeded and not timed_out, time.monotonic())
+
+    def stats(self) -> dict[str, dict]:
+        with self._lock:
+            return {name: stats.to_dict() for name, stats in self._stats.items()}
+
+    def _in_flight(self, endpoint_name: str) -> int:
+        stats = self._stats.get(endpoint_name)
+        return stats.in_flight if stats is not None else 0
+
+    @abstractmethod
+    def _pick(self, endpoint_names: list[str]) -> str:
+        """Pick one of the available endpoints, there are at least two"""
+
+
+class RoundRobinPolicy(RoutingPolicy):
+    name = "round_robin"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._counter = itertools.count()
+
+    def _pick(self, endpoint_names: list[str]) -> str:
+        return endpoint_names[next(self._counter) % len(endpoint_names)]
+
+
+class LeastOutstandingPolicy(RoundRobinPolicy):
+    """Endpoint with the fewest in-flight invocations, ties are broken round-robin"""
+    name = "least_outstanding"
+
+    def _pick(self, endpoint_names: list[str]) -> str:
+        offset = next(self._counter)
+        rotated = endpoint_names[offset % len(endpoint_names):] + endpoint_names[:offset % len(endpoint_names)]
+        return min(rotated, key=self._in_flight)
+
+
+class EwmaLatencyPolicy(RoundRobinPolicy):
+    """Endpoint with the lowest EWMA latency weighted by its load, endpoints without latency are tried first"""
+    name = "ewma"
+
+    def _pick(self, endpoint_names: list[str]) -> str:
+        offset = next(self._counter)
+        rotated = endpoint_names[offset % len(endpoint_names):] + endpoint_names[:offset % len(endpoint_names)]
+        return min(rotated, key=self._score)
+
+    def _score(self, endpoint_name: str) -> float:
+        stats = self._stats.get(endpoint_name)
+        if stats is None or stats.ewma_latency is None:
+            return 0.0
+        return stats.ewma_latency * (stats.in_flight + 1)
+
+
+POLICIES = {policy.name: policy for policy in [RoundRobinPolicy, LeastOutstandingPolicy, EwmaLatencyPolicy]}
+
+
+def make_policy(name: str, **kwargs) -> RoutingPolicy:
+    """Create a routing policy by name: round_robin, least_outstanding or ewma
+
+    Args:
+        name (str): name of the policy
+        kwargs: circuit breaker options, see `RoutingPolicy`
+
+    Raises:
+        ValueError: unknown policy
+    """
+    if name not in POLICIES:
+        raise ValueError(f"Unknown routing policy {name}, expected one of {list(POLICIES)}")
+    return POLICIES[name](**kwargs)
@@ -0,0 +1,53 @@
+import json
+
+
+class TokenStreamDecoder:
+    """Incremental decoder of the `PayloadPart` bytes returned by `invoke_endpoint_with_response_stream`
+
+    The text generation containers send one JSON document per line, optionally prefixed by `data:` (server sent
+    events), and a line can be split across several payload parts. `feed` buffers the incomplete line and returns
+    the text of every token completed by the new bytes.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> list[str]:
+        self._buffer.extend(data)
+        tokens = []
+        while True:
+            end = self._buffer.find(b"\n")
+            if end < 0:
+                break
+            line = bytes(self._buffer[:end])
+            del self._buffer[:end + 1]
+            token = self._decode_line(line)
+            if token:
+                tokens.append(token)
+        return tokens
+
+    def flush(self) -> list[str]:
+        line = bytes(self._buffer)
+        self._buffer.clear()
+        token = self._decode_line(line)
+        return [token] if token else []
+
+    @staticmethod
+    def _decode_line(line: bytes) -> str | None:
+        line = line.strip()
+        if line.startswith(b"data:"):
+            line = line[len(b"data:"):].strip()
+        if not line:
+            return None
+
+        document = json.loads(line)
+        if isinstance(document, list):
+            document = document[0] if document else {}
+        token = document.get("token")
+        if token is not None:
+            return None if token.get("special") else token.get("text")
+        # containers streaming the whole generation at once
+        generation = document.get("generation")
+        if isinstance(generation, dict):
+            return generation.get("content")
+        return generation
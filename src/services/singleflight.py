@@ -0,0 +1,47 @@
+import asyncio
+from functools import lru_cache
+
+
+class SingleFlight:
+    """Coalesce identical in-flight calls
+
+    The first call of a key runs as its own task, concurrent calls of the same key wait for that task and share its
+    result or error. A caller being cancelled (e.g. on client disconnect) does not cancel the shared call.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, call):
+        """Run `call()` once for every concurrent caller of `key`
+
+        Args:
+            key (str): key of the call, e.g. a hash of the payload
+            call (Callable[[], Awaitable]): upstream call
+        """
+        task = self._calls.get(key)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # mark the error as retrieved when every caller is gone
+            task.exception()
+
+    def stats(self) -> dict:
+        return {"upstream_calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+
+@lru_cache()
+def get_single_flight() -> SingleFlight:
+    return SingleFlight()
@@ -0,0 +1,132 @@
+import asyncio
+import time
+from collections import defaultdict
+from functools import lru_cache
+
+from .sagemaker_models.connector import Connector
+from ..constants import EndpointStatus
+from ..logging_config import LogConfig
+from ..settings import get_settings
+
+logger = LogConfig("status_watcher").get_logger()
+
+TRANSITIONAL_STATUSES = {"Creating", "Updating", "SystemUpdating", "RollingBack", "Deleting"}
+
+
+class EndpointStatusWatcher:
+    """Process-wide watcher of the status of sagemaker endpoints
+
+    A single asyncio task polls sagemaker (one paginated `list_endpoints`, through the endpoint catalog) for all the
+    subscribers, and pushes every status change to their queues. The poll interval adapts: it drops to
+    `min_interval` after a change and when a transition is expected to finish soon, and doubles up to `max_interval`
+    while every watched endpoint is idle.
+    """
+
+    def __init__(self, connector: Connector, min_interval: float = 5.0, max_interval: float = 60.0,
+                 expected_transition: float = 480.0):
+        """Constructor
+
+        Args:
+            connector (Connector): sagemaker connector
+            min_interval (float, optional): shortest time between two polls. Defaults to 5.0.
+            max_interval (float, optional): longest time between two polls. Defaults to 60.0.
+            expected_transition (float, optional): usual seconds an endpoint stays `Creating`. Defaults to 480.0.
+        """
+        self.connector = connector
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.expected_transition = expected_transition
+        self.polls = 0
+
+        self._subscribers: dict[str, set[asyncio.Queue]] = defaultdict(set)
+        self._statuses: dict[str, tuple[str, float]] = {}  # endpoint name -> (status, observed since)
+        self._task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup: asyncio.Event | None = None
+
+    def subscribe(self, endpoint_name: str) -> asyncio.Queue:
+        """Watch an endpoint, its current status and every change are put on the returned queue as
+        `{"name": ..., "status": ...}`"""
+        queue = asyncio.Queue()
+        self._subscribers[endpoint_name].add(queue)
+        if endpoint_name in self._statuses:
+            queue.put_nowait({"name": endpoint_name, "status": self._statuses[endpoint_name][0]})
+        self._ensure_running()
+        self._wakeup.set()
+        return queue
+
+    def unsubscribe(self, endpoint_name: str, queue: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(endpoint_name)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[endpoint_name]
+            self._statuses.pop(endpoint_name, None)
+
+    def _ensure_running(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        interval = self.min_interval
+        while self._subscribers:
+            self._wakeup.clear()
+            changed = False
+            try:
+                endpoints = await asyncio.to_thread(self.connector.catalog.refresh)
+                self.polls += 1
+                changed = self._publish(endpoints)
+            except Exception:
+                logger.exception("Failed to poll endpoint statuses")
+            interval = self._next_interval(interval, changed)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _publish(self, endpoints: dict[str, dict]) -> bool:
+        now = time.monotonic()
+        changed = False
+        for name, subscribers in list(self._subscribers.items()):
+            endpoint = endpoints.get(name)
+            status = endpoint["EndpointStatus"] if endpoint is not None else EndpointStatus.NONEXISTENT
+            previous = self._statuses.get(name)
+            if previous is not None and previous[0] == status:
+                continue
+            changed = True
+            self._statuses[name] = (status, now)
+            logger.info(f"Endpoint {name} is {status}")
+            for queue in subscribers:
+                queue.put_nowait({"name": name, "status": status})
+        return changed
+
+    def _next_interval(self, interval: float, changed: bool) -> float:
+        if changed:
+            return self.min_interval
+
+        now = time.monotonic()
+        elapsed = [now - since for name, (status, since) in self._statuses.items()
+                   if name in self._subscribers and status in TRANSITIONAL_STATUSES]
+        if any(status == EndpointStatus.NONEXISTENT for status, _ in self._statuses.values()):
+            # an endpoint being created does not show up right away
+            return self.min_interval
+        if not elapsed:
+            return min(interval * 2, self.max_interval)
+
+        remaining = self.expected_transition - max(elapsed)
+        if remaining <= 0.2 * self.expected_transition:
+            return self.min_interval
+        return min(max(remaining / 4, self.min_interval), self.max_interval)
+
+
+@lru_cache()
+def get_status_watcher(connector: Connector) -> EndpointStatusWatcher:
+    settings = get_settings()
+    return EndpointStatusWatcher(connector,
+                                 min_interval=settings.status_watch_min_interval,
+                                 max_interval=settings.status_watch_max_interval,
+                                 expected_transition=settings.endpoint_creation_expected_seconds)
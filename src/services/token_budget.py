@@ -0,0 +1,136 @@
+import math
+import threading
+from collections import deque
+from functools import lru_cache
+
+from ..constants import model_name_of
+from ..settings import get_settings
+
+
+class OutputLengths:
+    """Recent output lengths, in estimated tokens, of one task and model"""
+
+    def __init__(self, window: int):
+        self.samples = deque(maxlen=window)
+        self.observed = 0
+        self.adapted = 0
+        self.truncated = 0
+
+    def percentile(self, percentile: float) -> int:
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+
+class TokenBudgetAdvisor:
+    """`max_new_tokens` of the generations that leave it unset, learned from the output lengths
+
+    The endpoints reserve and schedule by `max_new_tokens`, an oversized budget hurts their batching and latency.
+    Output lengths are recorded per task and model, and once `min_samples` were observed the budget is their
+    `percentile` plus `margin`, rounded up to a multiple of `step` so that it rarely changes the payload, and so its
+    response cache key. A generation that reaches `truncation_ratio` of an adapted budget is taken as truncated.
+    """
+
+    def __init__(self, percentile: float = 99.0, margin: float = 0.25, min_samples: int = 50, window: int = 1024,
+                 truncation_ratio: float = 0.9, chars_per_token: float = 3.0, step: int = 128):
+        """Constructor
+
+        Args:
+            percentile (float, optional): percentile of the output lengths covered by the budget. Defaults to 99.0.
+            margin (float, optional): share added to the percentile. Defaults to 0.25.
+            min_samples (int, optional): output lengths to observe before adapting. Defaults to 50.
+            window (int, optional): recent output lengths kept per task and model. Defaults to 1024.
+            truncation_ratio (float, optional): share of the budget from which an output is taken as truncated.
+                Defaults to 0.9.
+            chars_per_token (float, optional): characters per token of the token count estimate. Defaults to 3.0.
+            step (int, optional): budgets are rounded up to a multiple of it. Defaults to 128.
+        """
+        self.percentile = percentile
+        self.margin = margin
+        self.min_samples = min_samples
+        self.window = window
+        self.truncation_ratio = truncation_ratio
+        self.chars_per_token = chars_per_token
+        self.step = step
+        self._lengths: dict[tuple[str, str], OutputLengths] = dict()
+        self._lock = threading.Lock()
+
+    def estimate_tokens(self, text: str) -> int:
+        return math.ceil(len(text) / self.chars_per_token)
+
+    def observe(self, task: str, model_name: str, output: str) -> None:
+        """Record the length of a complete generation"""
+        with self._lock:
+            lengths = self._lengths_of(task, model_name)
+            lengths.samples.append(self.estimate_tokens(output))
+            lengths.observed += 1
+
+    def budget(self, task: str, model_name: str, default: int) -> int | None:
+        """Adapted `max_new_tokens` of a generation
+
+        Args:
+            task (str): generation, e.g. testcases
+            model_name (str): model generating
+            default (int): budget of the generation when it is not adapted
+
+        Returns:
+            int | None: the budget, None while there are too few output lengths or when it is not below `default`
+        """
+        with self._lock:
+            lengths = self._lengths.get((task, model_name_of(model_name)))
+            if lengths is None or len(lengths.samples) < self.min_samples:
+                return None
+            budget = self._budget_of(lengths)
+            if budget >= default:
+                return None
+            lengths.adapted += 1
+            return budget
+
+    def is_truncated(self, output: str, budget: int) -> bool:
+        return self.estimate_tokens(output) >= budget * self.truncation_ratio
+
+    def on_truncated(self, task: str, model_name: str) -> None:
+        with self._lock:
+            self._lengths_of(task, model_name).truncated += 1
+
+    def _lengths_of(self, task: str, model_name: str) -> OutputLengths:
+        key = (task, model_name_of(model_name))
+        if key not in self._lengths:
+            self._lengths[key] = OutputLengths(self.window)
+        return self._lengths[key]
+
+    def _budget_of(self, lengths: OutputLengths) -> int:
+        budget = lengths.percentile(self.percentile) * (1 + self.margin)
+        return max(self.step, math.ceil(budget / self.step) * self.step)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"distributions": len(self._lengths),
+                    "adapted": sum(lengths.adapted for lengths in self._lengths.values()),
+                    "truncated": sum(lengths.truncated for lengths in self._lengths.values())}
+
+    def distributions(self) -> dict[str, dict[str, dict]]:
+        """Learned output lengths and budget of every task and model, by task then model"""
+        result = dict()
+        with self._lock:
+            for (task, model_name), lengths in self._lengths.items():
+                learned = {"samples": len(lengths.samples), "observed": lengths.observed,
+                           "adapted": lengths.adapted, "truncated": lengths.truncated}
+                if lengths.samples:
+                    learned.update({"p50": lengths.percentile(50), "p90": lengths.percentile(90),
+                                    f"p{self.percentile:g}": lengths.percentile(self.percentile),
+                                    "max": max(lengths.samples)})
+                learned["budget"] = self._budget_of(lengths) if len(lengths.samples) >= self.min_samples else None
+                result.setdefault(task, dict())[model_name] = learned
+        return result
+
+
+@lru_cache()
+def get_token_budget_advisor() -> TokenBudgetAdvisor | None:
+    settings = get_settings()
+    if not settings.adaptive_tokens_enabled:
+        return None
+    return TokenBudgetAdvisor(percentile=settings.adaptive_tokens_percentile, margin=settings.adaptive_tokens_margin,
+                              min_samples=settings.adaptive_tokens_min_samples,
+                              window=settings.adaptive_tokens_window,
+                              truncation_ratio=settings.adaptive_tokens_truncation_ratio,
+                              chars_per_token=settings.spec_chars_per_token)
@@ -0,0 +1,143 @@
+from functools import lru_cache
+
+from pydantic import BaseSettings
+
+
+class Settings(BaseSettings):
+    """Service settings
+
+    Every field can be overridden with an environment variable of the same name (case-insensitive),
+    e.g. `ENDPOINT_CATALOG_TTL=10`.
+    """
+    # logging, see logging_config.py
+    log_level: str = "INFO"
+    # text or json
+    log_format: str = "text"
+    # records waiting for the writer thread, more are dropped
+    log_queue_size: int = 10000
+    # payloads are cut to this many characters in the logs, with their length and hash
+    log_payload_max_chars: int = 512
+    # per logger records per second and share of records kept below WARNING, as JSON: {"model_use": 5}
+    log_rate_limits: dict[str, float] = {}
+    log_sample_rates: dict[str, float] = {}
+    # OpenAI chat completions, see services/openai_client.py. Admitted like an endpoint named openai/<model>
+    openai_api_key: str = ""
+    openai_model: str = "gpt-3.5-turbo"
+    # e.g. a local stand-in server, the OpenAI API when empty
+    openai_base_url: str = ""
+    openai_timeout: float = 120.0
+    openai_max_retries: int = 2
+    openai_pool_size: int = 32
+    # sagemaker clients, see services/sagemaker_models/client_factory.py
+    aws_connect_timeout: float = 5.0
+    aws_retry_mode: str = "adaptive"
+    control_plane_pool_size: int = 10
+    control_plane_read_timeout: float = 30.0
+    control_plane_max_attempts: int = 8
+    # the runtime pool is shared by the invocation thread pools of all endpoints
+    runtime_pool_size: int = 128
+    runtime_read_timeout: float = 300.0
+    runtime_max_attempts: int = 3
+    # e.g. a localstack or a local stand-in server, the AWS endpoints when empty
+    sagemaker_endpoint_url: str = ""
+    sagemaker_runtime_endpoint_url: str = ""
+    # how invocations are spread over the InService endpoints of a model: round_robin, least_outstanding or ewma
+    routing_policy: str = "round_robin"
+    # the breaker of an endpoint opens after this many consecutive failures, or invocations slower than
+    # breaker_slow_call_seconds, and lets a probe through after breaker_open_seconds
+    breaker_failure_threshold: int = 5
+    breaker_open_seconds: float = 30.0
+    breaker_slow_call_seconds: float = 120.0
+    # invocations still running after this percentile of the recent latencies of the model are duplicated on another
+    # endpoint, for at most hedge_budget of the invocations, and the first successful result is returned
+    hedge_enabled: bool = True
+    hedge_percentile: float = 95.0
+    hedge_budget: float = 0.05
+    # latencies observed before the first hedge
+    hedge_min_samples: int = 20
+    # threads running the hedged invocations and their duplicates, shared by all models, when they are all busy
+    # invocations run unhedged on their own thread
+    hedge_pool_size: int = 64
+    # seconds between two background refreshes of the endpoint/config catalog
+    endpoint_catalog_ttl: float = 30.0
+    # seconds a connected model handle stays cached after it was last used
+    model_cache_idle_ttl: float = 300.0
+    # invocations running at once on one endpoint, the others wait in a bounded priority queue
+    admission_max_concurrency: int = 32
+    # per endpoint overrides of admission_max_concurrency, as JSON
+    admission_endpoint_concurrency: dict[str, int] = {}
+    # invocations waiting for a slot of one endpoint, more are rejected with a 429
+    admission_queue_size: int = 256
+    # threads running the blocking sagemaker runtime calls of one endpoint
+    invocation_pool_size: int = 32
+    # per endpoint overrides of invocation_pool_size, as JSON: {"Models-LlaMa-2-70b": 64}
+    endpoint_pool_sizes: dict[str, int] = {}
+    # directory of the prompt templates
+    prompts_dir: str = "src/prompts"
+    # seconds between two checks of a prompt file's modification time
+    prompt_reload_interval: float = 1.0
+    # cache of deterministic (do_sample=false) generations
+    response_cache_enabled: bool = True
+    response_cache_ttl: float = 86400.0
+    response_cache_memory_entries: int = 256
+    # on-disk tier, disabled when empty
+    response_cache_path: str = ".cache/responses.sqlite3"
+    response_cache_max_bytes: int = 256 * 1024 * 1024
+    # generations of a batch running at once on one endpoint
+    batch_concurrency: int = 4
+    # per endpoint overrides of batch_concurrency, as JSON
+    batch_endpoint_concurrency: dict[str, int] = {}
+    # test cases of the operations of /inference/testcases/incremental, by fingerprint
+    incremental_concurrency: int = 8
+    incremental_store_ttl: float = 30 * 86400.0
+    incremental_store_memory_entries: int = 1024
+    # on-disk tier, disabled when empty
+    incremental_store_path: str = ".cache/operations.sqlite3"
+    incremental_store_max_bytes: int = 128 * 1024 * 1024
+    # specs are minified, stripped of these fields and their components deduplicated before they are prompted, a
+    # trailing * matches a prefix
+    spec_compaction_enabled: bool = True
+    spec_strip_fields: list[str] = ["description", "example", "examples", "externalDocs", "x-*"]
+    # compactions and splits kept by spec hash, the requests of the same spec compact it once
+    spec_compaction_cache_entries: int = 16
+    # characters per token of the fast token count estimates, of the specs and of the generated outputs
+    spec_chars_per_token: float = 3.0
+    # context window of the models, as JSON, a spec that does not fit in it is split in chunks of operations
+    model_context_tokens: dict[str, int] = {}
+    default_context_tokens: int = 4096
+    # max_new_tokens of the generations leaving it unset: the adaptive_tokens_percentile of the recent output lengths of
+    # the task and model plus adaptive_tokens_margin, once adaptive_tokens_min_samples were observed
+    adaptive_tokens_enabled: bool = True
+    adaptive_tokens_percentile: float = 99.0
+    adaptive_tokens_margin: float = 0.25
+    adaptive_tokens_min_samples: int = 50
+    adaptive_tokens_window: int = 1024
+    # an output reaching this share of its adapted budget is taken as truncated, and generated again with the default
+    adaptive_tokens_truncation_ratio: float = 0.9
+    # concurrent jumpstart invocations of an endpoint with the same parameters are sent as one multi-dialog invocation,
+    # collected for micro_batch_window seconds or until micro_batch_max_size of them wait
+    micro_batch_enabled: bool = False
+    micro_batch_window: float = 0.01
+    micro_batch_max_size: int = 8
+    # step definitions of one /inference/pipeline request generated at once
+    pipeline_concurrency: int = 8
+    # generation jobs of /inference/jobs running at once, the others are queued
+    job_workers: int = 16
+    # jobs kept, and seconds the result of a finished job is kept
+    job_store_size: int = 1000
+    job_result_ttl: float = 3600.0
+    # directory of the checkpoints of resumable batches
+    batch_checkpoint_dir: str = ".cache/batches"
+    # bounds of the adaptive poll interval of the endpoint status watcher
+    status_watch_min_interval: float = 5.0
+    status_watch_max_interval: float = 60.0
+    # usual seconds an endpoint stays in Creating, the watcher polls faster once it gets close
+    endpoint_creation_expected_seconds: float = 480.0
+    # bounds of the backoff between two describe_endpoint calls of a deployment job
+    deployment_poll_min_interval: float = 5.0
+    deployment_poll_max_interval: float = 30.0
+
+
+@lru_cache()
+def get_settings() -> Settings:
+    return Settings()
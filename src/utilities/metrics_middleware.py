@@ -0,0 +1,55 @@
+import time
+
+from starlette.routing import Match
+
+from ..services.metrics import get_metrics
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting the HTTP requests and timing them per route
+
+    Requests are labelled with the path template of their route (e.g. `/model/deployments/{job_id}`) to keep the
+    number of series bounded. Streamed responses are timed until their last chunk is sent.
+    """
+
+    def __init__(self, app, routes: list):
+        """Constructor
+
+        Args:
+            app (ASGIApp): the wrapped application
+            routes (list): routes of the application, e.g. `app.router.routes`
+        """
+        self.app = app
+        self.routes = routes
+
+    def route_of(self, scope) -> str:
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = get_metrics()
+        route = self.route_of(scope)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight = metrics.requests_in_flight.labels(route)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.request_seconds.labels(route).observe(time.perf_counter() - start)
+            in_flight.dec()
+            metrics.requests.labels(route, scope["method"], str(status)).inc()
@@ -2,16 +2,19 @@ import asyncio
 import json
 import os
 import time
-import traceback
 from functools import lru_cache
-from fastapi import HTTPException, WebSocket
+from typing import Annotated
+
+from fastapi import HTTPException, WebSocket, Header
+from fastapi.encoders import jsonable_encoder
 from pydantic.main import BaseModel
 
-from src.constants import ModelEndpoint, EndpointStatus
+from src.constants import ModelEndpoint, EndpointStatus, DeploymentStatus
 from src.logging_config import LogConfig
-from src.services.endpoint_use import retrieve_endpoint_status
-from src.services.invocation import create_endpoint
+from src.services.inference_context import InferenceContext, Priority
+from src.services.status_watcher import get_status_watcher
 from src.services.sagemaker_models.connector import Connector
+from src.services.sagemaker_models.deployment import DeploymentJob
 
 
 logger = LogConfig("utils").get_logger()
@@ -32,11 +35,32 @@ def init_connector():
         connector = Connector(region=ModelEndpoint.REGION_NAME,
                               aws_profile=aws_profile)
     except Exception as ex:
-        traceback.print_exc()
+        logger.exception("Failed to create the AWS connection")
         raise HTTPException(status_code=500, detail=ex.args[0])
     return connector
 
 
+def get_existing_connector() -> Connector | None:
+    """The AWS connection when it was already created, without ever creating it, e.g. for the monitoring routes"""
+    return init_connector() if init_connector.cache_info().currsize else None
+
+
+def get_inference_context(cache_control: Annotated[str | None, Header()] = None,
+                          x_priority: Annotated[str | None, Header()] = None) -> InferenceContext:
+    """Build the inference options of a request
+
+    `Cache-Control: no-cache` (or `no-store`) skips the response cache. `X-Priority: batch` queues the request behind
+    the interactive ones when the endpoint is busy.
+    """
+    directives = {directive.strip().lower() for directive in (cache_control or "").split(",")}
+    priority_name = (x_priority or "interactive").strip().lower()
+    if priority_name not in Priority.NAMES:
+        raise HTTPException(status_code=400, detail=f"Invalid X-Priority {x_priority}, expected one of "
+                                                    f"{list(Priority.NAMES)}")
+    use_cache = not directives.intersection({"no-cache", "no-store"})
+    return InferenceContext(use_cache=use_cache, coalesce=use_cache, priority=Priority.NAMES[priority_name])
+
+
 def read_file(filepath):
     with open(filepath) as f:
         return f.read()
@@ -53,28 +77,37 @@ def remove_field(model: BaseModel, field_name: str) -> None:
         delattr(model, field_name)
 
 
-def create_endpoint_sync(name: str, connector: Connector, ws: WebSocket):
-    create_endpoint(name, connector)
-
-
-async def async_retrieve_status(name, connector, ws: WebSocket):
-    poll_interval = 60  # seconds
-    max_probes = 2
-    result = retrieve_endpoint_status(incoming_endpoints=[name], connector=connector)
-    status = result[0]["status"]
-    logger.debug(f"Result async: {result}")
-
-    i = 0
-    while status in [EndpointStatus.CREATING, EndpointStatus.NONEXISTENT]:
-        logger.info(f'Model creation status in loop of {name}: {status}')
-        status_result_inner = retrieve_endpoint_status(incoming_endpoints=[name], connector=connector)
-        status = status_result_inner[0]["status"]
-        if (i == max_probes) & (status == EndpointStatus.NONEXISTENT):
-            await ws.close()
-        await ws.send_json(status_result_inner)
-        time.sleep(poll_interval)  # blocking operation
-        i += 1
+async def async_retrieve_status(name, connector, ws: WebSocket, job: DeploymentJob = None):
+    nonexistent_grace = 120  # seconds an endpoint being created may not be listed yet
+    # seconds between two checks of the grace and of the deployment job, the watcher only publishes changes
+    check_interval = 5
+    watcher = get_status_watcher(connector)
+    queue = watcher.subscribe(name)
+    start = time.monotonic()
+    result = {"name": name, "status": EndpointStatus.NONEXISTENT}
+    try:
+        while True:
+            try:
+                result = await asyncio.wait_for(queue.get(), check_interval)
+                changed = True
+            except asyncio.TimeoutError:
+                changed = False
+            status = result["status"]
+            logger.debug(f"Result async: {result}")
+            if job is not None and job.status in [DeploymentStatus.FAILED, DeploymentStatus.TIMED_OUT]:
+                await ws.send_json(jsonable_encoder(job.to_dict()))
+                return result
+            if status not in [EndpointStatus.CREATING, EndpointStatus.NONEXISTENT]:
+                break
+            if status == EndpointStatus.NONEXISTENT and time.monotonic() - start > nonexistent_grace:
+                await ws.close()
+                return result
+            if changed:
+                logger.info(f'Model creation status in loop of {name}: {status}')
+                await ws.send_json([result])
+    finally:
+        watcher.unsubscribe(name, queue)
 
     logger.info(f'Final model creation status of {name}: {status}')
-    await ws.send_json({"name": name, "status": EndpointStatus.IN_SERVICE})
+    await ws.send_json(result)
     return result
@@ -0,0 +1,130 @@
+import os
+import re
+import string
+import threading
+import time
+from functools import lru_cache
+
+from src.logging_config import LogConfig
+from src.settings import get_settings
+
+logger = LogConfig("prompt_registry").get_logger()
+
+PROMPTS_DIR = "src/prompts"
+
+_PLACEHOLDER = re.compile(r"\{(input_api|input_test)\}")
+
+
+class PromptTemplate:
+    """Prompt template pre-split into literal and placeholder segments
+
+    A template is rendered the same way as `make_prompt`: with a test case the `{input_api}` and `{input_test}`
+    placeholders are substituted literally, without one the template is rendered with `str.format`. Both forms are
+    split once, so rendering is a single join over the segments. Unlike chained `str.replace` calls, placeholders
+    are only substituted in the template, never inside the inserted API spec.
+    """
+
+    def __init__(self, text: str, mtime_ns: int = 0):
+        self.text = text
+        self.mtime_ns = mtime_ns
+        self._replace_parts = self._split_placeholders(text)
+        self._format_parts = self._split_format_fields(text)
+
+    def render(self, input_api: str, input_testcase: str = None) -> str:
+        if input_testcase:
+            parts, values = self._replace_parts, {"input_api": input_api, "input_test": input_testcase}
+        elif self._format_parts is not None:
+            parts, values = self._format_parts, {"input_api": input_api}
+        else:
+            # fields with a conversion or a format spec, let str.format handle (or reject) them
+            return self.text.format(input_api=input_api)
+
+        segments = parts[:]
+        for i in range(1, len(segments), 2):
+            segments[i] = values[segments[i]]
+        return "".join(segments)
+
+    @staticmethod
+    def _split_placeholders(text: str) -> list[str]:
+        """Split on `{input_api}` and `{input_test}`, placeholder names are at the odd indexes"""
+        return _PLACEHOLDER.split(text)
+
+    @staticmethod
+    def _split_format_fields(text: str) -> list[str] | None:
+        """Split into `str.format` literals and fields, None if the template is not a plain `{input_api}` one"""
+        parts = [""]
+        try:
+            for literal, field_name, format_spec, conversion in string.Formatter().parse(text):
+                parts[-1] += literal
+                if field_name is None:
+                    continue
+                if field_name != "input_api" or format_spec or conversion:
+                    return None
+                parts.extend([field_name, ""])
+        except ValueError:
+            return None
+        return parts
+
+
+class PromptRegistry:
+    """Registry of the prompt templates
+
+    Every template under the prompts directory is loaded and compiled once. A template is reloaded only when the
+    modification time of its file changes, and file modification times are checked at most once every
+    `reload_interval` seconds.
+    """
+
+    def __init__(self, root: str = PROMPTS_DIR, reload_interval: float = 1.0):
+        """Constructor
+
+        Args:
+            root (str, optional): prompts directory. Defaults to PROMPTS_DIR.
+            reload_interval (float, optional): seconds between two checks of a file's mtime. Defaults to 1.0.
+        """
+        self.root = root
+        self.reload_interval = reload_interval
+        self._templates: dict[str, PromptTemplate] = {}
+        self._checked_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def load_all(self) -> None:
+        """Load every `.txt` template under the prompts directory"""
+        if not os.path.isdir(self.root):
+            logger.warning(f"Prompts directory {self.root} does not exist")
+            return
+        for directory, _, files in os.walk(self.root):
+            for file in files:
+                if file.endswith(".txt"):
+                    self.get(os.path.relpath(os.path.join(directory, file), self.root))
+        logger.info(f"Loaded {len(self._templates)} prompt templates from {self.root}")
+
+    def get(self, name: str) -> PromptTemplate:
+        """Get a template by its path relative to the prompts directory, e.g. `llama_prompts/prompt_bdd.txt`"""
+        template = self._templates.get(name)
+        now = time.monotonic()
+        if template is not None and now - self._checked_at[name] < self.reload_interval:
+            return template
+
+        path = os.path.join(self.root, name)
+        mtime_ns = os.stat(path).st_mtime_ns
+        with self._lock:
+            template = self._templates.get(name)
+            if template is None or template.mtime_ns != mtime_ns:
+                with open(path) as f:
+                    template = PromptTemplate(f.read(), mtime_ns)
+                self._templates[name] = template
+                logger.debug(f"Compiled prompt template {name}")
+            self._checked_at[name] = now
+        return template
+
+    def text(self, name: str) -> str:
+        return self.get(name).text
+
+    def render(self, name: str, input_api: str, input_testcase: str = None) -> str:
+        return self.get(name).render(input_api=input_api, input_testcase=input_testcase)
+
+
+@lru_cache()
+def get_prompt_registry() -> PromptRegistry:
+    settings = get_settings()
+    return PromptRegistry(root=settings.prompts_dir, reload_interval=settings.prompt_reload_interval)
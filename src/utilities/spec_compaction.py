@@ -0,0 +1,406 @@
+import hashlib
+import json
+import math
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+
+import yaml
+
+from src.settings import get_settings
+
+# keys whose values map names to objects: the names are kept even when they are in the stripped fields, e.g. a
+# property called "description"
+_NAME_MAPS = {"properties", "patternProperties", "paths", "schemas", "responses", "parameters", "requestBodies",
+              "headers", "securitySchemes", "links", "callbacks", "content", "definitions", "variables", "encoding"}
+# components only addressed by $ref (or a discriminator mapping), the others, e.g. securitySchemes referenced by name
+# from `security`, are never merged, dropped or inlined
+_REF_KINDS = ("schemas", "parameters", "responses", "requestBodies", "headers")
+HTTP_METHODS = ("get", "put", "post", "delete", "options", "head", "patch", "trace")
+
+
+@dataclass
+class CompactedSpec:
+    """Compacted spec, with its parsed document when the input was an OpenAPI spec
+
+    It may be shared by the requests of the same spec, it must not be modified.
+    """
+    text: str
+    tokens_before: int
+    tokens_after: int
+    document: dict | None = None
+    digest: str | None = None
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.tokens_before - self.tokens_after)
+
+
+class SpecCompactor:
+    """Shrink an API spec before it is inlined in a prompt
+
+    The spec (JSON or YAML) is parsed, the stripped fields are removed, identical components are merged, unused ones
+    dropped and the ones referenced once are inlined, then the spec is minified to JSON. Inputs that are not an
+    OpenAPI document are returned as they are. A compacted spec that still does not fit in the context of the model
+    can be split into chunks of whole operations. The `cache_entries` most recent compactions and splits are kept by
+    the hash of the spec, the requests of the same spec, e.g. every test case of a pipeline, compact it once.
+    """
+
+    def __init__(self, strip_fields: list[str], chars_per_token: float = 3.0, cache_entries: int = 16):
+        """Constructor
+
+        Args:
+            strip_fields (list[str]): keys to remove, a trailing `*` matches a prefix, e.g. `x-*`
+            chars_per_token (float, optional): characters per token of the token estimate. Defaults to 3.0.
+            cache_entries (int, optional): compactions and splits kept, 0 to keep none. Defaults to 16.
+        """
+        self.strip_fields = {name for name in strip_fields if not name.endswith("*")}
+        self.strip_prefixes = tuple(name[:-1] for name in strip_fields if name.endswith("*"))
+        self.chars_per_token = chars_per_token
+        self.cache_entries = cache_entries
+        self._cache: OrderedDict[tuple, object] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def estimate_tokens(self, text: str) -> int:
+        """Fast token count estimate, from the number of characters"""
+        return math.ceil(len(text) / self.chars_per_token)
+
+    def compact(self, spec: str) -> CompactedSpec:
+        """Compact a spec, inputs that are not an OpenAPI spec are returned as they are"""
+        digest = hashlib.sha256(spec.encode("utf-8")).hexdigest()
+        compacted = self._cached(("compact", digest))
+        if compacted is not None:
+            return compacted
+
+        tokens_before = self.estimate_tokens(spec)
+        document = self._parse(spec)
+        if document is None:
+            compacted = CompactedSpec(spec, tokens_before, tokens_before)
+        else:
+            document = self._dedupe_components(self._strip(document))
+            text = _minify(document)
+            compacted = CompactedSpec(text, tokens_before, self.estimate_tokens(text), document, digest)
+        self._store(("compact", digest), compacted)
+        return compacted
+
+    def split(self, compacted: CompactedSpec, budget: int) -> list[str]:
+        """Group the operations of a compacted spec in chunks of at most `budget` tokens
+
+        An operation too large for the budget is a chunk by itself. A spec within the budget, or that is not an
+        OpenAPI spec, is a single chunk. The size of a chunk is the sum of the sizes of its operations and of its
+        distinct components, each minified once, so that splitting is linear in the size of the spec.
+        """
+        if compacted.document is None or compacted.tokens_after <= budget:
+            return [compacted.text]
+        key = ("split", compacted.digest, budget)
+        chunks = self._cached(key) if compacted.digest is not None else None
+        if chunks is not None:
+            return list(chunks)
+
+        sizes = dict()
+        chunks, current, length = [], None, 0
+        for unit in split_document(compacted.document).values():
+            ((path, item),) = unit["paths"].items()
+            components = [(kind, name, component) for kind, items in unit.get("components", {}).items()
+                          for name, component in items.items()]
+            for kind, name, component in components:
+                if (kind, name) not in sizes:
+                    sizes[kind, name] = len(_minify({name: component}))
+            if current is not None:
+                added = len(_minify({path: item})) + sum(sizes[kind, name] for kind, name, _ in components
+                                                         if name not in current["components"].get(kind, {}))
+                if math.ceil((length + added) / self.chars_per_token) > budget:
+                    chunks.append(_minify_chunk(current))
+                    current = None
+            if current is None:
+                # fresh containers, the objects of the compacted document are shared and never modified
+                current = {"openapi": unit["openapi"], "paths": {}, "components": {}}
+                length = len(_minify(current))
+                added = len(_minify({path: item})) + sum(sizes[kind, name] for kind, name, _ in components)
+            current["paths"].setdefault(path, {}).update(item)
+            for kind, name, component in components:
+                current["components"].setdefault(kind, {})[name] = component
+            length += added
+        if current is not None:
+            chunks.append(_minify_chunk(current))
+        if compacted.digest is not None:
+            self._store(key, tuple(chunks))
+        return chunks
+
+    def _cached(self, key: tuple):
+        with self._lock:
+            value = self._cache.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def _store(self, key: tuple, value) -> None:
+        if self.cache_entries <= 0:
+            return
+        with self._lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+    @staticmethod
+    def _parse(spec: str) -> dict | None:
+        try:
+            document = load_spec(spec)
+        except ValueError:
+            return None
+        if not isinstance(document, dict) or not isinstance(document.get("paths"), dict):
+            return None
+        return document
+
+    def _strip(self, node, names: bool = False):
+        if isinstance(node, list):
+            return [self._strip(item) for item in node]
+        if not isinstance(node, dict):
+            return node
+        if names:
+            return {key: self._strip(value) for key, value in node.items()}
+        return {key: self._strip(value, names=key in _NAME_MAPS) for key, value in node.items()
+                if key not in self.strip_fields and not key.startswith(self.strip_prefixes)}
+
+    @staticmethod
+    def _dedupe_components(document: dict) -> dict:
+        """Merge identical components, drop the unused ones and inline the ones referenced once"""
+        components = document.get("components")
+        if not isinstance(components, dict):
+            return document
+
+        # identical components of a kind are referenced through the first one
+        renames = dict()
+        for kind in _REF_KINDS:
+            items = components.get(kind)
+            if not isinstance(items, dict):
+                continue
+            canonical = dict()
+            for name, item in list(items.items()):
+                key = json.dumps(item, sort_keys=True)
+                if key in canonical:
+                    renames[f"#/components/{kind}/{name}"] = f"#/components/{kind}/{canonical[key]}"
+                    del items[name]
+                else:
+                    canonical[key] = name
+        document = _rewrite_refs(document, renames)
+        components = document["components"]
+
+        # dropping a component may leave the ones it references unused
+        while True:
+            refs = _count_refs(document)
+            unused = [(kind, name) for kind in _REF_KINDS if isinstance(components.get(kind), dict)
+                      for name in components[kind] if refs.get(f"#/components/{kind}/{name}", 0) == 0]
+            if not unused:
+                break
+            for kind, name in unused:
+                del components[kind][name]
+        inline = {ref for ref, count in refs.items() if count == 1 and _kind_of(ref) in _REF_KINDS
+                  and _resolve(document, ref) is not None and not _is_recursive(document, ref)}
+        if inline:
+            document = _inline_refs(document, inline)
+            # a reference that was not inlined, e.g. a $ref with sibling keys or a discriminator mapping, keeps its
+            # component
+            remaining = _count_refs(document)
+            for ref in inline:
+                if not remaining.get(ref):
+                    _, _, kind, name = ref.split("/", 3)
+                    document["components"][kind].pop(name, None)
+        document["components"] = {kind: items for kind, items in document["components"].items() if items}
+        if not document["components"]:
+            del document["components"]
+        return document
+
+
+def load_spec(spec: str):
+    """Parse a JSON or YAML spec, as JSON: YAML status codes are integers and dates are parsed
+
+    JSON specs are parsed as JSON, the pure Python YAML parser takes seconds on a large spec.
+
+    Raises:
+        ValueError: neither JSON nor YAML
+    """
+    try:
+        return json.loads(spec)
+    except ValueError:
+        pass
+    try:
+        document = yaml.load(spec, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+    except yaml.YAMLError as ex:
+        raise ValueError(f"Invalid OpenAPI spec: {ex}")
+    return json.loads(json.dumps(document, default=str))
+
+
+def split_document(document: dict) -> dict[str, dict]:
+    """Split a parsed OpenAPI spec into one self-contained spec per operation
+
+    Each operation keeps the parameters of its path and the components it references, directly or through other
+    components. `info` and `servers` are left out, a version bump must not change every operation. The units share
+    their objects with the document.
+
+    Returns:
+        dict[str, dict]: spec of every operation, keyed on "METHOD /path", in the order of the spec
+    """
+    operations = dict()
+    for path, path_item in document["paths"].items():
+        if not isinstance(path_item, dict):
+            continue
+        for method in HTTP_METHODS:
+            if method not in path_item:
+                continue
+            item = {method: path_item[method]}
+            if "parameters" in path_item:
+                item["parameters"] = path_item["parameters"]
+            unit = {"openapi": document.get("openapi", document.get("swagger")), "paths": {path: item}}
+            components = _referenced_components(item, document)
+            if components:
+                unit["components"] = components
+            operations[f"{method.upper()} {path}"] = unit
+    return operations
+
+
+def _referenced_components(node, document: dict) -> dict:
+    components, pending, seen = dict(), [node], set()
+    while pending:
+        current = pending.pop()
+        if isinstance(current, list):
+            pending.extend(current)
+        elif isinstance(current, dict):
+            ref = current.get("$ref")
+            # only local references to components, e.g. #/components/schemas/Item
+            if isinstance(ref, str) and ref.startswith("#/components/") and ref not in seen:
+                seen.add(ref)
+                _, _, kind, name = ref.split("/", 3)
+                target = document.get("components", {}).get(kind, {}).get(name)
+                if target is not None:
+                    components.setdefault(kind, {})[name] = target
+                    pending.append(target)
+            pending.extend(value for key, value in current.items() if key != "$ref")
+    return components
+
+
+def _minify(document: dict) -> str:
+    return json.dumps(document, separators=(",", ":"), ensure_ascii=False)
+
+
+def _minify_chunk(chunk: dict) -> str:
+    if not chunk["components"]:
+        chunk = {key: value for key, value in chunk.items() if key != "components"}
+    return _minify(chunk)
+
+
+def _kind_of(ref: str) -> str | None:
+    """Kind of the local component a reference points to, e.g. schemas"""
+    parts = ref.split("/", 3)
+    return parts[2] if len(parts) == 4 and parts[:2] == ["#", "components"] else None
+
+
+def _resolve(document: dict, ref: str):
+    parts = ref.split("/", 3)
+    if len(parts) < 4:
+        return None
+    return document.get("components", {}).get(parts[2], {}).get(parts[3])
+
+
+def _is_recursive(document: dict, ref: str) -> bool:
+    """Whether a component references itself, directly or through other components"""
+    pending, seen = list(_count_refs(_resolve(document, ref))), set()
+    while pending:
+        current = pending.pop()
+        if current == ref:
+            return True
+        if current in seen or not current.startswith("#/components/"):
+            continue
+        seen.add(current)
+        pending.extend(_count_refs(_resolve(document, current)))
+    return False
+
+
+def _count_refs(node, counts: dict = None) -> dict[str, int]:
+    """References to every component, by $ref and by discriminator mapping"""
+    counts = dict() if counts is None else counts
+    if isinstance(node, list):
+        for item in node:
+            _count_refs(item, counts)
+    elif isinstance(node, dict):
+        ref = node.get("$ref")
+        if isinstance(ref, str):
+            counts[ref] = counts.get(ref, 0) + 1
+        for ref in _mapping_refs(node):
+            counts[ref] = counts.get(ref, 0) + 1
+        for value in node.values():
+            _count_refs(value, counts)
+    return counts
+
+
+def _mapping_refs(node: dict) -> list[str]:
+    # the values of a discriminator mapping are references or schema names
+    discriminator = node.get("discriminator")
+    mapping = discriminator.get("mapping") if isinstance(discriminator, dict) else None
+    if not isinstance(mapping, dict):
+        return []
+    return [_mapping_ref(value) for value in mapping.values() if isinstance(value, str)]
+
+
+def _mapping_ref(value: str) -> str:
+    return value if "/" in value else f"#/components/schemas/{value}"
+
+
+def _rewrite_refs(node, renames: dict[str, str]):
+    if not renames:
+        return node
+    if isinstance(node, list):
+        return [_rewrite_refs(item, renames) for item in node]
+    if isinstance(node, dict):
+        rewritten = {key: renames.get(value, value) if key == "$ref" and isinstance(value, str)
+                     else _rewrite_refs(value, renames) for key, value in node.items()}
+        if _mapping_refs(rewritten):
+            mapping = rewritten["discriminator"]["mapping"]
+            for key, value in mapping.items():
+                if isinstance(value, str) and _mapping_ref(value) in renames:
+                    renamed = renames[_mapping_ref(value)]
+                    # a schema name stays a name
+                    mapping[key] = renamed if "/" in value else renamed.rsplit("/", 1)[1]
+        return rewritten
+    return node
+
+
+def _inline_refs(document: dict, refs: set[str]):
+    def inline(node):
+        if isinstance(node, list):
+            return [inline(item) for item in node]
+        if isinstance(node, dict):
+            if node.get("$ref") in refs and len(node) == 1:
+                return inline(_resolve(document, node["$ref"]))
+            return {key: inline(value) for key, value in node.items()}
+        return node
+
+    return inline(document)
+
+
+@lru_cache()
+def get_spec_compactor() -> SpecCompactor | None:
+    settings = get_settings()
+    if not settings.spec_compaction_enabled:
+        return None
+    return SpecCompactor(settings.spec_strip_fields, settings.spec_chars_per_token,
+                         settings.spec_compaction_cache_entries)
+
+
+def spec_token_budget(model_name: str, max_new_tokens: int, prompt_tokens: int) -> int | None:
+    """Tokens left for the spec in the context of a model, None when the generation alone fills it"""
+    settings = get_settings()
+    context = settings.model_context_tokens.get(model_name, settings.default_context_tokens)
+    # a margin for the chat template and the errors of the estimate
+    budget = context - max_new_tokens - prompt_tokens - 64
+    return budget if budget > 0 else None
@@ -0,0 +1,72 @@
+import json
+
+from src.logging_config import LogConfig
+
+logger = LogConfig("streaming").get_logger()
+
+SSE_MEDIA_TYPE = "text/event-stream"
+
+
+class ClosingStream:
+    """Async iterator of the tokens of a streamed generation, with a `close` that runs exactly once
+
+    `close` (e.g. closing the upstream stream and releasing its invocation slot) runs when the tokens are exhausted or
+    fail, or on `aclose()`. Starlette never starts the body of a response whose client disconnected while it was
+    queued, and an async generator that never started ignores `aclose()`, so the routes also run `aclose()` as a
+    background task of the response.
+    """
+
+    def __init__(self, tokens, close):
+        """Constructor
+
+        Args:
+            tokens (AsyncIterator[str]): text of the generated tokens
+            close (Callable[[], Awaitable[None]]): release what the stream holds
+        """
+        self._tokens = tokens
+        self._close = close
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        try:
+            return await self._tokens.__anext__()
+        except BaseException:
+            await self.aclose()
+            raise
+
+    async def aclose(self) -> None:
+        close, self._close = self._close, None
+        if close is None:
+            return
+        try:
+            await self._tokens.aclose()
+        finally:
+            await close()
+
+
+def sse_event(data, event: str = None) -> str:
+    """Format one server sent event, `data` is sent as JSON so tokens keep their new lines"""
+    message = f"data: {json.dumps(data)}\n\n"
+    if event:
+        message = f"event: {event}\n{message}"
+    return message
+
+
+async def to_server_sent_events(tokens):
+    """Turn an async iterator of tokens into server sent events
+
+    Every token is sent as `data: {"token": ...}`. The stream ends with an `end` event, or with an `error` event
+    when the generation fails after the first token was sent.
+    """
+    try:
+        async for token in tokens:
+            yield sse_event({"token": token})
+    except Exception as ex:
+        logger.exception("Token stream failed")
+        yield sse_event({"detail": getattr(ex, "detail", str(ex))}, event="error")
+        return
+    finally:
+        await tokens.aclose()
+    yield sse_event({}, event="end")
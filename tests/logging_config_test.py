@@ -0,0 +1,63 @@
+import io
+import json
+import logging
+import unittest
+from unittest.mock import patch
+
+from src.logging_config import JsonFormatter, LogPipeline, RateLimitFilter, summarize_payload
+
+
+def make_record(level=logging.INFO, msg="Endpoint %s is %s", args=("Models-LlaMa-2-7b", "InService"), **extra):
+    record = logging.LogRecord("model_use", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class LogPipelineTest(unittest.TestCase):
+    def test_records_are_written_by_the_listener(self):
+        stream = io.StringIO()
+        pipeline = LogPipeline(log_format="json", stream=stream)
+        logger = logging.getLogger("log_pipeline_test")
+        logger.propagate = False
+        logger.addHandler(pipeline.handler)
+        logger.warning("Endpoint %s is %s", "Models-LlaMa-2-7b", "Failed", extra={"job_id": "42"})
+        pipeline.stop()
+        logger.removeHandler(pipeline.handler)
+        document = json.loads(stream.getvalue())
+        self.assertEqual(document["message"], "Endpoint Models-LlaMa-2-7b is Failed")
+        self.assertEqual(document["level"], "WARNING")
+        self.assertEqual(document["job_id"], "42")
+
+    def test_full_queue_drops_records(self):
+        pipeline = LogPipeline(queue_size=1, stream=io.StringIO())
+        pipeline.stop()
+        pipeline.handler.handle(make_record())
+        pipeline.handler.handle(make_record())
+        self.assertEqual(pipeline.stats()["dropped"], 1)
+
+
+class LoggingHelpersTest(unittest.TestCase):
+    def test_json_formatter(self):
+        document = json.loads(JsonFormatter().format(make_record(model="Models-LlaMa-2-7b")))
+        self.assertEqual(document["logger"], "model_use")
+        self.assertEqual(document["model"], "Models-LlaMa-2-7b")
+
+    def test_summarize_payload(self):
+        self.assertEqual(summarize_payload("short", max_chars=10), "short")
+        summary = summarize_payload("x" * 100, max_chars=10)
+        self.assertTrue(summary.startswith("x" * 10 + "... (100 chars, hash "))
+        self.assertNotEqual(summary, summarize_payload("x" * 99 + "y", max_chars=10))
+
+    def test_rate_limit(self):
+        log_filter = RateLimitFilter(rate=2)
+        with patch("src.logging_config.time.monotonic", return_value=log_filter._updated_at):
+            kept = [log_filter.filter(make_record()) for _ in range(5)]
+        self.assertEqual(kept, [True, True, False, False, False])
+        self.assertTrue(log_filter.filter(make_record(level=logging.ERROR)))
+        self.assertEqual(log_filter.suppressed, 3)
+
+    def test_sampling(self):
+        log_filter = RateLimitFilter(sample=0.5)
+        with patch("src.logging_config.random.random", side_effect=[0.1, 0.9]):
+            self.assertTrue(log_filter.filter(make_record()))
+            self.assertFalse(log_filter.filter(make_record()))
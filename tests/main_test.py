@@ -0,0 +1,21 @@
+import os
+import unittest
+
+from benchmarks.import_bench import measure_import
+
+# seconds `import src.main` may take, the fastest of a few runs. Override on slow machines with IMPORT_TIME_BUDGET
+IMPORT_TIME_BUDGET = float(os.environ.get("IMPORT_TIME_BUDGET", 1.5))
+
+
+class StartupTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.times = measure_import("src.main", runs=3)
+
+    def test_import_time_budget(self):
+        self.assertLess(self.times["src.main"][1], IMPORT_TIME_BUDGET,
+                        "import src.main got slower, see python -m benchmarks.import_bench")
+
+    def test_providers_are_loaded_lazily(self):
+        for sdk in ("openai", "langchain", "src.services.openai_client"):
+            self.assertNotIn(sdk, self.times)
@@ -1,8 +1,16 @@
-from unittest.mock import patch, Mock
+import json
+from unittest.mock import AsyncMock, patch, Mock
 
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.services.admission import AdmissionController
+from src.services.generation_jobs import GenerationJobEngine
 from src.services.invocation import get_inference
+from src.services.response_cache import MemoryTier, ResponseCache
 from src.services.sagemaker_models.connector import Connector
 from src.services.sagemaker_models.model import Model
+from src.utilities.preparation import init_connector
 from tests.base_integration_test import BaseIntegrationTest
 
 
@@ -37,4 +45,194 @@ class ChatbotTest(BaseIntegrationTest):
                 "parameters": {"temperature": 0.1}}
         response = self.client.post("/inference/testcases", json=body)
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.json(), mock_tc)
\ No newline at end of file
+        self.assertEqual(response.json(), mock_tc)
+
+
+class ChatbotStreamTest(BaseIntegrationTest):
+    def setUp(self):
+        super().setUp()
+        self.connector = Mock(spec=Connector)
+        app.dependency_overrides[init_connector] = lambda: self.connector
+
+    def tearDown(self):
+        app.dependency_overrides.clear()
+
+    @patch("src.services.model_use.get_prompt_registry")
+    def test_stream_testcases(self, registry):
+        registry.return_value.text.return_value = "system prompt"
+        registry.return_value.render.return_value = "query prompt"
+        mock_model = Mock(spec=Model)
+        mock_model.predict_jumpstart_stream.return_value = iter(["Feature", ": login"])
+        self.connector.connect.return_value = mock_model
+        body = {"inputs": "dummy inputs",
+                "parameters": {"temperature": 0.1}}
+        response = self.client.post("/inference/testcases/stream", json=body)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, 'data: {"token": "Feature"}\n\n'
+                                        'data: {"token": ": login"}\n\n'
+                                        'event: end\ndata: {}\n\n')
+        payload = json.loads(mock_model.predict_jumpstart_stream.call_args.args[0])
+        self.assertTrue(payload["stream"])
+
+
+class ChatbotCacheTest(BaseIntegrationTest):
+    def setUp(self):
+        super().setUp()
+        self.connector = Mock(spec=Connector)
+        self.model = Mock(spec=Model)
+        self.model.predict_jumpstart.return_value = [{"generation": {"content": "dummy testcases"}}]
+        self.connector.connect.return_value = self.model
+        app.dependency_overrides[init_connector] = lambda: self.connector
+        registry = patch("src.services.model_use.get_prompt_registry").start()
+        registry.return_value.render.return_value = "query prompt"
+        patch("src.services.async_invocation.get_response_cache",
+              return_value=ResponseCache(MemoryTier(8), None, ttl=60)).start()
+
+    def tearDown(self):
+        app.dependency_overrides.clear()
+        patch.stopall()
+
+    def test_deterministic_generations_are_cached(self):
+        body = {"inputs": "dummy inputs", "parameters": {"do_sample": False}}
+        first = self.client.post("/inference/testcases", json=body)
+        second = self.client.post("/inference/testcases", json=body)
+        self.assertEqual(first.headers["X-Cache"], "MISS")
+        self.assertEqual(second.headers["X-Cache"], "HIT")
+        self.assertEqual(second.json(), "dummy testcases")
+        self.model.predict_jumpstart.assert_called_once()
+
+    def test_sampled_generations_and_opt_out_bypass(self):
+        sampled = self.client.post("/inference/testcases", json={"inputs": "dummy inputs", "parameters": {}})
+        opted_out = self.client.post("/inference/testcases", headers={"Cache-Control": "no-cache"},
+                                     json={"inputs": "dummy inputs", "parameters": {"do_sample": False}})
+        self.assertEqual(sampled.headers["X-Cache"], "BYPASS")
+        self.assertEqual(opted_out.headers["X-Cache"], "BYPASS")
+        self.assertEqual(self.model.predict_jumpstart.call_count, 2)
+
+
+class ChatbotAdmissionTest(BaseIntegrationTest):
+    def setUp(self):
+        super().setUp()
+        self.connector = Mock(spec=Connector)
+        app.dependency_overrides[init_connector] = lambda: self.connector
+        registry = patch("src.services.model_use.get_prompt_registry").start()
+        registry.return_value.render.return_value = "query prompt"
+        patch("src.services.async_invocation.get_admission_controller",
+              return_value=AdmissionController(max_concurrency=0, max_queue=0)).start()
+
+    def tearDown(self):
+        app.dependency_overrides.clear()
+        patch.stopall()
+
+    def test_overloaded_endpoint_returns_429(self):
+        response = self.client.post("/inference/testcases", json={"inputs": "dummy inputs", "parameters": {}})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["Retry-After"], "1")
+        self.connector.connect.assert_not_called()
+
+    def test_invalid_priority(self):
+        response = self.client.post("/inference/testcases", headers={"X-Priority": "urgent"},
+                                    json={"inputs": "dummy inputs", "parameters": {}})
+        self.assertEqual(response.status_code, 400)
+
+
+class ChatbotOpenAITest(BaseIntegrationTest):
+    def setUp(self):
+        super().setUp()
+        registry = patch("src.services.model_use.get_prompt_registry").start()
+        registry.return_value.render.return_value = "query prompt"
+        self.chat = patch("src.services.async_invocation.aget_provider", new_callable=AsyncMock).start().return_value
+        self.chat.endpoint_name = "openai/gpt-3.5-turbo"
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_gen_testcases(self):
+        self.chat.complete = AsyncMock(return_value="dummy testcases")
+        response = self.client.post("/inference/testcases/openai",
+                                    json={"inputs": "dummy inputs", "parameters": {"temperature": 0.2}})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), "dummy testcases")
+        self.chat.complete.assert_awaited_once_with([{"role": "user", "content": "query prompt"}], 0.2)
+
+    def test_failed_call_returns_500(self):
+        self.chat.complete = AsyncMock(side_effect=RuntimeError("Failed to predict: overloaded"))
+        response = self.client.post("/inference/testcases/openai", json={"inputs": "dummy inputs", "parameters": {}})
+        self.assertEqual(response.status_code, 500)
+
+
+class ChatbotPipelineTest(BaseIntegrationTest):
+    def setUp(self):
+        super().setUp()
+        self.connector = Mock(spec=Connector)
+        self.model = Mock(spec=Model)
+        self.model.predict_jumpstart.side_effect = [
+            [{"generation": {"content": "Test case 1: get an item\nTest case 2: delete an item"}}],
+            [{"generation": {"content": "Given an item"}}],
+            [{"generation": {"content": "Given an item"}}],
+        ]
+        self.connector.connect.return_value = self.model
+        app.dependency_overrides[init_connector] = lambda: self.connector
+        registry = patch("src.services.model_use.get_prompt_registry").start()
+        registry.return_value.render.return_value = "query prompt"
+
+    def tearDown(self):
+        app.dependency_overrides.clear()
+        patch.stopall()
+
+    def test_pipeline_streams_the_step_definitions(self):
+        response = self.client.post("/inference/pipeline", json={"inputs": "dummy spec", "parameters": {}})
+        self.assertEqual(response.status_code, 200)
+        records = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual(records[0], {"testcases": ["Test case 1: get an item", "Test case 2: delete an item"]})
+        self.assertEqual(sorted(record["index"] for record in records[1:]), [0, 1])
+        self.assertTrue(all(record["result"] == "Given an item" for record in records[1:]))
+
+
+class ChatbotJobTest(BaseIntegrationTest):
+    def setUp(self):
+        super().setUp()
+        # jobs outlive their request, they need an event loop running across requests
+        self.client = TestClient(app).__enter__()
+        self.connector = Mock(spec=Connector)
+        self.model = Mock(spec=Model)
+        self.model.predict_jumpstart.return_value = [{"generation": {"content": "dummy testcases"}}]
+        self.connector.connect.return_value = self.model
+        app.dependency_overrides[init_connector] = lambda: self.connector
+        registry = patch("src.services.model_use.get_prompt_registry").start()
+        registry.return_value.render.return_value = "query prompt"
+        engine = GenerationJobEngine(workers=2, max_jobs=10, ttl=60)
+        patch("src.services.generation_jobs.get_job_engine", return_value=engine).start()
+        patch("src.routes.chatbot_route.get_job_engine", return_value=engine).start()
+
+    def tearDown(self):
+        self.client.__exit__(None, None, None)
+        app.dependency_overrides.clear()
+        patch.stopall()
+
+    def test_submit_and_poll(self):
+        submitted = self.client.post("/inference/jobs", json={"inputs": "dummy inputs", "parameters": {}})
+        self.assertEqual(submitted.status_code, 202)
+        self.assertEqual(submitted.json()["task"], "testcases")
+
+        job = self.client.get(f"/inference/jobs/{submitted.json()['job_id']}", params={"wait": 5}).json()
+        self.assertEqual(job["status"], "Succeeded")
+        self.assertEqual(job["result"], "dummy testcases")
+
+    def test_websocket_sends_the_result(self):
+        job_id = self.client.post("/inference/jobs", json={"inputs": {"spec": "dummy spec", "tc": "dummy test"},
+                                                           "parameters": {}}).json()["job_id"]
+        with self.client.websocket_connect(f"/inference/jobs/{job_id}/ws") as websocket:
+            messages = [websocket.receive_json()]
+            if messages[0]["status"] != "Succeeded":
+                messages.append(websocket.receive_json())
+        self.assertEqual(messages[-1]["task"], "step-definition")
+        self.assertEqual(messages[-1]["result"], "dummy testcases")
+
+    def test_unknown_job(self):
+        self.assertEqual(self.client.get("/inference/jobs/unknown").status_code, 404)
+        self.assertEqual(self.client.delete("/inference/jobs/unknown").status_code, 404)
+
+    def test_invalid_payload(self):
+        response = self.client.post("/inference/jobs", json={"parameters": {}})
+        self.assertEqual(response.status_code, 422)
@@ -0,0 +1,39 @@
+from unittest.mock import Mock
+
+from src.main import app
+from src.services.sagemaker_models.connector import Connector
+from src.utilities.preparation import get_existing_connector
+from tests.base_integration_test import BaseIntegrationTest
+
+
+class MonitorTest(BaseIntegrationTest):
+    def setUp(self):
+        super().setUp()
+        self.connector = Mock(spec=Connector)
+        self.connector.model_cache = Mock()
+        self.connector.model_cache.stats.return_value = {"size": 1, "hits": 2}
+        app.dependency_overrides[get_existing_connector] = lambda: self.connector
+
+    def tearDown(self):
+        app.dependency_overrides.clear()
+
+    def test_metrics(self):
+        self.client.get("/healthcheck")
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+        self.assertIn('http_requests_total{route="/healthcheck",method="GET",status="200"}', response.text)
+        self.assertIn("invocation_stage_duration_seconds", response.text)
+        self.assertIn("model_cache_hits 2", response.text)
+
+    def test_token_budgets(self):
+        response = self.client.get("/token-budgets")
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.json(), dict)
+
+    def test_metrics_without_connection(self):
+        app.dependency_overrides[get_existing_connector] = lambda: None
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("model_cache_", response.text)
+        self.assertIsNone(self.client.get("/stats").json()["model_cache"])
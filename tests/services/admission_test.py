@@ -0,0 +1,77 @@
+import asyncio
+import unittest
+
+from src.services.admission import AdmissionController, AdmissionRejected, EndpointAdmission
+from src.services.inference_context import Priority
+
+
+class EndpointAdmissionTest(unittest.IsolatedAsyncioTestCase):
+    async def test_caps_concurrency(self):
+        admission = EndpointAdmission("Models-LlaMa-2-7b", max_concurrency=2, max_queue=10)
+        running, peak = 0, 0
+
+        async def invoke():
+            nonlocal running, peak
+            async with admission.slot():
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*[invoke() for _ in range(6)])
+        self.assertEqual(peak, 2)
+        self.assertEqual(admission.stats()["admitted"], 6)
+        self.assertEqual(admission.stats()["active"], 0)
+
+    async def test_interactive_requests_go_first(self):
+        admission = EndpointAdmission("Models-LlaMa-2-7b", max_concurrency=1, max_queue=10)
+        order = []
+        admitted_at = await admission.acquire()
+
+        async def invoke(name, priority):
+            async with admission.slot(priority):
+                order.append(name)
+
+        tasks = [asyncio.create_task(invoke("batch", Priority.BATCH)),
+                 asyncio.create_task(invoke("interactive", Priority.INTERACTIVE))]
+        await asyncio.sleep(0)
+        admission.release(admitted_at)
+        await asyncio.gather(*tasks)
+        self.assertEqual(order, ["interactive", "batch"])
+
+    async def test_full_queue_rejects(self):
+        admission = EndpointAdmission("Models-LlaMa-2-7b", max_concurrency=1, max_queue=1)
+        await admission.acquire()
+        batch = asyncio.create_task(admission.acquire(Priority.BATCH))
+        await asyncio.sleep(0)
+
+        # same priority as the queued request: rejected right away
+        with self.assertRaises(AdmissionRejected) as rejected:
+            await admission.acquire(Priority.BATCH)
+        self.assertGreaterEqual(rejected.exception.retry_after, 1)
+
+        # higher priority: takes the place of the queued batch request
+        interactive = asyncio.create_task(admission.acquire(Priority.INTERACTIVE))
+        await asyncio.sleep(0)
+        with self.assertRaises(AdmissionRejected):
+            await batch
+        self.assertEqual(admission.stats()["rejected"], 2)
+        admission.release()
+        await interactive
+
+    async def test_cancelled_waiters_leave_the_queue(self):
+        admission = EndpointAdmission("Models-LlaMa-2-7b", max_concurrency=1, max_queue=1)
+        await admission.acquire()
+        waiter = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        self.assertEqual(admission.queued, 0)
+        admission.release()
+        self.assertEqual(admission.active, 0)
+
+    def test_per_endpoint_concurrency(self):
+        controller = AdmissionController(max_concurrency=4, max_queue=8, endpoint_concurrency={"Models-LlaMa-2-70b": 1})
+        self.assertEqual(controller.get("Models-LlaMa-2-70b").max_concurrency, 1)
+        self.assertEqual(controller.get("Models-LlaMa-2-7b").max_concurrency, 4)
+        self.assertIs(controller.get("Models-LlaMa-2-7b"), controller.get("Models-LlaMa-2-7b"))
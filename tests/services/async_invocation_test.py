@@ -0,0 +1,75 @@
+import asyncio
+import dataclasses
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+from src.services.async_invocation import EndpointExecutors, aget_inference_jumpstart, astream_inference_jumpstart
+from src.services.inference_context import InferenceContext
+
+
+class EndpointExecutorsTest(unittest.TestCase):
+    def test_pool_size_per_endpoint(self):
+        executors = EndpointExecutors(default_size=4, sizes={"Models-LlaMa-2-70b": 16})
+        self.assertEqual(executors.get("Models-LlaMa-2-70b")._max_workers, 16)
+        self.assertEqual(executors.get("Models-LlaMa-2-7b")._max_workers, 4)
+        self.assertIs(executors.get("Models-LlaMa-2-7b"), executors.get("Models-LlaMa-2-7b"))
+        executors.shutdown()
+
+
+class AsyncInferenceTest(unittest.IsolatedAsyncioTestCase):
+    async def test_blocking_calls_do_not_block_the_loop(self):
+        model = Mock()
+        model.predict_jumpstart.side_effect = lambda payload: time.sleep(0.2) or payload
+        connector = Mock()
+        connector.connect.return_value = model
+
+        with patch("src.services.async_invocation.get_executors",
+                   return_value=EndpointExecutors(default_size=8)):
+            start = time.monotonic()
+            ticker = asyncio.create_task(asyncio.sleep(0.01))
+            results = await asyncio.gather(*[aget_inference_jumpstart(str(i), "Models-LlaMa-2-7b", connector)
+                                             for i in range(8)])
+            elapsed = time.monotonic() - start
+
+        self.assertTrue(ticker.done())
+        self.assertEqual(results, [str(i) for i in range(8)])
+        self.assertLess(elapsed, 1.0)
+
+    async def invoke_concurrently(self, context: InferenceContext) -> int:
+        model = Mock()
+        model.predict_jumpstart.side_effect = lambda payload: time.sleep(0.05) or payload
+        connector = Mock()
+        connector.connect.return_value = model
+
+        with patch("src.services.async_invocation.get_executors",
+                   return_value=EndpointExecutors(default_size=8)):
+            await asyncio.gather(*[aget_inference_jumpstart("same", "Models-LlaMa-2-7b", connector,
+                                                            dataclasses.replace(context)) for _ in range(3)])
+        return model.predict_jumpstart.call_count
+
+    async def test_no_cache_invocations_are_not_coalesced(self):
+        self.assertEqual(await self.invoke_concurrently(InferenceContext(use_cache=False, coalesce=False)), 3)
+
+    async def test_seeded_sampled_invocations_are_coalesced(self):
+        # sampled with a fixed seed: not cached, but concurrent identical requests share one generation
+        self.assertEqual(await self.invoke_concurrently(InferenceContext(use_cache=False)), 1)
+
+    async def test_unstarted_stream_releases_its_slot_on_close(self):
+        tokens = Mock()
+        tokens.__next__ = Mock(side_effect=["a", "b"])
+        model = Mock()
+        model.predict_jumpstart_stream.return_value = tokens
+        connector = Mock()
+        connector.connect.return_value = model
+        admission = Mock()
+
+        with patch("src.services.async_invocation.acquire_admission", return_value=(admission, 1.0)), \
+                patch("src.services.async_invocation.get_executors", return_value=EndpointExecutors(default_size=2)):
+            stream = await astream_inference_jumpstart("{}", "Models-LlaMa-2-7b", connector)
+            # the response body never started, e.g. the client disconnected while it was queued
+            await stream.aclose()
+            await stream.aclose()
+
+        tokens.close.assert_called_once()
+        admission.release.assert_called_once_with(1.0)
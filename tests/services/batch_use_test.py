@@ -0,0 +1,63 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+from src.services.batch_use import BatchCheckpoint, BatchRunner, parse_batch_line
+
+
+class ParseBatchLineTest(unittest.TestCase):
+    def test_record_kinds_and_ids(self):
+        record_id, payload = parse_batch_line(1, '{"inputs": "spec"}')
+        self.assertEqual((record_id, type(payload).__name__), (1, "SpecInferencePayload"))
+        record_id, payload = parse_batch_line(2, '{"id": "login", "inputs": {"spec": "spec", "tc": "tc"}}')
+        self.assertEqual((record_id, type(payload).__name__), ("login", "StepInferencePayload"))
+
+
+class BatchRunnerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.running = 0
+        self.max_running = 0
+
+    async def fake_generate(self, payload, connector, context):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.05 if payload.inputs == "slow" else 0.01)
+        self.running -= 1
+        if payload.inputs == "fail":
+            raise RuntimeError("boom")
+        return f"tc for {payload.inputs}"
+
+    async def run_batch(self, lines, checkpoint=None):
+        with patch("src.services.batch_use.agenerate_testcases_jumpstart", side_effect=self.fake_generate), \
+                patch("src.services.batch_use.get_settings") as settings:
+            settings.return_value.batch_concurrency = 2
+            settings.return_value.batch_endpoint_concurrency = {}
+            return [record async for record in BatchRunner(Mock(), checkpoint).run(lines)]
+
+    async def test_completion_order_and_concurrency_cap(self):
+        lines = ['{"inputs": "slow"}', '{"inputs": "a"}', "", '{"inputs": "b"}', "not json"]
+        records = await self.run_batch(lines)
+        self.assertEqual(records[0], {"id": 5, "status": "error", "error": records[0]["error"]})
+        self.assertEqual([record["id"] for record in records[1:]], [2, 4, 1])
+        self.assertEqual(records[-1]["result"], "tc for slow")
+        self.assertLessEqual(self.max_running, 2)
+
+    async def test_resume_from_checkpoint(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "batch.jsonl")
+            lines = ['{"inputs": "a"}', '{"inputs": "fail"}']
+            checkpoint = BatchCheckpoint(path)
+            await self.run_batch(lines, checkpoint)
+            checkpoint.close()
+            with open(path) as f:
+                self.assertEqual([json.loads(line)["id"] for line in f], [1])
+
+            checkpoint = BatchCheckpoint(path)
+            with patch.object(self, "fake_generate", wraps=self.fake_generate) as generate:
+                records = await self.run_batch(lines, checkpoint)
+            checkpoint.close()
+            self.assertEqual(generate.call_count, 1)
+            self.assertEqual({record["id"]: record["status"] for record in records}, {1: "ok", 2: "error"})
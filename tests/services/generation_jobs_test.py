@@ -0,0 +1,94 @@
+import asyncio
+import unittest
+from unittest.mock import Mock, patch
+
+from fastapi import HTTPException
+
+from src.constants import JobStatus
+from src.models.request import SpecInferencePayload, StepInferencePayload
+from src.services.generation_jobs import GenerationJobEngine
+from src.services.sagemaker_models.connector import Connector
+
+
+def spec_payload():
+    return SpecInferencePayload(inputs="openapi: 3.0.0", parameters={})
+
+
+class GenerationJobEngineTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.connector = Mock(spec=Connector)
+        self.release = asyncio.Event()
+        self.generate = patch("src.services.generation_jobs.agenerate_testcases_jumpstart",
+                              side_effect=self.slow_generation).start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    async def slow_generation(self, payload, connector, context):
+        await self.release.wait()
+        return "Scenario: get an item"
+
+    async def test_job_runs_in_the_background(self):
+        engine = GenerationJobEngine(workers=2, max_jobs=10, ttl=60)
+        job = engine.submit(spec_payload(), self.connector)
+        self.assertEqual(job.status, JobStatus.QUEUED)
+        await asyncio.sleep(0)
+        self.assertEqual(job.status, JobStatus.RUNNING)
+
+        self.release.set()
+        await job.wait(1)
+        self.assertEqual(engine.get(job.id).to_dict()["result"], "Scenario: get an item")
+        self.assertEqual(job.status, JobStatus.SUCCEEDED)
+
+    @patch("src.services.generation_jobs.agenerate_step_definition_jumpstart", return_value="Given an item")
+    async def test_step_definition_job(self, generate):
+        engine = GenerationJobEngine(workers=2, max_jobs=10, ttl=60)
+        payload = StepInferencePayload(inputs={"spec": "openapi: 3.0.0", "tc": "Scenario: get an item"},
+                                       parameters={})
+        job = await engine.submit(payload, self.connector).wait(1)
+        self.assertEqual((job.task, job.result), ("step-definition", "Given an item"))
+
+    async def test_workers_cap_running_jobs(self):
+        engine = GenerationJobEngine(workers=1, max_jobs=10, ttl=60)
+        first, second = engine.submit(spec_payload(), self.connector), engine.submit(spec_payload(), self.connector)
+        await asyncio.sleep(0)
+        self.assertEqual((first.status, second.status), (JobStatus.RUNNING, JobStatus.QUEUED))
+        self.assertEqual(engine.stats(), {"stored": 2, "queued": 1, "running": 1})
+        self.release.set()
+        await second.wait(1)
+        self.assertEqual(second.status, JobStatus.SUCCEEDED)
+
+    async def test_cancel(self):
+        engine = GenerationJobEngine(workers=1, max_jobs=10, ttl=60)
+        running, queued = engine.submit(spec_payload(), self.connector), engine.submit(spec_payload(), self.connector)
+        await asyncio.sleep(0)
+        await engine.cancel(queued.id)
+        await engine.cancel(running.id)
+        self.assertEqual((running.status, queued.status), (JobStatus.CANCELLED, JobStatus.CANCELLED))
+        self.assertEqual(self.generate.call_count, 1)
+
+    async def test_failed_job_keeps_the_error(self):
+        self.generate.side_effect = HTTPException(status_code=429, detail="Endpoint is overloaded")
+        engine = GenerationJobEngine(workers=1, max_jobs=10, ttl=60)
+        job = await engine.submit(spec_payload(), self.connector).wait(1)
+        self.assertEqual((job.status, job.error, job.error_status), (JobStatus.FAILED, "Endpoint is overloaded", 429))
+
+    async def test_store_is_bounded(self):
+        engine = GenerationJobEngine(workers=2, max_jobs=2, ttl=60)
+        self.release.set()
+        finished = await engine.submit(spec_payload(), self.connector).wait(1)
+        self.release.clear()
+        engine.submit(spec_payload(), self.connector)
+        engine.submit(spec_payload(), self.connector)
+        self.assertIsNone(engine.get(finished.id))
+        with self.assertRaises(HTTPException) as raised:
+            engine.submit(spec_payload(), self.connector)
+        self.assertEqual(raised.exception.status_code, 429)
+        self.release.set()
+
+    async def test_results_expire(self):
+        engine = GenerationJobEngine(workers=1, max_jobs=10, ttl=0)
+        self.release.set()
+        job = await engine.submit(spec_payload(), self.connector).wait(1)
+        await asyncio.sleep(0.001)
+        self.assertIsNone(engine.get(job.id))
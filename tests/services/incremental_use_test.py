@@ -0,0 +1,117 @@
+import json
+import threading
+import unittest
+from unittest.mock import Mock, patch
+
+from fastapi import HTTPException
+
+from src.models.request import SpecInferencePayload
+from src.services.incremental_use import agenerate_incremental_testcases, split_operations
+from src.services.response_cache import MemoryTier, ResponseCache
+from src.services.sagemaker_models.connector import Connector
+from src.services.inference_context import InferenceContext
+
+SPEC = """
+openapi: 3.0.0
+info: {title: Items, version: 1.0.0}
+paths:
+  /items/{id}:
+    parameters:
+      - {name: id, in: path, required: true, schema: {type: integer}}
+    get:
+      responses:
+        200: {content: {application/json: {schema: {$ref: '#/components/schemas/Item'}}}}
+    delete:
+      responses: {204: {description: deleted}}
+  /health:
+    get:
+      responses: {200: {description: ok}}
+components:
+  schemas:
+    Item: {type: object, properties: {tags: {type: array, items: {$ref: '#/components/schemas/Tag'}}}}
+    Tag: {type: string}
+    Unused: {type: string}
+"""
+
+
+class SplitOperationsTest(unittest.TestCase):
+    def test_one_unit_per_operation(self):
+        operations = split_operations(SPEC)
+        self.assertEqual(list(operations), ["GET /items/{id}", "DELETE /items/{id}", "GET /health"])
+        get_item = operations["GET /items/{id}"]
+        self.assertEqual(get_item["paths"]["/items/{id}"]["parameters"][0]["name"], "id")
+        self.assertNotIn("delete", get_item["paths"]["/items/{id}"])
+        self.assertEqual(set(get_item["components"]["schemas"]), {"Item", "Tag"})
+        self.assertNotIn("components", operations["GET /health"])
+        self.assertNotIn("info", get_item)
+
+    def test_invalid_spec(self):
+        with self.assertRaises(ValueError):
+            split_operations("just some text")
+
+
+class IncrementalTestcasesTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        registry = patch("src.services.incremental_use.get_prompt_registry").start()
+        registry.return_value.text.return_value = "prompt"
+        patch("src.services.incremental_use.get_operation_store",
+              return_value=ResponseCache(MemoryTier(16), None, ttl=60)).start()
+        self.generate = patch("src.services.incremental_use.agenerate_testcases_jumpstart",
+                              side_effect=self.fake_generation).start()
+        self.connector = Mock(spec=Connector)
+
+    def tearDown(self):
+        patch.stopall()
+
+    async def fake_generation(self, specification, connector, context):
+        path, item = next(iter(json.loads(specification.inputs)["paths"].items()))
+        return f"Test cases of {' '.join(method for method in item if method != 'parameters')} {path}"
+
+    def payload(self, spec: str) -> SpecInferencePayload:
+        return SpecInferencePayload(inputs=spec, parameters={"do_sample": False})
+
+    async def test_only_changed_operations_are_regenerated(self):
+        first = await agenerate_incremental_testcases(self.payload(SPEC), self.connector)
+        self.assertEqual(len(first["regenerated"]), 3)
+
+        # a new version and a changed component of GET /items/{id} only
+        changed = SPEC.replace("version: 1.0.0", "version: 1.0.1").replace("Tag: {type: string}",
+                                                                           "Tag: {type: integer}")
+        second = await agenerate_incremental_testcases(self.payload(changed), self.connector)
+        self.assertEqual(second["regenerated"], ["GET /items/{id}"])
+        self.assertEqual(second["reused"], ["DELETE /items/{id}", "GET /health"])
+        self.assertEqual(self.generate.call_count, 4)
+        self.assertEqual(second["testcases"], "Test cases of get /items/{id}\n\nTest cases of delete /items/{id}\n\n"
+                                              "Test cases of get /health")
+
+    async def test_parameters_and_no_cache_regenerate(self):
+        await agenerate_incremental_testcases(self.payload(SPEC), self.connector)
+        sampled = await agenerate_incremental_testcases(SpecInferencePayload(inputs=SPEC, parameters={}),
+                                                        self.connector)
+        self.assertEqual(len(sampled["regenerated"]), 3)
+        forced = await agenerate_incremental_testcases(self.payload(SPEC), self.connector,
+                                                       InferenceContext(use_cache=False))
+        self.assertEqual(len(forced["regenerated"]), 3)
+
+    async def test_failed_operations_are_reported(self):
+        self.generate.side_effect = HTTPException(status_code=429, detail="Endpoint is overloaded")
+        result = await agenerate_incremental_testcases(self.payload(SPEC), self.connector)
+        self.assertEqual(len(result["failed"]), 3)
+        self.assertEqual(result["testcases"], "")
+
+    async def test_spec_is_split_off_the_loop(self):
+        threads = []
+
+        def split(spec):
+            threads.append(threading.current_thread())
+            return split_operations(spec)
+
+        with patch("src.services.incremental_use.split_operations", side_effect=split):
+            await agenerate_incremental_testcases(self.payload(SPEC), self.connector)
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.current_thread())
+
+    async def test_not_a_spec(self):
+        with self.assertRaises(HTTPException) as raised:
+            await agenerate_incremental_testcases(self.payload("just some text"), self.connector)
+        self.assertEqual(raised.exception.status_code, 400)
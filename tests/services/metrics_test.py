@@ -0,0 +1,41 @@
+import unittest
+
+from src.services.metrics import MetricsRegistry
+
+
+class MetricsRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = self.registry.histogram("stage_seconds", "Stage latency", ("stage",), buckets=(0.1, 1.0))
+        child = histogram.labels("invoke_endpoint")
+        for value in [0.05, 0.5, 0.5, 2.0]:
+            child.observe(value)
+        text = self.registry.render()
+        self.assertIn('stage_seconds_bucket{stage="invoke_endpoint",le="0.1"} 1', text)
+        self.assertIn('stage_seconds_bucket{stage="invoke_endpoint",le="1"} 3', text)
+        self.assertIn('stage_seconds_bucket{stage="invoke_endpoint",le="+Inf"} 4', text)
+        self.assertIn('stage_seconds_sum{stage="invoke_endpoint"} 3.05', text)
+        self.assertIn('stage_seconds_count{stage="invoke_endpoint"} 4', text)
+
+    def test_counter_and_gauge(self):
+        counter = self.registry.counter("requests_total", "Requests", ("route", "status"))
+        counter.labels("/inference/testcases", "200").inc()
+        counter.labels("/inference/testcases", "200").inc()
+        gauge = self.registry.gauge("in_flight", "In flight")
+        gauge.labels().inc()
+        text = self.registry.render()
+        self.assertIn('requests_total{route="/inference/testcases",status="200"} 2', text)
+        self.assertIn("in_flight 1", text)
+        self.assertIn("# TYPE requests_total counter", text)
+
+    def test_labels_are_checked(self):
+        counter = self.registry.counter("requests_total", "Requests", ("route",))
+        with self.assertRaises(ValueError):
+            counter.labels("/inference/testcases", "200")
+
+    def test_renders_stats_as_gauges(self):
+        text = self.registry.render({"model_cache": {"hits": 3, "hit_ratio": 0.75}, "response_cache": None})
+        self.assertIn("model_cache_hits 3", text)
+        self.assertIn("model_cache_hit_ratio 0.75", text)
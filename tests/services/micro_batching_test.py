@@ -0,0 +1,80 @@
+import asyncio
+import json
+import unittest
+
+from fastapi import HTTPException
+
+from src.services.inference_context import Priority
+from src.services.micro_batching import MicroBatcher
+
+MODEL = "Models-LlaMa-2-7b"
+
+
+def payload(content: str, temperature: float = 0.5) -> str:
+    return json.dumps({"inputs": [[{"role": "user", "content": content}]], "parameters": {"temperature": temperature}})
+
+
+class MicroBatcherTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.invocations = []
+
+    async def invoke(self, body: str, priority: int) -> list:
+        self.invocations.append((json.loads(body), priority))
+        await asyncio.sleep(0.01)
+        return [{"generation": {"content": dialog[-1]["content"].upper()}} for dialog in json.loads(body)["inputs"]]
+
+    async def test_concurrent_invocations_are_merged(self):
+        batcher = MicroBatcher(window=0.05, max_size=8)
+        results = await asyncio.gather(*(batcher.submit(MODEL, payload(content), self.invoke)
+                                         for content in ("a", "b", "c")))
+        self.assertEqual(results, [[{"generation": {"content": content}}] for content in ("A", "B", "C")])
+        self.assertEqual(len(self.invocations), 1)
+        body, priority = self.invocations[0]
+        self.assertEqual([dialog[0]["content"] for dialog in body["inputs"]], ["a", "b", "c"])
+        self.assertEqual(body["parameters"], {"temperature": 0.5})
+        self.assertEqual(priority, Priority.INTERACTIVE)
+        self.assertEqual(batcher.stats(), {"batches": 1, "batched_requests": 3, "pending": 0})
+
+    async def test_batches_are_split_by_parameters_and_priority(self):
+        batcher = MicroBatcher(window=0.05, max_size=8)
+        await asyncio.gather(batcher.submit(MODEL, payload("a"), self.invoke),
+                             batcher.submit(MODEL, payload("b", temperature=0.1), self.invoke),
+                             batcher.submit(MODEL, payload("c"), self.invoke, Priority.BATCH))
+        self.assertEqual(len(self.invocations), 3)
+
+    async def test_full_batch_is_sent_before_the_window(self):
+        batcher = MicroBatcher(window=10, max_size=2)
+        results = await asyncio.wait_for(asyncio.gather(batcher.submit(MODEL, payload("a"), self.invoke),
+                                                        batcher.submit(MODEL, payload("b"), self.invoke)), 1)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(len(self.invocations), 1)
+
+    async def test_error_fails_the_whole_batch(self):
+        batcher = MicroBatcher(window=0.01, max_size=8)
+
+        async def invoke(body: str, priority: int) -> list:
+            raise HTTPException(status_code=500, detail="Failed to predict")
+
+        results = await asyncio.gather(batcher.submit(MODEL, payload("a"), invoke),
+                                       batcher.submit(MODEL, payload("b"), invoke), return_exceptions=True)
+        self.assertTrue(all(isinstance(result, HTTPException) for result in results))
+
+    async def test_short_response_fails_the_batch(self):
+        batcher = MicroBatcher(window=0.01, max_size=8)
+
+        async def invoke(body: str, priority: int) -> list:
+            return [{"generation": {"content": "A"}}]
+
+        with self.assertRaises(HTTPException):
+            await asyncio.gather(batcher.submit(MODEL, payload("a"), invoke),
+                                 batcher.submit(MODEL, payload("b"), invoke))
+
+    async def test_payload_without_dialogs_is_not_batched(self):
+        batcher = MicroBatcher(window=10, max_size=8)
+        body = json.dumps({"inputs": "dummy inputs", "parameters": {}})
+
+        async def invoke(sent: str, priority: int) -> list:
+            return [sent]
+
+        self.assertEqual(await asyncio.wait_for(batcher.submit(MODEL, body, invoke), 1), [body])
+        self.assertEqual(batcher.stats()["batches"], 0)
@@ -0,0 +1,82 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.services.openai_client import OpenAIChat
+
+
+class StubOpenAI(BaseHTTPRequestHandler):
+    """Chat completions API answering "dummy testcases", token by token when streamed"""
+    protocol_version = "HTTP/1.1"
+    status = 200
+    connections = set()
+
+    def do_POST(self):
+        StubOpenAI.connections.add(self.client_address)
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.status != 200:
+            return self.reply(self.status, "application/json", json.dumps({"error": {"message": "overloaded"}}))
+        if not request.get("stream"):
+            return self.reply(200, "application/json", json.dumps(self.completion("dummy testcases")))
+        events = [self.chunk(token) for token in ["dummy", " testcases"]]
+        self.reply(200, "text/event-stream", "".join(f"data: {json.dumps(event)}\n\n" for event in events)
+                   + "data: [DONE]\n\n")
+
+    def reply(self, status: int, content_type: str, body: str):
+        body = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    @staticmethod
+    def completion(content: str) -> dict:
+        return {"id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": "gpt-3.5-turbo",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}]}
+
+    @staticmethod
+    def chunk(content: str) -> dict:
+        return {"id": "chatcmpl-1", "object": "chat.completion.chunk", "created": 0, "model": "gpt-3.5-turbo",
+                "choices": [{"index": 0, "finish_reason": None, "delta": {"content": content}}]}
+
+    def log_message(self, *args):
+        pass
+
+
+class OpenAIChatTest(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubOpenAI)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    async def asyncSetUp(self):
+        StubOpenAI.status = 200
+        StubOpenAI.connections = set()
+        self.chat = OpenAIChat(api_key="test", model="gpt-3.5-turbo", max_retries=0,
+                               base_url=f"http://127.0.0.1:{self.server.server_port}/v1")
+
+    async def asyncTearDown(self):
+        await self.chat.close()
+
+    async def test_complete_reuses_connections(self):
+        for _ in range(3):
+            self.assertEqual(await self.chat.complete([{"role": "user", "content": "spec"}]), "dummy testcases")
+        self.assertEqual(len(StubOpenAI.connections), 1)
+
+    async def test_stream(self):
+        tokens = await self.chat.stream([{"role": "user", "content": "spec"}])
+        self.assertEqual([token async for token in tokens], ["dummy", " testcases"])
+
+    async def test_errors(self):
+        StubOpenAI.status = 500
+        with self.assertRaises(RuntimeError):
+            await self.chat.complete([{"role": "user", "content": "spec"}])
+        with self.assertRaises(RuntimeError):
+            await self.chat.stream([{"role": "user", "content": "spec"}])
@@ -0,0 +1,52 @@
+import asyncio
+import unittest
+from unittest.mock import Mock, patch
+
+from fastapi import HTTPException
+
+from src.models.request import PipelineInferencePayload
+from src.services.pipeline_use import astream_step_definitions, split_testcases
+from src.services.sagemaker_models.connector import Connector
+
+
+class SplitTestcasesTest(unittest.TestCase):
+    def test_headings(self):
+        plan = "Here are the test cases:\n\nTest case 1: get an item\nGET /items/1\n\n## Test Case 2: missing item\n" \
+               "GET /items/0 returns 404"
+        self.assertEqual(split_testcases(plan), ["Test case 1: get an item\nGET /items/1",
+                                                 "## Test Case 2: missing item\nGET /items/0 returns 404"])
+
+    def test_numbered_items(self):
+        self.assertEqual(split_testcases("1. get an item\n2) delete an item"), ["1. get an item", "2) delete an item"])
+
+    def test_single_testcase(self):
+        self.assertEqual(split_testcases("get an item\n"), ["get an item"])
+        self.assertEqual(split_testcases("  "), [])
+
+
+class StepDefinitionsTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.payload = PipelineInferencePayload(inputs="openapi: 3.0.0", parameters={}, step_parameters={})
+        self.running, self.peak = 0, 0
+
+    async def generate(self, test_plan, connector, context):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.01 * len(test_plan.inputs.tc))
+        self.running -= 1
+        if test_plan.inputs.tc == "fail":
+            raise HTTPException(status_code=500, detail="Failed to predict")
+        return f"steps of {test_plan.inputs.tc}"
+
+    async def run_pipeline(self, testcases):
+        return [record async for record in astream_step_definitions(self.payload, testcases, Mock(spec=Connector))]
+
+    @patch("src.services.pipeline_use.get_settings")
+    async def test_concurrent_and_in_completion_order(self, settings):
+        settings.return_value.pipeline_concurrency = 2
+        with patch("src.services.pipeline_use.agenerate_step_definition_jumpstart", side_effect=self.generate):
+            records = await self.run_pipeline(["ccc", "a", "bb", "fail"])
+        self.assertEqual(self.peak, 2)
+        self.assertEqual([record["index"] for record in records], [1, 0, 2, 3])
+        self.assertEqual(records[0], {"index": 1, "testcase": "a", "status": "ok", "result": "steps of a"})
+        self.assertEqual(records[-1]["error"], "Failed to predict")
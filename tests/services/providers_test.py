@@ -0,0 +1,30 @@
+import asyncio
+import sys
+import threading
+import unittest
+from unittest.mock import Mock, patch
+
+from src.services.providers import Provider
+
+
+class ProviderTest(unittest.TestCase):
+    def test_module_is_imported_on_first_use(self):
+        module = Mock()
+        provider = Provider(".openai_client", "make_openai_chat")
+        with patch.dict(sys.modules, {"src.services.openai_client": module}):
+            self.assertFalse(provider.loaded)
+            self.assertIs(provider.get(), module.make_openai_chat.return_value)
+            self.assertIs(provider.get(), module.make_openai_chat.return_value)
+        self.assertTrue(provider.loaded)
+        module.make_openai_chat.assert_called_once()
+
+    def test_first_async_use_imports_off_the_loop(self):
+        threads = []
+        module = Mock()
+        module.make_openai_chat.side_effect = lambda: threads.append(threading.current_thread()) or "client"
+        provider = Provider(".openai_client", "make_openai_chat")
+        with patch.dict(sys.modules, {"src.services.openai_client": module}):
+            self.assertEqual(asyncio.run(provider.aget()), "client")
+            self.assertEqual(asyncio.run(provider.aget()), "client")
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
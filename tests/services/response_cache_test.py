@@ -0,0 +1,69 @@
+import os
+import tempfile
+import time
+import unittest
+
+from src.models.request import SpecParameters
+from src.services.response_cache import MemoryTier, ResponseCache, SqliteTier, is_deterministic, \
+    is_reproducible, payload_key
+
+
+class IsDeterministicTest(unittest.TestCase):
+    def test_sampled_or_unparameterized_generations_bypass(self):
+        self.assertFalse(is_deterministic(None))
+        self.assertFalse(is_deterministic(SpecParameters()))
+        self.assertTrue(is_deterministic(SpecParameters(do_sample=False)))
+
+    def test_seeded_generations_are_reproducible(self):
+        self.assertFalse(is_reproducible(None))
+        self.assertTrue(is_reproducible(SpecParameters()))
+        self.assertTrue(is_reproducible(SpecParameters(do_sample=False)))
+
+
+class MemoryTierTest(unittest.TestCase):
+    def test_lru_and_ttl(self):
+        tier = MemoryTier(max_entries=2)
+        tier.put("a", 1, time.time() + 60)
+        tier.put("b", 2, time.time() + 60)
+        tier.get("a")
+        tier.put("c", 3, time.time() + 60)
+        self.assertIsNone(tier.get("b"))
+        self.assertEqual(tier.get("a"), 1)
+        tier.put("d", 4, time.time() - 1)
+        self.assertIsNone(tier.get("d"))
+
+
+class SqliteTierTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "responses.sqlite3")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_survives_restart(self):
+        SqliteTier(self.path, max_bytes=1024).put("a", '"value"', time.time() + 60)
+        self.assertEqual(SqliteTier(self.path, max_bytes=1024).get("a"), '"value"')
+
+    def test_evicts_least_recently_used_over_size(self):
+        tier = SqliteTier(self.path, max_bytes=10)
+        tier.put("a", "x" * 4, time.time() + 60)
+        tier.put("b", "y" * 4, time.time() + 60)
+        tier.get("a")
+        tier.put("c", "z" * 4, time.time() + 60)
+        self.assertIsNone(tier.get("b"))
+        self.assertEqual(tier.get("a"), "x" * 4)
+        self.assertLessEqual(tier.size(), 10)
+
+
+class ResponseCacheTest(unittest.IsolatedAsyncioTestCase):
+    async def test_disk_hits_are_promoted(self):
+        with tempfile.TemporaryDirectory() as directory:
+            disk = SqliteTier(os.path.join(directory, "responses.sqlite3"), max_bytes=1024)
+            key = payload_key("Models-LlaMa-2-7b", '{"inputs": []}')
+            await ResponseCache(MemoryTier(8), disk, ttl=60).put(key, [{"generation": {"content": "tc"}}])
+
+            cache = ResponseCache(MemoryTier(8), disk, ttl=60)
+            self.assertEqual(await cache.get(key), [{"generation": {"content": "tc"}}])
+            self.assertEqual(cache.memory.get(key), [{"generation": {"content": "tc"}}])
+            self.assertEqual(cache.stats()["hits"], 1)
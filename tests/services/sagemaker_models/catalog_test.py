@@ -0,0 +1,61 @@
+import unittest
+from unittest.mock import Mock
+
+from src.services.sagemaker_models.catalog import EndpointCatalog
+
+
+def make_sm_client(endpoint_pages, config_pages):
+    paginators = {
+        "list_endpoints": Mock(**{"paginate.return_value": [{"Endpoints": page} for page in endpoint_pages]}),
+        "list_endpoint_configs": Mock(**{"paginate.return_value": [{"EndpointConfigs": page} for page in config_pages]}),
+    }
+    sm_client = Mock()
+    sm_client.get_paginator.side_effect = lambda name: paginators[name]
+    sm_client.describe_endpoint_config.side_effect = lambda EndpointConfigName: {
+        "EndpointConfigName": EndpointConfigName,
+        "EndpointConfigArn": f"arn:{EndpointConfigName}",
+        "ProductionVariants": [],
+        "CreationTime": "2023-08-17T13:20:00",
+    }
+    return sm_client
+
+
+class EndpointCatalogTest(unittest.TestCase):
+    def setUp(self):
+        self.sm_client = make_sm_client(
+            endpoint_pages=[[{"EndpointName": "Models-LlaMa-2-7b", "EndpointStatus": "InService"}],
+                            [{"EndpointName": "Models-LlaMa-2-70b", "EndpointStatus": "Creating"}]],
+            config_pages=[[{"EndpointConfigName": "Models-LlaMa-2-7b"}],
+                          [{"EndpointConfigName": "Models-LlaMa-2-70b"}]],
+        )
+        self.catalog = EndpointCatalog(self.sm_client, ttl=60)
+
+    def tearDown(self):
+        self.catalog.stop()
+
+    def test_walks_all_pages(self):
+        models = self.catalog.get_models()
+        self.assertEqual(set(models), {"Models-LlaMa-2-7b", "Models-LlaMa-2-70b"})
+        self.assertTrue(models["Models-LlaMa-2-7b"].is_active)
+        self.assertFalse(models["Models-LlaMa-2-70b"].is_active)
+        self.assertEqual(self.catalog.get_endpoint("Models-LlaMa-2-70b")["EndpointStatus"], "Creating")
+        self.assertIsNone(self.catalog.get_endpoint("unknown"))
+
+    def test_reads_are_served_from_the_snapshot(self):
+        self.catalog.get_models()
+        self.catalog.get_model("Models-LlaMa-2-7b")
+        self.catalog.get_endpoints()
+        self.assertEqual(self.sm_client.get_paginator.call_count, 2)
+        self.assertEqual(self.sm_client.describe_endpoint_config.call_count, 2)
+
+    def test_invalidate_forces_refresh_without_describing_known_configs(self):
+        self.catalog.get_models()
+        self.catalog.invalidate()
+        self.catalog.get_models()
+        self.assertGreaterEqual(self.sm_client.get_paginator.call_count, 4)
+        self.assertEqual(self.sm_client.describe_endpoint_config.call_count, 2)
+
+    def test_refresh_failure_raises_runtime_error(self):
+        self.sm_client.get_paginator.side_effect = Exception("throttled")
+        with self.assertRaises(RuntimeError):
+            self.catalog.get_models()
@@ -0,0 +1,18 @@
+import unittest
+
+from src.services.sagemaker_models.client_factory import CONTROL_PLANE, RUNTIME, build_config, get_session
+from src.settings import Settings
+
+
+class ClientFactoryTest(unittest.TestCase):
+    def test_config_per_operation_class(self):
+        settings = Settings(runtime_pool_size=96, runtime_read_timeout=600, control_plane_read_timeout=20)
+        runtime = build_config(RUNTIME, settings)
+        control_plane = build_config(CONTROL_PLANE, settings)
+        self.assertEqual((runtime.max_pool_connections, runtime.read_timeout), (96, 600))
+        self.assertEqual(control_plane.read_timeout, 20)
+        self.assertEqual(runtime.retries["mode"], "adaptive")
+        self.assertTrue(runtime.tcp_keepalive)
+
+    def test_session_is_shared(self):
+        self.assertIs(get_session(None), get_session(None))
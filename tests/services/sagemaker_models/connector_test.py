@@ -0,0 +1,55 @@
+import json
+import os
+import unittest
+from unittest.mock import patch
+
+from benchmarks.fake_sagemaker import FakeOptions, FakeSageMaker, serve
+from src.constants import DeploymentStatus
+from src.services.sagemaker_models.connector import Connector
+from src.settings import Settings
+
+
+class ConnectorFakeSageMakerTest(unittest.TestCase):
+    """Connector against the local fake SageMaker, without mocking boto3"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.fake = FakeSageMaker(FakeOptions(latency=0.0, tokens=3, creation_seconds=0.0))
+        cls.server = serve(cls.fake)
+        url = f"http://127.0.0.1:{cls.server.server_port}"
+        cls.env = patch.dict(os.environ, {"AWS_ACCESS_KEY_ID": "test", "AWS_SECRET_ACCESS_KEY": "test"})
+        cls.env.start()
+        settings = Settings(sagemaker_endpoint_url=url, sagemaker_runtime_endpoint_url=url,
+                            deployment_poll_min_interval=0.05, deployment_poll_max_interval=0.1)
+        cls.patches = [patch(f"src.services.sagemaker_models.{module}.get_settings", return_value=settings)
+                       for module in ["client_factory", "connector"]]
+        for settings_patch in cls.patches:
+            settings_patch.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        for settings_patch in cls.patches:
+            settings_patch.stop()
+        cls.env.stop()
+        cls.server.shutdown()
+
+    def setUp(self):
+        self.connector = Connector(aws_profile=None)
+
+    def tearDown(self):
+        self.connector.catalog.stop()
+
+    def test_predict(self):
+        model = self.connector.connect("JumpStart-Model-LLaMa-2-7B")
+        payload = json.dumps({"inputs": [[{"role": "user", "content": "spec"}]], "parameters": {"max_new_tokens": 2}})
+        self.assertEqual(model.predict_jumpstart(payload), [{"generation": {"role": "assistant",
+                                                                            "content": "token0 token1"}}])
+        self.assertEqual(list(model.predict_jumpstart_stream(payload)), ["token0 ", "token1 "])
+
+    def test_deploy_and_delete(self):
+        job = self.connector.get_deployment(self.connector.create_model("Models-LlaMa-2-13b"))
+        job.wait(timeout=30)
+        self.assertEqual(job.status, DeploymentStatus.IN_SERVICE)
+        self.assertTrue(self.connector.get_models()["Models-LlaMa-2-13b"].is_active)
+        self.connector.delete_endpoint("Models-LlaMa-2-13b")
+        self.assertIsNone(self.connector.get_endpoint("Models-LlaMa-2-13b"))
@@ -0,0 +1,44 @@
+import unittest
+from unittest.mock import Mock
+
+from src.constants import DeploymentStatus
+from src.services.sagemaker_models.deployment import DeploymentScheduler
+
+
+class DeploymentSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.sm_client = Mock()
+        self.delete_endpoint = Mock()
+        self.on_change = Mock()
+        self.scheduler = DeploymentScheduler(self.sm_client, delete_endpoint=self.delete_endpoint,
+                                             on_change=self.on_change, min_interval=0.01, max_interval=0.02)
+
+    def test_deploys_in_background(self):
+        self.sm_client.describe_endpoint.side_effect = [{"EndpointStatus": "Creating"},
+                                                        {"EndpointStatus": "InService"}]
+        job = self.scheduler.submit("Models-LlaMa-2-7b", "Models-LlaMa-2-7b")
+        self.assertIs(self.scheduler.submit("Models-LlaMa-2-7b", "Models-LlaMa-2-7b"), job)
+
+        job.wait(timeout=2)
+        self.assertEqual(job.status, DeploymentStatus.IN_SERVICE)
+        self.sm_client.create_endpoint.assert_called_once()
+        self.assertEqual(self.sm_client.describe_endpoint.call_count, 2)
+        self.assertEqual(self.on_change.call_count, 2)
+        self.assertIsNone(self.scheduler.get_by_endpoint("Models-LlaMa-2-7b"))
+        self.assertIs(self.scheduler.get(job.id), job)
+
+    def test_timeout_deletes_endpoint(self):
+        self.sm_client.describe_endpoint.return_value = {"EndpointStatus": "Creating"}
+        job = self.scheduler.submit("Models-LlaMa-2-7b", "Models-LlaMa-2-7b", max_wait_time=0.05)
+        with self.assertRaises(RuntimeError):
+            job.wait(timeout=2)
+        self.assertEqual(job.status, DeploymentStatus.TIMED_OUT)
+        self.delete_endpoint.assert_called_once_with("Models-LlaMa-2-7b")
+
+    def test_create_failure_fails_job(self):
+        self.sm_client.create_endpoint.side_effect = Exception("ResourceLimitExceeded")
+        job = self.scheduler.submit("Models-LlaMa-2-7b", "Models-LlaMa-2-7b")
+        with self.assertRaises(RuntimeError):
+            job.wait(timeout=2)
+        self.assertEqual((job.status, job.error), (DeploymentStatus.FAILED, "ResourceLimitExceeded"))
+        self.delete_endpoint.assert_not_called()
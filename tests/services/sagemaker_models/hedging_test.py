@@ -0,0 +1,124 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from src.services.sagemaker_models.hedging import HedgeBudget, Hedger
+from src.services.sagemaker_models.routing import RoundRobinPolicy
+
+ENDPOINTS = ["Models-LlaMa-2-7b", "Models-LlaMa-2-7b-2"]
+
+
+class HedgeBudgetTest(unittest.TestCase):
+    def test_caps_the_share_of_hedges(self):
+        budget = HedgeBudget(0.1)
+        spent = 0
+        for _ in range(100):
+            budget.on_invocation()
+            spent += budget.try_spend()
+        self.assertEqual(spent, 10)
+
+
+class HedgerTest(unittest.TestCase):
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=4)
+        self.router = RoundRobinPolicy()
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+        self.executor.shutdown(wait=True)
+
+    def make_hedger(self, budget=1.0):
+        hedger = Hedger(self.executor, percentile=50, budget=budget, min_samples=4)
+        for _ in range(4):
+            hedger.observe(0.01)
+        return hedger
+
+    def slow_first_endpoint(self, endpoint_name):
+        if endpoint_name == ENDPOINTS[0]:
+            self.release.wait(5)
+            return "slow"
+        return "fast"
+
+    def test_no_hedge_before_enough_samples(self):
+        hedger = Hedger(self.executor, min_samples=4)
+        self.assertIsNone(hedger.delay())
+        self.assertEqual(hedger.run(lambda endpoint_name: endpoint_name, self.router, ENDPOINTS), ENDPOINTS[0])
+        self.assertEqual(hedger.stats()["hedged"], 0)
+
+    def test_unhedged_call_runs_on_the_calling_thread(self):
+        hedger = Hedger(self.executor, min_samples=4)
+        threads = []
+        hedger.run(lambda endpoint_name: threads.append(threading.current_thread()), self.router, ENDPOINTS)
+        self.assertEqual(threads, [threading.current_thread()])
+
+    def test_slow_call_is_hedged_on_another_endpoint(self):
+        hedger = self.make_hedger()
+        start = time.perf_counter()
+        self.assertEqual(hedger.run(self.slow_first_endpoint, self.router, ENDPOINTS), "fast")
+        # the first result is returned, the original call is still running
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertEqual(hedger.stats()["hedged"], 1)
+        self.assertEqual(hedger.stats()["hedge_wins"], 1)
+
+    def test_busy_executor_runs_the_call_unhedged(self):
+        hedger = Hedger(ThreadPoolExecutor(max_workers=1), percentile=50, budget=1.0, min_samples=4)
+        for _ in range(4):
+            hedger.observe(0.01)
+        threads = []
+
+        def call(endpoint_name):
+            threads.append(threading.current_thread())
+            time.sleep(0.05)
+            return endpoint_name
+
+        self.assertEqual(hedger.run(call, self.router, ENDPOINTS), ENDPOINTS[0])
+        # the single thread ran the original call, no hedge could be sent
+        self.assertEqual(len(threads), 1)
+        self.assertEqual(hedger.stats()["hedged"], 0)
+        hedger.executor.shutdown(wait=True)
+
+    def test_failed_call_returns_the_hedge(self):
+        hedger = self.make_hedger()
+
+        def call(endpoint_name):
+            if endpoint_name == ENDPOINTS[1]:
+                return "hedge"
+            time.sleep(0.2)
+            raise RuntimeError("Failed to predict")
+
+        self.assertEqual(hedger.run(call, self.router, ENDPOINTS), "hedge")
+        self.assertEqual(hedger.stats()["hedge_wins"], 1)
+
+    def test_empty_budget_does_not_hold_a_half_open_probe(self):
+        router = RoundRobinPolicy(failure_threshold=1, open_seconds=0.0)
+        with self.assertRaises(RuntimeError), router.track(ENDPOINTS[1]):
+            raise RuntimeError("Failed to predict")
+        hedger = self.make_hedger(budget=0.0)
+        self.release.set()
+
+        def call(endpoint_name):
+            time.sleep(0.05)
+            return endpoint_name
+
+        hedger.run(call, router, [ENDPOINTS[0], ENDPOINTS[1]])
+        # the half-open endpoint still lets its probe through
+        self.assertEqual(router.choose([ENDPOINTS[1]]), ENDPOINTS[1])
+
+    def test_budget_caps_hedges(self):
+        hedger = self.make_hedger(budget=0.0)
+        self.release.set()
+        self.assertEqual(hedger.run(self.slow_first_endpoint, self.router, ENDPOINTS), "slow")
+        self.assertEqual(hedger.stats()["hedged"], 0)
+
+    def test_failed_hedge_waits_for_the_original_call(self):
+        hedger = self.make_hedger()
+
+        def call(endpoint_name):
+            if endpoint_name == ENDPOINTS[1]:
+                raise RuntimeError("Failed to predict")
+            time.sleep(0.1)
+            return "slow"
+
+        self.assertEqual(hedger.run(call, self.router, ENDPOINTS), "slow")
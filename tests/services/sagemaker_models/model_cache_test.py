@@ -0,0 +1,44 @@
+import unittest
+from unittest.mock import Mock, patch
+
+from src.services.sagemaker_models.model_cache import ModelCache
+
+
+def make_model(*endpoint_names):
+    model = Mock()
+    model.model_config.endpoints = [{"EndpointName": name} for name in endpoint_names]
+    return model
+
+
+class ModelCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = ModelCache(idle_ttl=60)
+
+    def test_counts_hits_and_misses(self):
+        self.assertIsNone(self.cache.get("Models-LlaMa-2-7b"))
+        model = make_model("Models-LlaMa-2-7b")
+        self.cache.put("Models-LlaMa-2-7b", model)
+        self.assertIs(self.cache.get("Models-LlaMa-2-7b"), model)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_idle_handles_expire(self):
+        with patch("src.services.sagemaker_models.model_cache.time.monotonic", return_value=0):
+            self.cache.put("Models-LlaMa-2-7b", make_model("Models-LlaMa-2-7b"))
+        with patch("src.services.sagemaker_models.model_cache.time.monotonic", return_value=61):
+            self.assertIsNone(self.cache.get("Models-LlaMa-2-7b"))
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_sync_evicts_inactive_and_updates_active(self):
+        self.cache.put("Models-LlaMa-2-7b", make_model("Models-LlaMa-2-7b"))
+        active = make_model("Models-LlaMa-2-70b")
+        self.cache.put("Models-LlaMa-2-70b", active)
+        new_config = Mock(is_active=True)
+        self.cache.sync({"Models-LlaMa-2-7b": Mock(is_active=False), "Models-LlaMa-2-70b": new_config})
+        self.assertIsNone(self.cache.get("Models-LlaMa-2-7b"))
+        self.assertIs(self.cache.get("Models-LlaMa-2-70b").model_config, new_config)
+
+    def test_evict_by_replica_endpoint(self):
+        self.cache.put("Models-LlaMa-2-7b", make_model("Models-LlaMa-2-7b", "Models-LlaMa-2-7b-2"))
+        self.cache.evict("Models-LlaMa-2-7b-2")
+        self.assertEqual(self.cache.stats()["size"], 0)
@@ -0,0 +1,131 @@
+import io
+import json
+import time
+import unittest
+from unittest.mock import MagicMock, Mock, patch
+
+from src.services.sagemaker_models.model import Model
+from src.services.sagemaker_models.routing import (
+    CircuitBreaker, EndpointUnavailable, EwmaLatencyPolicy, LeastOutstandingPolicy, RoundRobinPolicy, make_policy,
+)
+
+ENDPOINTS = ["Models-LlaMa-2-7b", "Models-LlaMa-2-7b-2", "Models-LlaMa-2-7b-3"]
+
+
+def make_config(*endpoint_names):
+    return Mock(endpoints=[{"EndpointName": name} for name in endpoint_names])
+
+
+class RoutingPolicyTest(unittest.TestCase):
+    def test_round_robin_cycles(self):
+        policy = RoundRobinPolicy()
+        self.assertEqual([policy.choose(ENDPOINTS) for _ in range(6)], ENDPOINTS * 2)
+
+    def test_least_outstanding_avoids_busy_endpoints(self):
+        policy = LeastOutstandingPolicy()
+        with policy.track(ENDPOINTS[0]), policy.track(ENDPOINTS[1]):
+            for _ in range(3):
+                self.assertEqual(policy.choose(ENDPOINTS), ENDPOINTS[2])
+        self.assertEqual(policy.stats()[ENDPOINTS[0]]["in_flight"], 0)
+
+    def test_ewma_prefers_fast_endpoints(self):
+        policy = EwmaLatencyPolicy()
+        policy._stats = {name: Mock(ewma_latency=latency, in_flight=0)
+                         for name, latency in zip(ENDPOINTS, [0.5, 0.1, 0.9])}
+        self.assertEqual(policy.choose(ENDPOINTS), ENDPOINTS[1])
+        policy._stats[ENDPOINTS[1]].in_flight = 9
+        self.assertEqual(policy.choose(ENDPOINTS), ENDPOINTS[0])
+
+    def test_failures_are_counted(self):
+        policy = RoundRobinPolicy()
+        with self.assertRaises(ValueError), policy.track(ENDPOINTS[0]):
+            raise ValueError()
+        self.assertEqual(policy.stats()[ENDPOINTS[0]]["failures"], 1)
+        self.assertIsNone(policy.stats()[ENDPOINTS[0]]["ewma_latency"])
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            make_policy("random")
+
+    def test_no_endpoint(self):
+        with self.assertRaises(RuntimeError):
+            RoundRobinPolicy().choose([])
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def fail(self, policy, endpoint_name):
+        with self.assertRaises(ValueError), policy.track(endpoint_name):
+            raise ValueError()
+
+    def test_opens_after_consecutive_failures(self):
+        policy = RoundRobinPolicy(failure_threshold=2)
+        self.fail(policy, ENDPOINTS[0])
+        self.assertIn(ENDPOINTS[0], [policy.choose(ENDPOINTS) for _ in range(3)])
+        self.fail(policy, ENDPOINTS[0])
+        self.assertEqual(policy.stats()[ENDPOINTS[0]]["breaker"], CircuitBreaker.OPEN)
+        self.assertNotIn(ENDPOINTS[0], [policy.choose(ENDPOINTS) for _ in range(6)])
+
+    def test_half_open_lets_a_single_probe_through(self):
+        policy = RoundRobinPolicy(failure_threshold=1, open_seconds=30)
+        self.fail(policy, ENDPOINTS[0])
+        with self.assertRaises(EndpointUnavailable):
+            policy.choose(ENDPOINTS[:1])
+
+        with patch("src.services.sagemaker_models.routing.time.monotonic", return_value=time.monotonic() + 31):
+            self.assertEqual(policy.choose(ENDPOINTS[:1]), ENDPOINTS[0])
+            # the probe is running, no other invocation goes to the endpoint
+            with self.assertRaises(EndpointUnavailable):
+                policy.choose(ENDPOINTS[:1])
+            with policy.track(ENDPOINTS[0]):
+                pass
+        self.assertEqual(policy.stats()[ENDPOINTS[0]]["breaker"], CircuitBreaker.CLOSED)
+        self.assertEqual(policy.choose(ENDPOINTS[:1]), ENDPOINTS[0])
+
+    def test_released_probe_can_be_sent_again(self):
+        policy = RoundRobinPolicy(failure_threshold=1, open_seconds=0.0)
+        self.fail(policy, ENDPOINTS[0])
+        self.assertEqual(policy.choose(ENDPOINTS[:1]), ENDPOINTS[0])
+        policy.release(ENDPOINTS[0])
+        self.assertEqual(policy.choose(ENDPOINTS[:1]), ENDPOINTS[0])
+
+    def test_slow_calls_count_as_failures(self):
+        policy = RoundRobinPolicy(failure_threshold=1, slow_call_seconds=0.0)
+        with policy.track(ENDPOINTS[0]):
+            time.sleep(0.001)
+        self.assertEqual(policy.stats()[ENDPOINTS[0]]["breaker"], CircuitBreaker.OPEN)
+
+
+class ModelRoutingTest(unittest.TestCase):
+    def setUp(self):
+        self.smr_client = MagicMock()
+        self.smr_client.invoke_endpoint.side_effect = lambda **kwargs: {
+            "ResponseMetadata": {"HTTPStatusCode": 200},
+            "Body": io.BytesIO(json.dumps([{"generation": {"content": "ok"}}]).encode()),
+        }
+        self.model = Model(self.smr_client, make_config(*ENDPOINTS), router=RoundRobinPolicy())
+
+    def invoked_endpoints(self):
+        return [call.kwargs["EndpointName"] for call in self.smr_client.invoke_endpoint.call_args_list]
+
+    def test_spreads_invocations_over_endpoints(self):
+        for _ in range(3):
+            self.model.predict_jumpstart("{}")
+        self.assertEqual(self.invoked_endpoints(), ENDPOINTS)
+
+    def test_endpoints_leaving_service_are_dropped(self):
+        self.model.predict_jumpstart("{}")
+        self.model.model_config = make_config(ENDPOINTS[1])
+        for _ in range(2):
+            self.model.predict_jumpstart("{}")
+        self.assertEqual(self.invoked_endpoints(), [ENDPOINTS[0], ENDPOINTS[1], ENDPOINTS[1]])
+        self.assertEqual(list(self.model.router.stats()), [ENDPOINTS[1]])
+
+    def test_stream_stays_in_flight_until_closed(self):
+        self.smr_client.invoke_endpoint_with_response_stream.return_value = {
+            "ResponseMetadata": {"HTTPStatusCode": 200},
+            "Body": MagicMock(__iter__=lambda _: iter([{"PayloadPart": {"Bytes": b'data:{"token": {"text": "a"}}\n'}}])),
+        }
+        tokens = self.model.predict_jumpstart_stream("{}")
+        self.assertEqual(self.model.router.stats()[ENDPOINTS[0]]["in_flight"], 1)
+        self.assertEqual(list(tokens), ["a"])
+        self.assertEqual(self.model.router.stats()[ENDPOINTS[0]]["in_flight"], 0)
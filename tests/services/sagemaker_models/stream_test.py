@@ -0,0 +1,18 @@
+import unittest
+
+from src.services.sagemaker_models.stream import TokenStreamDecoder
+
+
+class TokenStreamDecoderTest(unittest.TestCase):
+    def test_lines_split_across_parts(self):
+        decoder = TokenStreamDecoder()
+        self.assertEqual(decoder.feed(b'data:{"token": {"text": "Feat'), [])
+        self.assertEqual(decoder.feed(b'ure"}}\n\ndata:{"token": {"text": ":"}}\n'), ["Feature", ":"])
+        self.assertEqual(decoder.feed(b'data:{"token": {"text": "</s>", "special": true}}\n'), [])
+        self.assertEqual(decoder.feed(b'{"token": {"text": " login"}}'), [])
+        self.assertEqual(decoder.flush(), [" login"])
+
+    def test_whole_generation(self):
+        decoder = TokenStreamDecoder()
+        self.assertEqual(decoder.feed(b'[{"generation": {"role": "assistant", "content": "Scenario"}}]\n'),
+                         ["Scenario"])
@@ -0,0 +1,47 @@
+import asyncio
+import unittest
+
+from src.services.singleflight import SingleFlight
+
+
+class SingleFlightTest(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_duplicates_share_one_call(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def call():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "testcases"
+
+        results = await asyncio.gather(*[flight.do("key", call) for _ in range(5)], flight.do("other", call))
+        self.assertEqual(results, ["testcases"] * 6)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(flight.stats(), {"upstream_calls": 2, "coalesced": 4, "in_flight": 0})
+
+    async def test_errors_are_shared_and_not_cached(self):
+        flight = SingleFlight()
+
+        async def call():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("throttled")
+
+        results = await asyncio.gather(flight.do("key", call), flight.do("key", call), return_exceptions=True)
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+        with self.assertRaises(RuntimeError):
+            await flight.do("key", call)
+        self.assertEqual(flight.calls, 2)
+
+    async def test_cancelled_leader_does_not_cancel_followers(self):
+        flight = SingleFlight()
+
+        async def call():
+            await asyncio.sleep(0.05)
+            return "testcases"
+
+        leader = asyncio.create_task(flight.do("key", call))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("key", call))
+        await asyncio.sleep(0)
+        leader.cancel()
+        self.assertEqual(await follower, "testcases")
@@ -0,0 +1,43 @@
+import asyncio
+import unittest
+from unittest.mock import Mock
+
+from src.services.status_watcher import EndpointStatusWatcher
+
+
+class EndpointStatusWatcherTest(unittest.IsolatedAsyncioTestCase):
+    def make_watcher(self, snapshots):
+        connector = Mock()
+        snapshots = iter(snapshots)
+        last = {}
+
+        def refresh():
+            nonlocal last
+            last = next(snapshots, last)
+            return last
+
+        connector.catalog.refresh.side_effect = refresh
+        return EndpointStatusWatcher(connector, min_interval=0.01, max_interval=0.05, expected_transition=1)
+
+    async def test_subscribers_share_one_poll_loop(self):
+        creating = {"Models-LlaMa-2-7b": {"EndpointName": "Models-LlaMa-2-7b", "EndpointStatus": "Creating"}}
+        in_service = {"Models-LlaMa-2-7b": {"EndpointName": "Models-LlaMa-2-7b", "EndpointStatus": "InService"}}
+        watcher = self.make_watcher([{}, creating, creating, in_service])
+
+        queues = [watcher.subscribe("Models-LlaMa-2-7b") for _ in range(100)]
+        for queue in queues:
+            statuses = [(await asyncio.wait_for(queue.get(), 1))["status"] for _ in range(3)]
+            self.assertEqual(statuses, ["Nonexistent", "Creating", "InService"])
+        self.assertLess(watcher.polls, 20)
+
+        for queue in queues:
+            watcher.unsubscribe("Models-LlaMa-2-7b", queue)
+        await asyncio.wait_for(watcher._task, 1)
+
+    def test_backs_off_when_idle(self):
+        watcher = self.make_watcher([])
+        watcher._subscribers["Models-LlaMa-2-7b"].add(Mock())
+        watcher._statuses["Models-LlaMa-2-7b"] = ("InService", 0)
+        self.assertEqual(watcher._next_interval(0.01, changed=False), 0.02)
+        self.assertEqual(watcher._next_interval(0.04, changed=False), 0.05)
+        self.assertEqual(watcher._next_interval(0.05, changed=True), 0.01)
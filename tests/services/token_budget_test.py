@@ -0,0 +1,91 @@
+import json
+import unittest
+from unittest.mock import Mock, patch
+
+from src.models.request import SpecInferencePayload, SpecParameters
+from src.services.inference_context import CacheStatus, InferenceContext
+from src.services.model_use import agenerate_testcases_jumpstart
+from src.services.sagemaker_models.connector import Connector
+from src.services.token_budget import TokenBudgetAdvisor
+
+MODEL = "Models-LlaMa-2-7b"
+
+
+class TokenBudgetAdvisorTest(unittest.TestCase):
+    def setUp(self):
+        self.advisor = TokenBudgetAdvisor(min_samples=10, chars_per_token=1.0)
+
+    def test_no_budget_before_min_samples(self):
+        for _ in range(9):
+            self.advisor.observe("testcases", MODEL, "x" * 100)
+        self.assertIsNone(self.advisor.budget("testcases", MODEL, 2048))
+        self.assertIsNone(self.advisor.budget("step-definition", MODEL, 2048))
+
+    def test_budget_is_rounded_percentile_plus_margin(self):
+        for length in range(100, 1100, 10):
+            self.advisor.observe("testcases", MODEL, "x" * length)
+        # p99 of 100..1090 is 1090, plus 25% is 1362.5, rounded up to 1408
+        self.assertEqual(self.advisor.budget("testcases", MODEL, 2048), 1408)
+        self.assertIsNone(self.advisor.budget("testcases", MODEL, 1024))
+        self.assertIsNone(self.advisor.budget("testcases", "Models-LlaMa-2-70b", 2048))
+
+    def test_truncation(self):
+        self.assertTrue(self.advisor.is_truncated("x" * 120, 128))
+        self.assertFalse(self.advisor.is_truncated("x" * 100, 128))
+
+    def test_distributions(self):
+        for _ in range(10):
+            self.advisor.observe("testcases", MODEL, "x" * 40)
+        self.advisor.on_truncated("testcases", MODEL)
+        learned = self.advisor.distributions()["testcases"][MODEL]
+        self.assertEqual(learned["samples"], 10)
+        self.assertEqual(learned["p99"], 40)
+        self.assertEqual(learned["budget"], 128)
+        self.assertEqual(learned["truncated"], 1)
+        self.assertEqual(self.advisor.stats(), {"distributions": 1, "adapted": 0, "truncated": 1})
+
+
+class AdaptiveGenerationTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        registry = patch("src.services.model_use.get_prompt_registry").start()
+        registry.return_value.text.return_value = "system prompt"
+        registry.return_value.render.return_value = "query prompt"
+        self.advisor = TokenBudgetAdvisor(min_samples=1, chars_per_token=1.0)
+        patch("src.services.model_use.get_token_budget_advisor", return_value=self.advisor).start()
+        self.invoke = patch("src.services.model_use.aget_inference_jumpstart").start()
+        self.outputs = []
+
+        async def invoke(payload, model, connector, context):
+            context.cache_status = CacheStatus.MISS
+            return [{"generation": {"content": self.outputs.pop(0)}}]
+
+        self.invoke.side_effect = invoke
+
+    def tearDown(self):
+        patch.stopall()
+
+    def budgets(self) -> list:
+        return [json.loads(call.args[0])["parameters"]["max_new_tokens"] for call in self.invoke.call_args_list]
+
+    async def generate(self, parameters: SpecParameters) -> str:
+        spec = SpecInferencePayload(inputs="dummy inputs", parameters=parameters, model=MODEL)
+        return await agenerate_testcases_jumpstart(spec, Mock(spec=Connector), InferenceContext())
+
+    async def test_unset_max_new_tokens_is_adapted(self):
+        self.advisor.observe("testcases", MODEL, "x" * 100)
+        self.outputs = ["x" * 50]
+        self.assertEqual(await self.generate(SpecParameters(do_sample=False)), "x" * 50)
+        self.assertEqual(self.budgets(), [128])
+
+    async def test_truncated_generation_is_retried_with_the_default(self):
+        self.advisor.observe("testcases", MODEL, "x" * 100)
+        self.outputs = ["x" * 128, "x" * 300]
+        self.assertEqual(await self.generate(SpecParameters()), "x" * 300)
+        self.assertEqual(self.budgets(), [128, 2048])
+        self.assertEqual(self.advisor.distributions()["testcases"][MODEL]["truncated"], 1)
+
+    async def test_client_max_new_tokens_is_kept(self):
+        self.advisor.observe("testcases", MODEL, "x" * 100)
+        self.outputs = ["x" * 500]
+        await self.generate(SpecParameters(max_new_tokens=512))
+        self.assertEqual(self.budgets(), [512])
@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+
+from src.utilities.preparation import make_prompt
+from src.utilities.prompt_registry import PromptRegistry, PromptTemplate
+
+
+class PromptTemplateTest(unittest.TestCase):
+    def test_renders_like_make_prompt(self):
+        api = '{"paths": {"/login": {}}}'
+        templates = [
+            "Spec:\n{input_api}\nTest:\n{{braces}} stay doubled",
+            "Spec:\n{input_api}\nanswer in {{json}}",
+            "{input_api}{input_api}",
+            "no placeholder",
+        ]
+        for template in templates:
+            compiled = PromptTemplate(template)
+            self.assertEqual(compiled.render(api, "Scenario: login"), make_prompt(template, api, "Scenario: login"))
+            self.assertEqual(compiled.render(api), make_prompt(template, api))
+
+    def test_step_definition_template(self):
+        template = "Spec:\n{input_api}\nTest:\n{input_test}\n{{braces}} stay doubled"
+        self.assertEqual(PromptTemplate(template).render("api", "Scenario: login"),
+                         make_prompt(template, "api", "Scenario: login"))
+
+    def test_unsupported_fields_fall_back_to_format(self):
+        with self.assertRaises(KeyError):
+            PromptTemplate("{input_api} {other}").render("api")
+
+
+class PromptRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.root.name, "llama_prompts"))
+        self.path = os.path.join(self.root.name, "llama_prompts", "prompt.txt")
+        with open(self.path, "w") as f:
+            f.write("v1 {input_api}")
+        self.registry = PromptRegistry(root=self.root.name, reload_interval=0)
+
+    def tearDown(self):
+        self.root.cleanup()
+
+    def test_reloads_only_when_mtime_changes(self):
+        self.registry.load_all()
+        first = self.registry.get("llama_prompts/prompt.txt")
+        self.assertIs(self.registry.get("llama_prompts/prompt.txt"), first)
+
+        with open(self.path, "w") as f:
+            f.write("v2 {input_api}")
+        os.utime(self.path, ns=(first.mtime_ns + 10**9, first.mtime_ns + 10**9))
+        self.assertEqual(self.registry.render("llama_prompts/prompt.txt", input_api="spec"), "v2 spec")
@@ -0,0 +1,189 @@
+import asyncio
+import json
+import threading
+import unittest
+from unittest.mock import Mock, patch
+
+from src.models.request import SpecInferencePayload, SpecParameters
+from src.services.inference_context import CacheStatus, InferenceContext
+from src.services.model_use import agenerate_testcases_jumpstart
+from src.services.sagemaker_models.connector import Connector
+from src.utilities.spec_compaction import SpecCompactor, split_document
+
+SPEC = """
+openapi: 3.0.0
+info: {title: Items, version: 1.0.0, description: The items API}
+x-internal: true
+paths:
+  /items:
+    get:
+      description: List the items
+      responses:
+        200: {description: ok, content: {application/json: {schema: {$ref: '#/components/schemas/Item'}}}}
+    post:
+      requestBody: {content: {application/json: {schema: {$ref: '#/components/schemas/NewItem'}}}}
+      responses:
+        201: {description: created, content: {application/json: {schema: {$ref: '#/components/schemas/Copy'}}}}
+components:
+  schemas:
+    Item:
+      type: object
+      properties:
+        description: {type: string, description: the description of the item, example: a hammer}
+        node: {$ref: '#/components/schemas/Node'}
+    Copy:
+      type: object
+      properties:
+        description: {type: string, description: the description of the item, example: a hammer}
+        node: {$ref: '#/components/schemas/Node'}
+    NewItem: {type: object, properties: {name: {type: string}}}
+    Node: {type: object, properties: {children: {type: array, items: {$ref: '#/components/schemas/Node'}}}}
+    Unused: {type: object, properties: {parent: {$ref: '#/components/schemas/AlsoUnused'}}}
+    AlsoUnused: {type: string}
+"""
+
+
+class SpecCompactorTest(unittest.TestCase):
+    def setUp(self):
+        self.compactor = SpecCompactor(["description", "example", "x-*"])
+
+    def test_strips_fields_but_keeps_property_names(self):
+        compacted = self.compactor.compact(SPEC)
+        self.assertNotIn("the description of the item", compacted.text)
+        self.assertNotIn("x-internal", compacted.text)
+        self.assertNotIn("hammer", compacted.text)
+        self.assertIn('"description":{"type":"string"}', compacted.text)
+        self.assertLess(compacted.tokens_after, compacted.tokens_before)
+        self.assertEqual(compacted.tokens_saved, compacted.tokens_before - compacted.tokens_after)
+
+    def test_dedupes_drops_and_inlines_components(self):
+        document = self.compactor.compact(SPEC).document
+        schemas = document["components"]["schemas"]
+        # Copy is merged into Item, then referenced twice, NewItem is referenced once and inlined, Node is recursive
+        self.assertEqual(set(schemas), {"Item", "Node"})
+        post = document["paths"]["/items"]["post"]
+        self.assertEqual(post["responses"]["201"]["content"]["application/json"]["schema"],
+                         {"$ref": "#/components/schemas/Item"})
+        self.assertEqual(post["requestBody"]["content"]["application/json"]["schema"],
+                         {"type": "object", "properties": {"name": {"type": "string"}}})
+
+    def test_keeps_components_referenced_by_name(self):
+        spec = {
+            "openapi": "3.0.0",
+            "security": [{"bearer": []}],
+            "paths": {"/pets": {"get": {"responses": {"200": {"content": {"application/json": {"schema": {
+                "$ref": "#/components/schemas/Pet"}}}}}}}},
+            "components": {
+                "securitySchemes": {"bearer": {"type": "http", "scheme": "bearer"}},
+                "schemas": {
+                    "Pet": {"oneOf": [{"$ref": "#/components/schemas/Cat"}],
+                            "discriminator": {"propertyName": "kind", "mapping": {"cat": "Cat", "dog": "Dog"}}},
+                    "Cat": {"type": "object", "properties": {"lives": {"type": "integer"}}},
+                    "Dog": {"type": "object", "properties": {"good": {"type": "boolean"}}},
+                    "Puppy": {"type": "object", "properties": {"good": {"type": "boolean"}}},
+                },
+            },
+        }
+        document = self.compactor.compact(json.dumps(spec)).document
+        self.assertEqual(document["security"], [{"bearer": []}])
+        self.assertEqual(document["components"]["securitySchemes"], {"bearer": {"type": "http", "scheme": "bearer"}})
+        # Cat is referenced by $ref and by the mapping, Dog by the mapping only, Puppy is unused
+        self.assertEqual(set(document["components"]["schemas"]), {"Cat", "Dog"})
+        self.assertEqual(document["components"]["schemas"]["Dog"]["properties"], {"good": {"type": "boolean"}})
+
+    def test_ref_with_siblings_keeps_its_component(self):
+        spec = {
+            "openapi": "3.1.0",
+            "paths": {"/items": {"get": {"responses": {"200": {"content": {"application/json": {"schema": {
+                "$ref": "#/components/schemas/Item", "nullable": True}}}}}}}},
+            "components": {"schemas": {"Item": {"type": "object"}}},
+        }
+        document = self.compactor.compact(json.dumps(spec)).document
+        self.assertEqual(document["components"]["schemas"], {"Item": {"type": "object"}})
+
+    def test_not_a_spec_is_left_as_is(self):
+        for inputs in ("dummy inputs", "{not yaml", '{"paths": "none"}'):
+            compacted = self.compactor.compact(inputs)
+            self.assertEqual(compacted.text, inputs)
+            self.assertIsNone(compacted.document)
+            self.assertEqual(compacted.tokens_saved, 0)
+            self.assertEqual(self.compactor.split(compacted, 1), [inputs])
+
+    def test_split_groups_whole_operations(self):
+        compacted = self.compactor.compact(SPEC)
+        self.assertEqual(self.compactor.split(compacted, compacted.tokens_after), [compacted.text])
+
+        chunks = self.compactor.split(compacted, 1)
+        self.assertEqual(len(chunks), 2)
+        methods = [list(json.loads(chunk)["paths"]["/items"]) for chunk in chunks]
+        self.assertEqual(methods, [["get"], ["post"]])
+        # every chunk brings the components it references
+        self.assertIn("Node", json.loads(chunks[0])["components"]["schemas"])
+
+    def test_split_does_not_modify_the_document(self):
+        compacted = self.compactor.compact(SPEC)
+        before = json.dumps(compacted.document)
+        chunks = SpecCompactor(["description"], cache_entries=0).split(compacted, 1)
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(json.dumps(compacted.document), before)
+
+    def test_compactions_and_splits_are_kept_by_spec_hash(self):
+        with patch.object(SpecCompactor, "_parse", wraps=SpecCompactor._parse) as parse:
+            compacted = self.compactor.compact(SPEC)
+            self.assertIs(self.compactor.compact(SPEC), compacted)
+            self.assertEqual(parse.call_count, 1)
+        with patch("src.utilities.spec_compaction.split_document", wraps=split_document) as split:
+            chunks = self.compactor.split(compacted, 1)
+            self.assertEqual(self.compactor.split(compacted, 1), chunks)
+            self.assertEqual(split.call_count, 1)
+        self.assertEqual(self.compactor.stats(), {"entries": 2, "hits": 2, "misses": 2})
+
+
+class MapGenerationTest(unittest.TestCase):
+    def setUp(self):
+        registry = patch("src.services.model_use.get_prompt_registry").start()
+        registry.return_value.text.return_value = "system prompt"
+        registry.return_value.render.side_effect = lambda name, input_api: input_api
+        self.budget = patch("src.services.model_use.spec_token_budget").start()
+        self.invoke = patch("src.services.model_use.aget_inference_jumpstart").start()
+
+        async def invoke(payload, model, connector, context):
+            context.cache_status = CacheStatus.MISS
+            paths = json.loads(json.loads(payload)["inputs"][0][1]["content"])["paths"]
+            return [{"generation": {"content": " ".join(list(paths["/items"]))}}]
+
+        self.invoke.side_effect = invoke
+
+    def tearDown(self):
+        patch.stopall()
+
+    def generate(self, context: InferenceContext) -> str:
+        spec = SpecInferencePayload(inputs=SPEC, parameters=SpecParameters(do_sample=False))
+        return asyncio.run(agenerate_testcases_jumpstart(spec, Mock(spec=Connector), context))
+
+    def test_spec_over_budget_is_generated_by_chunks(self):
+        self.budget.return_value = 1
+        context = InferenceContext()
+        self.assertEqual(self.generate(context), "get\n\npost")
+        self.assertEqual(self.invoke.call_count, 2)
+        self.assertEqual(context.cache_status, CacheStatus.MISS)
+        self.assertGreater(context.spec_tokens_saved, 0)
+
+    def test_spec_is_compacted_off_the_loop(self):
+        self.budget.return_value = None
+        threads = []
+        compact = SpecCompactor.compact
+
+        def record(compactor, spec):
+            threads.append(threading.current_thread())
+            return compact(compactor, spec)
+
+        with patch.object(SpecCompactor, "compact", record):
+            self.generate(InferenceContext())
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
+
+    def test_spec_within_budget_is_generated_once(self):
+        self.budget.return_value = None
+        self.assertEqual(self.generate(InferenceContext()), "get post")
+        self.assertEqual(self.invoke.call_count, 1)